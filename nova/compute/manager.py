@@ -240,6 +240,8 @@ CONF.import_opt('enabled', 'nova.rdp', group='rdp')
 CONF.import_opt('html5_proxy_base_url', 'nova.rdp', group='rdp')
 CONF.import_opt('enabled', 'nova.console.serial', group='serial_console')
 CONF.import_opt('base_url', 'nova.console.serial', group='serial_console')
+CONF.import_opt('scheduler_tracks_instance_changes',
+                'nova.scheduler.host_manager')
 
 LOG = logging.getLogger(__name__)
 
@@ -658,6 +660,18 @@ class ComputeManager(manager.Manager):
             rt = self._get_resource_tracker(instance.get('node'))
             rt.update_usage(context, instance)
 
+    def _update_scheduler_instance_info(self, context, instance):
+        """Let the schedulers know that an instance now runs on this host."""
+        if CONF.scheduler_tracks_instance_changes:
+            self.scheduler_rpcapi.update_instance_info(context, self.host,
+                                                       [instance.uuid])
+
+    def _delete_scheduler_instance_info(self, context, instance_uuid):
+        """Let the schedulers know that an instance left this host."""
+        if CONF.scheduler_tracks_instance_changes:
+            self.scheduler_rpcapi.delete_instance_info(context, self.host,
+                                                       instance_uuid)
+
     def _instance_update(self, context, instance_uuid, **kwargs):
         """Update an instance in the database using kwargs as value."""
 
@@ -829,6 +843,7 @@ class ComputeManager(manager.Manager):
 
         self._notify_about_instance_usage(context, instance, "delete.end",
                 system_metadata=system_meta)
+        self._delete_scheduler_instance_info(context, instance.uuid)
 
         if CONF.vnc_enabled or CONF.spice.enabled:
             if CONF.cells.enable:
@@ -2252,6 +2267,7 @@ class ComputeManager(manager.Manager):
         self._notify_about_instance_usage(context, instance, 'create.end',
                 extra_usage_info={'message': _('Success')},
                 network_info=network_info)
+        self._update_scheduler_instance_info(context, instance)
 
     @contextlib.contextmanager
     def _build_resources(self, context, instance, requested_networks,
@@ -2916,6 +2932,7 @@ class ComputeManager(manager.Manager):
                     context, instance, "rebuild.end",
                     network_info=network_info,
                     extra_usage_info=extra_usage_info)
+            self._update_scheduler_instance_info(context, instance)
 
     def _handle_bad_volumes_detached(self, context, instance, bad_devices,
                                      block_device_info):
@@ -3670,6 +3687,7 @@ class ComputeManager(manager.Manager):
 
             self._notify_about_instance_usage(
                     context, instance, "resize.revert.end")
+            self._update_scheduler_instance_info(context, instance)
             quotas.commit()
 
     def _prep_resize(self, context, image, instance, instance_type,
@@ -3958,6 +3976,7 @@ class ComputeManager(manager.Manager):
         self._notify_about_instance_usage(
             context, instance, "finish_resize.end",
             network_info=network_info)
+        self._update_scheduler_instance_info(context, instance)
 
     @wrap_exception()
     @reverts_task_state
@@ -4270,6 +4289,7 @@ class ComputeManager(manager.Manager):
                                            task_states.SHELVING_OFFLOADING])
         self._notify_about_instance_usage(context, instance,
                 'shelve_offload.end')
+        self._delete_scheduler_instance_info(context, instance.uuid)
 
     @wrap_exception()
     @reverts_task_state
@@ -4361,6 +4381,7 @@ class ComputeManager(manager.Manager):
         instance.launched_at = timeutils.utcnow()
         instance.save(expected_task_state=task_states.SPAWNING)
         self._notify_about_instance_usage(context, instance, 'unshelve.end')
+        self._update_scheduler_instance_info(context, instance)
 
     @messaging.expected_exceptions(NotImplementedError)
     @wrap_instance_fault
@@ -5274,6 +5295,7 @@ class ComputeManager(manager.Manager):
         self._notify_about_instance_usage(
                      context, instance, "live_migration.post.dest.end",
                      network_info=network_info)
+        self._update_scheduler_instance_info(context, instance)
 
     @wrap_exception()
     @wrap_instance_fault
@@ -24,6 +24,7 @@ from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import importutils
+from oslo_utils import timeutils
 
 from nova.compute import claims
 from nova.compute import flavors
@@ -55,6 +56,27 @@ resource_tracker_opts = [
     cfg.ListOpt('compute_resources',
                 default=['vcpu'],
                 help='The names of the extra resources to track.'),
+    cfg.BoolOpt('resource_tracker_incremental_audit',
+                default=False,
+                help='Whether the periodic audit of the compute resources '
+                     'only checks that the usage tracked from the claims '
+                     'still matches the hypervisor and the database, and '
+                     'only recomputes the usage from all the instances when '
+                     'it does not.'),
+    cfg.IntOpt('resource_tracker_full_audit_interval',
+               default=3600,
+               help='When resource_tracker_incremental_audit is enabled, '
+                    'number of seconds after which the usage is recomputed '
+                    'from all the instances anyway. A value of 0 or less '
+                    'disables the periodic full audit.'),
+    cfg.IntOpt('resource_tracker_full_update_interval',
+               default=600,
+               help='Only the resources which changed are written to the '
+                    'compute node record, which is not written at all when '
+                    'nothing changed. This is the number of seconds after '
+                    'which all the resources are written anyway, refreshing '
+                    'the record and its update time. A value of 0 or less '
+                    'disables the periodic full write.'),
 ]
 
 CONF = cfg.CONF
@@ -63,6 +85,26 @@ CONF.register_opts(resource_tracker_opts)
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
 
+# Resources reported by the virt driver that the usage is computed from
+AUDITED_RESOURCES = ('vcpus', 'memory_mb', 'local_gb', 'numa_topology',
+                     'pci_passthrough_devices', 'stats')
+
+# Resources reported by the virt driver that are overridden with the usage
+# computed from the instances
+USAGE_RESOURCES = ('vcpus_used', 'memory_mb_used', 'local_gb_used')
+
+# Resources of the compute node record computed by the tracker rather than
+# reported by the virt driver
+TRACKED_RESOURCES = USAGE_RESOURCES + ('free_ram_mb', 'free_disk_gb',
+                                       'numa_topology', 'pci_stats')
+
+# Resources of the compute node record the scheduler claims add to
+CLAIMED_RESOURCES = ('memory_mb_used', 'free_ram_mb', 'vcpus_used',
+                     'local_gb_used', 'free_disk_gb')
+
+# Fields of the instances the usage is computed from
+INSTANCE_USAGE_FIELDS = ('memory_mb', 'vcpus', 'root_gb', 'ephemeral_gb')
+
 CONF.import_opt('my_ip', 'nova.netconf')
 
 
@@ -88,6 +130,15 @@ class ResourceTracker(object):
             ext_resources.ResourceHandler(CONF.compute_resources)
         self.old_resources = {}
         self.scheduler_client = scheduler_client.SchedulerClient()
+        # Audited resources reported by the driver during the last full
+        # audit, and when it happened
+        self.audited_resources = None
+        self.last_full_audit = None
+        # When all the resources were last written to the compute node
+        self.last_full_update = None
+        # Usage of the compute node record changed by the scheduler claims,
+        # as found during the last audit
+        self.claimed_usage = {}
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def instance_claim(self, context, instance_ref, limits=None):
@@ -338,10 +389,144 @@ class ResourceTracker(object):
 
         self._report_hypervisor_resource_view(resources)
 
+        self._reconcile_scheduler_claims(context)
+
+        if (CONF.resource_tracker_incremental_audit and
+                self._reconcile_available_resource(context, resources)):
+            return
+
         return self._update_available_resource(context, resources)
 
+    def _reconcile_scheduler_claims(self, context):
+        """Write the usage again if the scheduler claimed resources since.
+
+        The scheduler claims add to the usage of the compute node record,
+        and are replaced by the usage computed here when the instances get
+        claimed on this node. The usage is only written when it changes
+        though, so the claim of an instance which never reached this node
+        (build aborted or rescheduled before its claim, instance deleted
+        while scheduling) would stay on the record. The claims found on the
+        record at two audits in a row are released by writing the usage
+        again, the newer ones being likely in flight.
+        """
+        if not self.compute_node or not self.old_resources:
+            return
+        try:
+            compute = objects.ComputeNode.get_by_id(context,
+                                                    self.compute_node['id'])
+        except exception.NotFound:
+            return
+        self._forget_claimed_usage(compute)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _forget_claimed_usage(self, compute):
+        claimed_usage = {}
+        for key in CLAIMED_RESOURCES:
+            if key not in self.old_resources:
+                continue
+            value = getattr(compute, key)
+            if value == self.old_resources[key]:
+                continue
+            claimed_usage[key] = value
+            if self.claimed_usage.get(key) == value:
+                LOG.debug("%(key)s of the compute node record was changed "
+                          "from %(old)s to %(new)s by stale claims, writing "
+                          "it again", {'key': key,
+                                       'old': self.old_resources[key],
+                                       'new': value})
+                del self.old_resources[key]
+        self.claimed_usage = claimed_usage
+
+    def _get_audited_resources(self, resources):
+        return tuple(resources.get(key) for key in AUDITED_RESOURCES)
+
+    def _reconcile_available_resource(self, context, resources):
+        """Check the tracked usage against the hypervisor and the database.
+
+        The instances and migrations are loaded without holding the
+        COMPUTE_RESOURCE_SEMAPHORE. Returns False if a full audit is due or
+        if the tracked usage drifted, in which case the caller runs a full
+        audit.
+        """
+        interval = CONF.resource_tracker_full_audit_interval
+        if (self.disabled or self.last_full_audit is None or
+                (interval > 0 and timeutils.is_older_than(
+                    self.last_full_audit, interval))):
+            return False
+
+        instances = objects.InstanceList.get_by_host_and_node(
+            context, self.host, self.nodename)
+        capi = self.conductor_api
+        migrations = capi.migration_get_in_progress_by_host_and_node(
+            context, self.host, self.nodename)
+        per_instance_usage = self.driver.get_per_instance_usage()
+        return self._reconcile_usage(context, resources, instances,
+                                     migrations, per_instance_usage)
+
+    def _get_usage_drift(self, resources, instances, migrations,
+                         per_instance_usage):
+        """Return why the tracked usage drifted, or None if it did not."""
+        if self._get_audited_resources(resources) != self.audited_resources:
+            return 'hypervisor resources changed'
+        # Migrations and orphans are left to the full audit.
+        if migrations or self.tracked_migrations:
+            return 'migrations in progress'
+        if set(per_instance_usage) - set(self.tracked_instances):
+            return 'orphan instances'
+
+        def _usage(instance):
+            return tuple(instance[field] for field in INSTANCE_USAGE_FIELDS)
+
+        usage = {instance['uuid']: _usage(instance)
+                 for instance in instances
+                 if instance['vm_state'] != vm_states.DELETED}
+        tracked_usage = {uuid: _usage(instance)
+                         for uuid, instance in self.tracked_instances.items()}
+        if usage != tracked_usage:
+            return 'instances changed'
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _reconcile_usage(self, context, resources, instances, migrations,
+                         per_instance_usage):
+        drift = self._get_usage_drift(resources, instances, migrations,
+                                      per_instance_usage)
+        if drift:
+            LOG.debug("Tracked resource usage drifted (%s), running a full "
+                      "audit", drift)
+            return False
+
+        # Only the states of the instances may have changed without the
+        # tracker knowing.
+        for instance in instances:
+            state = dict(vm_state=instance['vm_state'],
+                         task_state=instance['task_state'],
+                         os_type=instance['os_type'],
+                         project_id=instance['project_id'])
+            if self.stats.states.get(instance['uuid']) != state:
+                self.stats.update_stats_for_instance(instance)
+
+        # Build the values as the full audit would, from the hypervisor
+        # resources and the usage already tracked, rather than from the
+        # compute node record which holds DB-only fields.
+        values = dict(resources)
+        values.pop('pci_passthrough_devices', None)
+        for key in TRACKED_RESOURCES:
+            if key in self.compute_node:
+                values[key] = self.compute_node[key]
+        values['current_workload'] = self.stats.calculate_workload()
+        values['running_vms'] = self.stats.num_instances
+
+        self._report_final_resource_view(values)
+
+        metrics = self._get_host_metrics(context, self.nodename)
+        values['metrics'] = jsonutils.dumps(metrics)
+        self._sync_compute_node(context, values)
+        return True
+
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def _update_available_resource(self, context, resources):
+        audited_resources = self._get_audited_resources(resources)
+
         if 'pci_passthrough_devices' in resources:
             if not self.pci_tracker:
                 self.pci_tracker = pci_manager.PciDevTracker()
@@ -357,6 +542,12 @@ class ResourceTracker(object):
 
             self.pci_tracker.set_hvdevs(devs)
 
+        # The NUMA usage of every instance is summed on the deserialized
+        # host topology, which is only serialized back once at the end.
+        numa_topology, jsonify_numa_topology = (
+            hardware.host_topology_and_format_from_host(resources))
+        resources['numa_topology'] = numa_topology
+
         # Grab all instances assigned to this node:
         instances = objects.InstanceList.get_by_host_and_node(
             context, self.host, self.nodename,
@@ -388,12 +579,18 @@ class ResourceTracker(object):
         else:
             resources['pci_stats'] = jsonutils.dumps([])
 
+        if jsonify_numa_topology and resources['numa_topology'] is not None:
+            resources['numa_topology'] = resources['numa_topology']._to_json()
+
         self._report_final_resource_view(resources)
 
         metrics = self._get_host_metrics(context, self.nodename)
         resources['metrics'] = jsonutils.dumps(metrics)
         self._sync_compute_node(context, resources)
 
+        self.audited_resources = audited_resources
+        self.last_full_audit = timeutils.utcnow()
+
     def _sync_compute_node(self, context, resources):
         """Create or update the compute node DB record."""
         if not self.compute_node:
@@ -531,11 +728,23 @@ class ResourceTracker(object):
             LOG.info(_LI("PCI stats: %s"), resources['pci_stats'])
 
     def _resource_change(self, resources):
-        """Check to see if any resouces have changed."""
-        if cmp(resources, self.old_resources) != 0:
-            self.old_resources = copy.deepcopy(resources)
-            return True
-        return False
+        """Return the resources which changed since they were last written.
+
+        All of them are returned when they were not all written for
+        resource_tracker_full_update_interval seconds.
+        """
+        interval = CONF.resource_tracker_full_update_interval
+        if (self.last_full_update is None or
+                (interval > 0 and timeutils.is_older_than(
+                    self.last_full_update, interval))):
+            self.last_full_update = timeutils.utcnow()
+            changes = dict(resources)
+        else:
+            changes = {key: value for key, value in resources.items()
+                       if key not in self.old_resources or
+                       self.old_resources[key] != value}
+        self.old_resources.update(copy.deepcopy(changes))
+        return changes
 
     def _update(self, context, values):
         """Update partial stats locally and populate them to Scheduler."""
@@ -545,15 +754,16 @@ class ResourceTracker(object):
         # so this can be removed when using ComputeNode.
         values['stats'] = jsonutils.dumps(values['stats'])
 
-        if not self._resource_change(values):
+        changes = self._resource_change(values)
+        if not changes:
             return
         if "service" in self.compute_node:
             del self.compute_node['service']
         # NOTE(sbauza): Now the DB update is asynchronous, we need to locally
         #               update the values
         self.compute_node.update(values)
-        # Persist the stats to the Scheduler
-        self._update_resource_stats(context, values)
+        # Persist the changed stats to the Scheduler
+        self._update_resource_stats(context, changes)
         if self.pci_tracker:
             self.pci_tracker.save(context)
 
@@ -633,10 +843,8 @@ class ResourceTracker(object):
                     instance['system_metadata'])
 
         if itype:
-            host_topology = resources.get('numa_topology')
-            if host_topology:
-                host_topology = objects.NUMATopology.obj_from_db_obj(
-                        host_topology)
+            host_topology, _fmt = hardware.host_topology_and_format_from_host(
+                    resources)
             numa_topology = hardware.numa_get_constraints(itype, image_meta)
             numa_topology = (
                     hardware.numa_fit_instance_to_host(
@@ -65,6 +65,31 @@ allowed_updates = ['task_state', 'vm_state', 'expected_task_state',
 datetime_fields = ['launched_at', 'terminated_at', 'updated_at']
 
 
+def _objects_equal(obj, other):
+    """Tell whether two objects have the same fields set, the same values
+    and the same changes, comparing the nested objects the same way.
+    """
+    if isinstance(obj, nova_object.NovaObject):
+        if (obj.__class__ is not other.__class__ or
+                obj.VERSION != other.VERSION or
+                obj.obj_what_changed() != other.obj_what_changed()):
+            return False
+        for name in obj.fields:
+            is_set = obj.obj_attr_is_set(name)
+            if is_set != other.obj_attr_is_set(name):
+                return False
+            if is_set and not _objects_equal(getattr(obj, name),
+                                             getattr(other, name)):
+                return False
+        return True
+    if isinstance(obj, list) and isinstance(other, list):
+        # Lists of objects
+        return (len(obj) == len(other) and
+                all(_objects_equal(item, other_item)
+                    for item, other_item in zip(obj, other)))
+    return obj == other
+
+
 class ConductorManager(manager.Manager):
     """Mission: Conduct things.
 
@@ -439,10 +464,21 @@ class ConductorManager(manager.Manager):
             if not objinst.obj_attr_is_set(name):
                 # Avoid demand-loading anything
                 continue
-            if (not oldobj.obj_attr_is_set(name) or
-                    getattr(oldobj, name) != getattr(objinst, name)):
-                updates[name] = field.to_primitive(objinst, name,
-                                                   getattr(objinst, name))
+            value = getattr(objinst, name)
+            if not oldobj.obj_attr_is_set(name):
+                updates[name] = field.to_primitive(objinst, name, value)
+                continue
+            old_value = getattr(oldobj, name)
+            if isinstance(value, nova_object.NovaObject):
+                # Nested objects of the clone are copies which never
+                # compare equal, so compare them field by field, changes
+                # included. This keeps the unchanged info_cache, flavors,
+                # security groups and the like out of the reply to
+                # Instance.save(), without serializing them.
+                if not _objects_equal(value, old_value):
+                    updates[name] = field.to_primitive(objinst, name, value)
+            elif old_value != value:
+                updates[name] = field.to_primitive(objinst, name, value)
         # This is safe since a field named this would conflict with the
         # method anyway
         updates['obj_what_changed'] = objinst.obj_what_changed()
@@ -204,6 +204,19 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+def compute_node_get_all_changed_since(context, since):
+    """Get compute nodes created, updated or deleted since a point in time.
+
+    :param context: The security context (admin)
+    :param since: Datetime; nodes whose created_at, updated_at or deleted_at
+                  is at or after this value are returned
+
+    :returns: List of dictionaries each containing compute node properties,
+              including soft-deleted nodes so callers can evict them
+    """
+    return IMPL.compute_node_get_all_changed_since(context, since)
+
+
 def compute_node_get_all_by_host(context, host, use_slave=False):
     """Get compute nodes by host name
 
@@ -254,6 +267,28 @@ def compute_node_update(context, compute_id, values):
     return IMPL.compute_node_update(context, compute_id, values)
 
 
+def compute_node_claim(context, compute_id, generation, memory_mb, vcpus,
+                       local_gb):
+    """Consume resources of a compute node if it is at the given generation.
+
+    :param context: The security context (admin)
+    :param compute_id: ID of the compute node
+    :param generation: Generation of the compute node the claim was
+                       decided upon
+    :param memory_mb: Amount of RAM to consume
+    :param vcpus: Number of vCPUs to consume
+    :param local_gb: Amount of disk to consume
+
+    :returns: Dictionary-like object containing the properties of the updated
+              compute node, whose generation was incremented
+
+    Raises ComputeNodeGenerationConflict if the compute node was updated
+    since the given generation, in which case nothing is consumed.
+    """
+    return IMPL.compute_node_claim(context, compute_id, generation,
+                                   memory_mb, vcpus, local_gb)
+
+
 def compute_node_delete(context, compute_id):
     """Delete a compute node from the database.
 
@@ -675,15 +710,16 @@ def instance_get_all_by_filters(context, filters, sort_key='created_at',
 def instance_get_all_by_filters_sort(context, filters, limit=None,
                                      marker=None, columns_to_join=None,
                                      use_slave=False, sort_keys=None,
-                                     sort_dirs=None):
+                                     sort_dirs=None, columns=None):
     """Get all instances that match all filters sorted by multiple keys.
 
-    sort_keys and sort_dirs must be a list of strings.
+    sort_keys and sort_dirs must be a list of strings. If columns is given,
+    only these columns of the instances are returned, as dicts.
     """
     return IMPL.instance_get_all_by_filters_sort(
         context, filters, limit=limit, marker=marker,
         columns_to_join=columns_to_join, use_slave=use_slave,
-        sort_keys=sort_keys, sort_dirs=sort_dirs)
+        sort_keys=sort_keys, sort_dirs=sort_dirs, columns=columns)
 
 
 def instance_get_active_by_window_joined(context, begin, end=None,
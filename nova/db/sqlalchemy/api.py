@@ -528,6 +528,17 @@ def compute_node_get_all(context):
     return model_query(context, models.ComputeNode, read_deleted='no').all()
 
 
+@require_admin_context
+def compute_node_get_all_changed_since(context, since):
+    since = timeutils.normalize_time(since)
+    model = models.ComputeNode
+    return model_query(context, model, read_deleted='yes').\
+            filter(or_(model.created_at >= since,
+                       model.updated_at >= since,
+                       model.deleted_at >= since)).\
+            all()
+
+
 @require_admin_context
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
@@ -558,11 +569,18 @@ def compute_node_update(context, compute_id, values):
 
     session = get_session()
     with session.begin():
+        # Bump the generation first, in a single statement, so that the
+        # scheduler claims decided upon the previous values fail.
+        model_query(context, models.ComputeNode, session=session).\
+                filter_by(id=compute_id).\
+                update({'generation': models.ComputeNode.generation + 1},
+                       synchronize_session=False)
         compute_ref = _compute_node_get(context, compute_id, session=session)
         # Always update this, even if there's going to be no other
         # changes in data.  This ensures that we invalidate the
         # scheduler cache of compute node data in case of races.
         values['updated_at'] = timeutils.utcnow()
+        values.pop('generation', None)
         datetime_keys = ('created_at', 'deleted_at', 'updated_at')
         convert_objects_related_datetimes(values, *datetime_keys)
         compute_ref.update(values)
@@ -570,6 +588,30 @@ def compute_node_update(context, compute_id, values):
     return compute_ref
 
 
+@require_admin_context
+@_retry_on_deadlock
+def compute_node_claim(context, compute_id, generation, memory_mb, vcpus,
+                       local_gb):
+    model = models.ComputeNode
+    session = get_session()
+    with session.begin():
+        result = model_query(context, model, session=session,
+                             read_deleted='no').\
+                filter_by(id=compute_id, generation=generation).\
+                update({'memory_mb_used': model.memory_mb_used + memory_mb,
+                        'free_ram_mb': model.free_ram_mb - memory_mb,
+                        'vcpus_used': model.vcpus_used + vcpus,
+                        'local_gb_used': model.local_gb_used + local_gb,
+                        'free_disk_gb': model.free_disk_gb - local_gb,
+                        'generation': model.generation + 1,
+                        'updated_at': timeutils.utcnow()},
+                       synchronize_session=False)
+        if not result:
+            raise exception.ComputeNodeGenerationConflict(
+                compute_id=compute_id, generation=generation)
+        return _compute_node_get(context, compute_id, session=session)
+
+
 @require_admin_context
 def compute_node_delete(context, compute_id):
     """Delete a ComputeNode record."""
@@ -1806,7 +1848,8 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
 @require_context
 def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
                                      columns_to_join=None, use_slave=False,
-                                     sort_keys=None, sort_dirs=None):
+                                     sort_keys=None, sort_dirs=None,
+                                     columns=None):
     """Return instances that match all filters sorted the the given keys.
     Deleted instances will be returned by default, unless there's a filter that
     says otherwise.
@@ -1857,6 +1900,19 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     |        'tag-any: [some-any-tag, some-another-any-tag]
     |    }
 
+    The metadata and system_metadata of the instances are only loaded when
+    listed in columns_to_join, or when columns_to_join is None. Listings not
+    showing them should leave them out, system_metadata being the largest
+    of the tables joined.
+
+    Pages following a marker are fetched by seeking to the sort key values
+    of the marker instance, which the default sort keys of the listings of
+    a project have an index for.
+
+    If columns is given, only these columns of the instances are selected,
+    and the instances are returned as dicts of them, without joining any
+    other table.
+
     """
     # NOTE(mriedem): If the limit is 0 there is no point in even going
     # to the database since nothing is going to be returned anyway.
@@ -1879,7 +1935,13 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
         manual_joins, columns_to_join_new = (
             _manual_join_columns(columns_to_join))
 
-    query_prefix = session.query(models.Instance)
+    if columns is not None:
+        _check_instance_columns(columns)
+        query_prefix = session.query(
+            *[getattr(models.Instance, column) for column in columns])
+        columns_to_join_new = []
+    else:
+        query_prefix = session.query(models.Instance)
     for column in columns_to_join_new:
         if 'extra.' in column:
             query_prefix = query_prefix.options(undefer(column))
@@ -1974,9 +2036,25 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     # paginate query
     if marker is not None:
         try:
-            marker = _instance_get_by_uuid(context, marker, session=session)
+            marker = _instance_get_sort_values(context, marker, sort_keys,
+                                               session=session)
         except exception.InstanceNotFound:
             raise exception.MarkerNotFound(marker)
+        # paginate_query() selects the rows following the marker with
+        # OR-chained comparisons of the sort keys, which databases can't use
+        # an index for. Bounding the leading sort key on its own as well
+        # lets them seek to the marker in an index on the sort keys instead
+        # of scanning all the rows before it. Rows with a NULL sort key
+        # never follow a marker anyway.
+        leading_value = getattr(marker, sort_keys[0])
+        if leading_value is not None:
+            leading_column = getattr(models.Instance, sort_keys[0])
+            if sort_dirs[0] == 'desc':
+                query_prefix = query_prefix.filter(
+                    leading_column <= leading_value)
+            else:
+                query_prefix = query_prefix.filter(
+                    leading_column >= leading_value)
     try:
         query_prefix = sqlalchemyutils.paginate_query(query_prefix,
                                models.Instance, limit,
@@ -1986,9 +2064,49 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     except db_exc.InvalidSortKey:
         raise exception.InvalidSortKey()
 
+    if columns is not None:
+        return [dict(zip(columns, row)) for row in query_prefix.all()]
+
     return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
 
 
+def _check_instance_columns(columns):
+    """Check that the given columns are columns of the instances.
+
+    :raises: InvalidInput if a column isn't a column of the instances
+    """
+    for column in columns:
+        if column not in models.Instance.__table__.columns:
+            msg = _("Unknown instances column %s") % column
+            raise exception.InvalidInput(reason=msg)
+
+
+def _instance_get_sort_values(context, uuid, sort_keys, session=None):
+    """Return the values of the sort keys of an instance.
+
+    Only the sort key columns are loaded, which is all a pagination marker
+    needs, rather than the whole instance and its joined tables.
+
+    :raises: InvalidSortKey if a sort key isn't a column of the instances
+    :raises: InstanceNotFound if the instance doesn't exist
+    """
+    columns = []
+    for sort_key in sort_keys:
+        if sort_key not in models.Instance.__table__.columns:
+            raise exception.InvalidSortKey()
+        columns.append(getattr(models.Instance, sort_key))
+
+    result = model_query(context, models.Instance, columns,
+                         session=session, project_only=True).\
+                filter_by(uuid=uuid).\
+                first()
+
+    if not result:
+        raise exception.InstanceNotFound(instance_id=uuid)
+
+    return result
+
+
 def _tag_instance_filter(context, query, filters):
     """Applies tag filtering to an Instance query.
 
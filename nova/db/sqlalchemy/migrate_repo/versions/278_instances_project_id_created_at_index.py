@@ -0,0 +1,47 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+from sqlalchemy import MetaData, Table, Index
+
+INDEX_NAME = 'instances_project_id_deleted_created_at_id_idx'
+
+
+def upgrade(migrate_engine):
+    """Add an index on instances (project_id, deleted, created_at, id).
+
+    This covers the default sort keys of the instance listings of a project,
+    so that their pages can be fetched with an index range scan.
+    """
+
+    meta = MetaData(bind=migrate_engine)
+
+    instances = Table('instances', meta, autoload=True)
+
+    index = Index(INDEX_NAME,
+                  instances.c.project_id, instances.c.deleted,
+                  instances.c.created_at, instances.c.id)
+    index.create()
+
+
+def downgrade(migrate_engine):
+    """Remove the instances (project_id, deleted, created_at, id) index."""
+
+    meta = MetaData(bind=migrate_engine)
+
+    instances = Table('instances', meta, autoload=True)
+
+    for index in instances.indexes:
+        if index.name == INDEX_NAME:
+            index.drop()
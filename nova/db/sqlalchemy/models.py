@@ -175,6 +175,11 @@ class ComputeNode(BASE, NovaBase):
     # objects.NUMATopoloogy._to_json()
     numa_topology = Column(Text)
 
+    # Incremented on every update of the record, so that the resources can
+    # be claimed by a compare-and-swap on it.
+    generation = Column(Integer, nullable=False, default=0,
+                        server_default='0')
+
 
 class Certificate(BASE, NovaBase):
     """Represents a x509 certificate."""
@@ -197,6 +202,8 @@ class Instance(BASE, NovaBase):
         Index('uuid', 'uuid', unique=True),
         Index('instances_project_id_deleted_idx',
               'project_id', 'deleted'),
+        Index('instances_project_id_deleted_created_at_id_idx',
+              'project_id', 'deleted', 'created_at', 'id'),
         Index('instances_reservation_id_idx',
               'reservation_id'),
         Index('instances_terminated_at_launched_at_idx',
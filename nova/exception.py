@@ -910,6 +910,11 @@ class ComputeHostNotCreated(HostNotFound):
                 " before updating.")
 
 
+class ComputeNodeGenerationConflict(NovaException):
+    msg_fmt = _("Compute node %(compute_id)s was updated since generation "
+                "%(generation)s was read.")
+
+
 class HostBinaryNotFound(NotFound):
     msg_fmt = _("Could not find binary %(binary)s on host %(host)s.")
 
@@ -17,14 +17,137 @@
 Filter support
 """
 
+import time
+
 from oslo_log import log as logging
+from oslo_utils import importutils
+import six
 
 from nova.i18n import _LI
 from nova import loadables
 
+numpy = importutils.try_import('numpy')
+
 LOG = logging.getLogger(__name__)
 
 
+class ObjectColumns(object):
+    """Columnar view of a list of objects, used by vectorized filters.
+
+    Numeric attributes of the objects are loaded into NumPy arrays the first
+    time they are asked for, and are kept when a subset of the objects is
+    selected, so that consecutive vectorized filters don't have to walk the
+    objects again.
+    """
+
+    def __init__(self, objs, arrays=None):
+        self.objs = objs
+        self._arrays = arrays or {}
+        self._positions = None
+
+    def __len__(self):
+        return len(self.objs)
+
+    def __getitem__(self, attr):
+        """Return an array holding the given attribute of every object."""
+        array = self._arrays.get(attr)
+        if array is None:
+            array = self.values(lambda obj: getattr(obj, attr))
+            self._arrays[attr] = array
+        return array
+
+    def values(self, func):
+        """Return an array holding the result of func() for every object.
+
+        None results are stored as NaN, which fails any comparison.
+        """
+        return numpy.array([func(obj) for obj in self.objs], dtype=float)
+
+    def full(self, value):
+        """Return a boolean array of the given value for every object."""
+        return numpy.repeat(bool(value), len(self.objs))
+
+    def select(self, mask):
+        """Return the columns of the objects whose mask value is True."""
+        return self._take(numpy.flatnonzero(mask))
+
+    def selected_objs(self, mask):
+        """Return the objects whose mask value is True."""
+        return [self.objs[i] for i in numpy.flatnonzero(mask)]
+
+    def subset(self, objs):
+        """Return the columns of objs, which must be a subset of ours."""
+        if self._positions is None:
+            self._positions = {id(obj): i for i, obj in enumerate(self.objs)}
+        indices = numpy.array([self._positions[id(obj)] for obj in objs],
+                              dtype=int)
+        return self._take(indices)
+
+    def _take(self, indices):
+        objs = [self.objs[i] for i in indices]
+        arrays = {attr: array[indices]
+                  for attr, array in six.iteritems(self._arrays)}
+        return ObjectColumns(objs, arrays)
+
+
+class FilterStats(object):
+    """Cost and selectivity of a filter, accumulated over its runs."""
+
+    def __init__(self):
+        self.runs = 0
+        self.objects_in = 0
+        self.objects_out = 0
+        self.elapsed = 0.0
+
+    def record(self, objects_in, objects_out, elapsed):
+        self.runs += 1
+        self.objects_in += objects_in
+        self.objects_out += objects_out
+        self.elapsed += elapsed
+
+    def merge(self, other):
+        """Add the objects and time of other, recorded for the same runs."""
+        self.objects_in += other.objects_in
+        self.objects_out += other.objects_out
+        self.elapsed += other.elapsed
+
+    @property
+    def pass_ratio(self):
+        """Return the ratio of the objects passing the filter."""
+        if not self.objects_in:
+            return 1.0
+        return self.objects_out / float(self.objects_in)
+
+    @property
+    def cost(self):
+        """Return the average time spent filtering one object."""
+        if not self.objects_in:
+            return 0.0
+        return self.elapsed / self.objects_in
+
+    def rank(self):
+        """Return the rank of the filter, lower ranks running first.
+
+        Cheap filters rejecting many objects get the lowest ranks, while
+        the filters rejecting nothing come last. Filters which never ran
+        rank first, so that they get measured.
+        """
+        if not self.objects_in:
+            return 0.0
+        rejected = 1.0 - self.pass_ratio
+        if not rejected:
+            return float('inf')
+        return self.cost / rejected
+
+    def to_dict(self):
+        return {'runs': self.runs,
+                'objects_in': self.objects_in,
+                'objects_out': self.objects_out,
+                'elapsed': self.elapsed,
+                'pass_ratio': self.pass_ratio,
+                'cost': self.cost}
+
+
 class BaseFilter(object):
     """Base class for all filter classes."""
     def _filter_one(self, obj, filter_properties):
@@ -44,10 +167,39 @@ class BaseFilter(object):
             if self._filter_one(obj, filter_properties):
                 yield obj
 
+    # Set to true in a subclass implementing filter_batch(), which is then
+    # used instead of filter_all() when vectorized filtering is enabled
+    vectorized = False
+
+    def filter_batch(self, columns, filter_properties):
+        """Return a boolean array telling which objects pass the filter.
+
+        columns is an ObjectColumns holding all the objects to filter.
+        Override this in a subclass setting vectorized to True.
+        """
+        raise NotImplementedError()
+
     # Set to true in a subclass if a filter only needs to be run once
     # for each request rather than for each instance
     run_filter_once_per_request = False
 
+    # Set to false in a subclass if the result of a filter depends on the
+    # filters running before it, so that the adaptive ordering never moves
+    # filters across it
+    commutative = True
+
+    # Set to false in a subclass if the result of a filter for an object
+    # depends on anything else than the object state and the request, or if
+    # the filter has side effects on the request, so that its results are
+    # never cached between requests
+    cache_results = True
+
+    # Set to true in a subclass if a filter can run in a forked worker
+    # process: it only looks at the objects and the request, without using
+    # the database or other services, and changes nothing but the limits
+    # of the objects
+    process_safe = False
+
     def run_filter_for_index(self, index):
         """Return True if the filter needs to be run for the "index-th"
         instance in a request.  Only need to override this if a filter
@@ -65,21 +217,90 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
-    def get_filtered_objects(self, filters, objs, filter_properties, index=0):
+    def __init__(self, *args, **kwargs):
+        super(BaseFilterHandler, self).__init__(*args, **kwargs)
+        self.filter_stats = {}
+
+    def get_filter_stats(self):
+        """Return the statistics of the filters run so far, by name."""
+        return {cls_name: stats.to_dict()
+                for cls_name, stats in six.iteritems(self.filter_stats)}
+
+    def _get_stats(self, filter):
+        cls_name = filter.__class__.__name__
+        stats = self.filter_stats.get(cls_name)
+        if stats is None:
+            stats = self.filter_stats[cls_name] = FilterStats()
+        return stats
+
+    def order_filters(self, filters):
+        """Return the filters sorted by rank, cheap and selective first.
+
+        Only consecutive commutative filters are reordered between
+        themselves.
+        """
+        def _sort(run):
+            return sorted(run, key=lambda f: self._get_stats(f).rank())
+
+        ordered = []
+        run = []
+        for filter in filters:
+            if filter.commutative:
+                run.append(filter)
+            else:
+                ordered.extend(_sort(run))
+                ordered.append(filter)
+                run = []
+        ordered.extend(_sort(run))
+        return ordered
+
+    def get_filtered_objects(self, filters, objs, filter_properties, index=0,
+                             vectorized=False, reorder=False):
+        """Return the objects passing all the filters.
+
+        If vectorized is True, filters supporting it are run at once on
+        NumPy arrays of the objects attributes, the other ones falling back
+        to filter_all(). If reorder is True, the filters are run in the
+        order given by order_filters() instead of the given one.
+        """
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
+        if reorder:
+            filters = self.order_filters(filters)
+        columns = None
         for filter in filters:
             if filter.run_filter_for_index(index):
                 cls_name = filter.__class__.__name__
-                objs = filter.filter_all(list_objs, filter_properties)
-                if objs is None:
-                    LOG.debug("Filter %s says to stop filtering", cls_name)
-                    return
-                list_objs = list(objs)
+                num_objs = len(list_objs)
+                start = time.time()
+                if vectorized and filter.vectorized:
+                    if columns is None:
+                        columns = ObjectColumns(list_objs)
+                    elif columns.objs is not list_objs:
+                        # A per-object filter ran since the columns were
+                        # built, keep the arrays already loaded.
+                        columns = columns.subset(list_objs)
+                    # NaN stands for unset attributes and is expected to
+                    # fail comparisons silently.
+                    with numpy.errstate(invalid='ignore'):
+                        mask = filter.filter_batch(columns, filter_properties)
+                    columns = columns.select(mask)
+                    list_objs = columns.objs
+                else:
+                    objs = filter.filter_all(list_objs, filter_properties)
+                    if objs is None:
+                        LOG.debug("Filter %s says to stop filtering",
+                                  cls_name)
+                        return
+                    list_objs = list(objs)
+                elapsed = time.time() - start
+                self._get_stats(filter).record(num_objs, len(list_objs),
+                                               elapsed)
                 if not list_objs:
                     LOG.info(_LI("Filter %s returned 0 hosts"), cls_name)
                     break
                 LOG.debug("Filter %(cls_name)s returned "
-                          "%(obj_len)d host(s)",
-                          {'cls_name': cls_name, 'obj_len': len(list_objs)})
+                          "%(obj_len)d host(s) in %(elapsed).6f seconds",
+                          {'cls_name': cls_name, 'obj_len': len(list_objs),
+                           'elapsed': elapsed})
         return list_objs
@@ -66,14 +66,15 @@ def make_class_properties(cls):
             raise exception.ObjectFieldInvalid(
                 field=name, objname=cls.obj_name())
 
-        def getter(self, name=name):
-            attrname = get_attrname(name)
-            if not hasattr(self, attrname):
+        def getter(self, name=name, attrname=get_attrname(name)):
+            try:
+                return getattr(self, attrname)
+            except AttributeError:
                 self.obj_load_attr(name)
-            return getattr(self, attrname)
+                return getattr(self, attrname)
 
-        def setter(self, value, name=name, field=field):
-            attrname = get_attrname(name)
+        def setter(self, value, name=name, field=field,
+                   attrname=get_attrname(name)):
             field_value = field.coerce(self, name, value)
             if field.read_only and hasattr(self, attrname):
                 # Note(yjiang5): _from_db_object() may iterate
@@ -83,7 +84,7 @@ def make_class_properties(cls):
                 else:
                     return
 
-            self._changed_fields.add(name)
+            self._obj_changes |= self._obj_field_bits[name]
             try:
                 return setattr(self, attrname, field_value)
             except Exception:
@@ -94,6 +95,58 @@ def make_class_properties(cls):
         setattr(cls, name, property(getter, setter))
 
 
+# Kinds of fields in primitive plans: values of primitive fields are
+# serialized as they are, (lists of) objects are serialized by calling their
+# obj_to_primitive(), and other fields through their to_primitive()
+_PRIMITIVE_FIELD = 0
+_OBJECT_FIELD = 1
+_OBJECT_LIST_FIELD = 2
+_OTHER_FIELD = 3
+
+
+def make_field_slots(bases, dict_):
+    """Return the slots storing the fields of a class to be created.
+
+    These are the storage attributes of the fields of the class and of its
+    bases, which none of the bases provides already as a slot or a class
+    attribute.
+    """
+    fields = dict(dict_.get('fields', {}))
+    for base in bases:
+        for cls in base.__mro__:
+            fields.update(cls.__dict__.get('fields', {}))
+    slots = []
+    for name in fields:
+        attrname = get_attrname(name)
+        if attrname in dict_:
+            continue
+        if any(hasattr(base, attrname) for base in bases):
+            continue
+        slots.append(attrname)
+    return tuple(sorted(slots))
+
+
+def make_primitive_plan(cls):
+    """Return the list of steps to (de)serialize the fields of cls.
+
+    Each step is a (name, attrname, kind, field) tuple, which saves looking
+    up the storage of each field and the conversions its type needs every
+    time an object is serialized.
+    """
+    plan = []
+    for name, field in sorted(cls.fields.items()):
+        if field.is_primitive:
+            kind = _PRIMITIVE_FIELD
+        elif isinstance(field, obj_fields.ObjectField):
+            kind = _OBJECT_FIELD
+        elif isinstance(field, obj_fields.ListOfObjectsField):
+            kind = _OBJECT_LIST_FIELD
+        else:
+            kind = _OTHER_FIELD
+        plan.append((name, get_attrname(name), kind, field))
+    return plan
+
+
 class NovaObjectMetaclass(type):
     """Metaclass that allows tracking of object classes."""
 
@@ -101,11 +154,25 @@ class NovaObjectMetaclass(type):
     # remoted. If this is not None, use it to remote things over RPC.
     indirection_api = None
 
+    def __new__(mcs, name, bases, dict_):
+        # Store the fields in slots rather than in the __dict__ of each
+        # object, which is much bigger and slower to access. This means an
+        # object class can't inherit from several object classes having
+        # fields, only from one of them and mixins.
+        slots = make_field_slots(bases, dict_)
+        if slots:
+            dict_ = dict(dict_)
+            dict_['__slots__'] = tuple(dict_.get('__slots__', ())) + slots
+        return super(NovaObjectMetaclass, mcs).__new__(mcs, name, bases,
+                                                       dict_)
+
     def __init__(cls, names, bases, dict_):
         if not hasattr(cls, '_obj_classes'):
             # This means this is a base class using the metaclass. I.e.,
             # the 'NovaObject' class.
             cls._obj_classes = collections.defaultdict(list)
+            cls._obj_primitive_plan = []
+            cls._obj_field_bits = {}
             return
 
         def _vers_tuple(obj):
@@ -115,6 +182,10 @@ class NovaObjectMetaclass(type):
         # same version already exists, replace it. Otherwise,
         # keep the list with newest version first.
         make_class_properties(cls)
+        cls._obj_primitive_plan = make_primitive_plan(cls)
+        # Changes are tracked as a bitmask of the fields of the object
+        cls._obj_field_bits = {step[0]: 1 << index for index, step
+                               in enumerate(cls._obj_primitive_plan)}
         obj_name = cls.obj_name()
         for i, obj in enumerate(cls._obj_classes[obj_name]):
             if cls.VERSION == obj.VERSION:
@@ -200,7 +271,7 @@ def remotable(fn):
                     else:
                         self[key] = field.from_primitive(self, key, value)
             self.obj_reset_changes()
-            self._changed_fields = set(updates.get('obj_what_changed', []))
+            self._changed_fields = updates.get('obj_what_changed', [])
             return result
         else:
             return fn(self, ctxt, *args, **kwargs)
@@ -269,12 +340,36 @@ class NovaObject(object):
     #   since they were not added until version 1.2.
     obj_relationships = {}
 
+    # The fields of the subclasses are stored in slots too, see
+    # make_field_slots(). Other attributes still go to __dict__.
+    __slots__ = ('_context', '_obj_changes', '__dict__', '__weakref__')
+
     def __init__(self, context=None, **kwargs):
-        self._changed_fields = set()
+        self._obj_changes = 0
         self._context = context
         for key in kwargs.keys():
             setattr(self, key, kwargs[key])
 
+    def __getstate__(self):
+        """Return the state to pickle, slots included.
+
+        Pickle protocols 0 and 1 can't save the slots by themselves.
+        """
+        state = dict(self.__dict__)
+        for cls in self.__class__.__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name in ('__dict__', '__weakref__'):
+                    continue
+                try:
+                    state[name] = getattr(self, name)
+                except AttributeError:
+                    pass
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __repr__(self):
         return '%s(%s)' % (
             self.obj_name(),
@@ -328,11 +423,13 @@ class NovaObject(object):
         self.VERSION = objver
         objdata = primitive['nova_object.data']
         changes = primitive.get('nova_object.changes', [])
-        for name, field in self.fields.items():
+        for name, attrname, kind, field in cls._obj_primitive_plan:
             if name in objdata:
-                setattr(self, name, field.from_primitive(self, name,
-                                                         objdata[name]))
-        self._changed_fields = set([x for x in changes if x in self.fields])
+                value = objdata[name]
+                if kind != _PRIMITIVE_FIELD:
+                    value = field.from_primitive(self, name, value)
+                setattr(self, name, value)
+        self._changed_fields = changes
         return self
 
     @classmethod
@@ -364,7 +461,7 @@ class NovaObject(object):
             if self.obj_attr_is_set(name):
                 nval = copy.deepcopy(getattr(self, name), memo)
                 setattr(nobj, name, nval)
-        nobj._changed_fields = set(self._changed_fields)
+        nobj._obj_changes = self._obj_changes
         return nobj
 
     def obj_clone(self):
@@ -467,21 +564,33 @@ class NovaObject(object):
     def obj_to_primitive(self, target_version=None):
         """Simple base-case dehydration.
 
-        This calls to_primitive() for each item in fields.
+        This serializes each field which is set following the primitive
+        plan of the class, only calling to_primitive() for the fields
+        which aren't primitive or objects.
         """
         primitive = dict()
-        for name, field in self.fields.items():
-            if self.obj_attr_is_set(name):
-                primitive[name] = field.to_primitive(self, name,
-                                                     getattr(self, name))
+        for name, attrname, kind, field in self._obj_primitive_plan:
+            try:
+                value = getattr(self, attrname)
+            except AttributeError:
+                continue
+            if value is None or kind == _PRIMITIVE_FIELD:
+                primitive[name] = value
+            elif kind == _OBJECT_FIELD:
+                primitive[name] = value.obj_to_primitive()
+            elif kind == _OBJECT_LIST_FIELD:
+                primitive[name] = [item.obj_to_primitive() for item in value]
+            else:
+                primitive[name] = field.to_primitive(self, name, value)
         if target_version:
             self.obj_make_compatible(primitive, target_version)
         obj = {'nova_object.name': self.obj_name(),
                'nova_object.namespace': 'nova',
                'nova_object.version': target_version or self.VERSION,
                'nova_object.data': primitive}
-        if self.obj_what_changed():
-            obj['nova_object.changes'] = list(self.obj_what_changed())
+        changes = self.obj_what_changed()
+        if changes:
+            obj['nova_object.changes'] = sorted(changes)
         return obj
 
     def obj_set_defaults(self, *attrs):
@@ -515,14 +624,31 @@ class NovaObject(object):
         """
         raise NotImplementedError(_('Cannot save anything in the base class'))
 
+    @property
+    def _changed_fields(self):
+        """The fields which have been set since the last reset."""
+        changes = self._obj_changes
+        return frozenset(name for name, bit
+                         in six.iteritems(self._obj_field_bits)
+                         if changes & bit)
+
+    @_changed_fields.setter
+    def _changed_fields(self, names):
+        changes = 0
+        for name in names:
+            changes |= self._obj_field_bits.get(name, 0)
+        self._obj_changes = changes
+
     def obj_what_changed(self):
         """Returns a set of fields that have been modified."""
         changes = set(self._changed_fields)
-        for field in self.fields:
-            if (self.obj_attr_is_set(field) and
-                    isinstance(getattr(self, field), NovaObject) and
-                    getattr(self, field).obj_what_changed()):
-                changes.add(field)
+        for name, attrname, kind, field in self._obj_primitive_plan:
+            # Values of primitive fields can't hold objects
+            if kind == _PRIMITIVE_FIELD:
+                continue
+            value = getattr(self, attrname, None)
+            if isinstance(value, NovaObject) and value.obj_what_changed():
+                changes.add(name)
         return changes
 
     def obj_get_changes(self):
@@ -571,9 +697,10 @@ class NovaObject(object):
                         thing.obj_reset_changes(recursive=True)
 
         if fields:
-            self._changed_fields -= set(fields)
+            for field in fields:
+                self._obj_changes &= ~self._obj_field_bits.get(field, 0)
         else:
-            self._changed_fields.clear()
+            self._obj_changes = 0
 
     def obj_attr_is_set(self, attrname):
         """Test object to see if attrname is present.
@@ -720,7 +847,7 @@ class ObjectListBase(object):
         super(ObjectListBase, self).__init__(*args, **kwargs)
         if 'objects' not in kwargs:
             self.objects = []
-            self._changed_fields.discard('objects')
+            self._obj_changes &= ~self._obj_field_bits['objects']
 
     def __iter__(self):
         """List iterator interface."""
@@ -827,7 +954,9 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
             return iterable([action_fn(context, value) for value in values])
 
     def serialize_entity(self, context, entity):
-        if isinstance(entity, (tuple, list, set, dict)):
+        if isinstance(entity, NovaObject):
+            entity = entity.obj_to_primitive()
+        elif isinstance(entity, (tuple, list, set, dict)):
             entity = self._process_iterable(context, self.serialize_entity,
                                             entity)
         elif (hasattr(entity, 'obj_to_primitive') and
@@ -13,6 +13,7 @@
 #    under the License.
 
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 
 from nova import db
 from nova import exception
@@ -37,7 +38,8 @@ class ComputeNode(base.NovaPersistentObject, base.NovaObject,
     # Version 1.8: Added get_by_host_and_nodename()
     # Version 1.9: Added pci_device_pools
     # Version 1.10: Added get_first_node_by_host_for_old_compat()
-    VERSION = '1.10'
+    # Version 1.11: Added generation field and claim_resources()
+    VERSION = '1.11'
 
     fields = {
         'id': fields.IntegerField(read_only=True),
@@ -69,6 +71,7 @@ class ComputeNode(base.NovaPersistentObject, base.NovaObject,
         # pci_stats field in the database
         'pci_device_pools': fields.ObjectField('PciDevicePoolList',
                                                nullable=True),
+        'generation': fields.IntegerField(),
         }
 
     obj_relationships = {
@@ -79,6 +82,8 @@ class ComputeNode(base.NovaPersistentObject, base.NovaObject,
     def obj_make_compatible(self, primitive, target_version):
         super(ComputeNode, self).obj_make_compatible(primitive, target_version)
         target_version = utils.convert_version_to_tuple(target_version)
+        if target_version < (1, 11) and 'generation' in primitive:
+            del primitive['generation']
         if target_version < (1, 7) and 'host' in primitive:
             del primitive['host']
         if target_version < (1, 5) and 'numa_topology' in primitive:
@@ -125,11 +130,17 @@ class ComputeNode(base.NovaPersistentObject, base.NovaObject,
             'supported_hv_specs',
             'host',
             'pci_device_pools',
+            'generation',
             ])
         fields = set(compute.fields) - special_cases
         for key in fields:
             compute[key] = db_compute[key]
 
+        # Left unset for the records not read from the database, which
+        # can't be claimed on.
+        if 'generation' in db_compute:
+            compute['generation'] = db_compute['generation']
+
         stats = db_compute['stats']
         if stats:
             compute['stats'] = jsonutils.loads(stats)
@@ -205,6 +216,16 @@ class ComputeNode(base.NovaPersistentObject, base.NovaObject,
         # Arbitrarily returning the first node.
         return computes[0]
 
+    @base.remotable_classmethod
+    def claim_resources(cls, context, compute_id, generation, memory_mb,
+                        vcpus, local_gb):
+        """Consume resources of a compute node if it is still at the given
+        generation, raising ComputeNodeGenerationConflict otherwise.
+        """
+        db_compute = db.compute_node_claim(context, compute_id, generation,
+                                           memory_mb, vcpus, local_gb)
+        return cls._from_db_object(context, cls(), db_compute)
+
     @staticmethod
     def _convert_stats_to_db_format(updates):
         stats = updates.pop('stats', None)
@@ -283,7 +304,9 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
     # Version 1.8 ComputeNode version 1.8 + add get_all_by_host()
     # Version 1.9 ComputeNode version 1.9
     # Version 1.10 ComputeNode version 1.10
-    VERSION = '1.10'
+    # Version 1.11 Add _get_all_changed_since()
+    # Version 1.12 ComputeNode version 1.11
+    VERSION = '1.12'
     fields = {
         'objects': fields.ListOfObjectsField('ComputeNode'),
         }
@@ -300,6 +323,8 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         '1.8': '1.8',
         '1.9': '1.9',
         '1.10': '1.10',
+        '1.11': '1.10',
+        '1.12': '1.11',
         }
 
     @base.remotable_classmethod
@@ -308,6 +333,27 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @base.remotable_classmethod
+    def _get_all_changed_since(cls, context, since):
+        # The timestamp string is converted back to a timezone-aware
+        # datetime object for the DB API call.
+        since = timeutils.parse_isotime(since)
+        db_computes = db.compute_node_get_all_changed_since(context, since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
+    @classmethod
+    def get_all_changed_since(cls, context, since):
+        """Get the compute nodes created, updated or deleted since a time.
+
+        Soft-deleted compute nodes are returned as well, with their deleted
+        field set, so that callers caching compute nodes can evict them.
+        """
+        # The datetime object is converted to a string primitive for the
+        # remote call, keeping the subsecond part so that no update is missed.
+        since = timeutils.isotime(since, subsecond=True)
+        return cls._get_all_changed_since(context, since)
+
     @base.remotable_classmethod
     def get_by_hypervisor(cls, context, hypervisor_match):
         db_computes = db.compute_node_search_by_hypervisor(context,
@@ -102,6 +102,10 @@ class AbstractFieldType(object):
 
 
 class FieldType(AbstractFieldType):
+    # Set to True in a subclass whose values are their own primitive form,
+    # so that serializing them can skip to_primitive() and from_primitive()
+    is_primitive = False
+
     @staticmethod
     def coerce(obj, attr, value):
         return value
@@ -154,6 +158,10 @@ class Field(object):
     def read_only(self):
         return self._read_only
 
+    @property
+    def is_primitive(self):
+        return self._type.is_primitive
+
     def _null(self, obj, attr):
         if self.nullable:
             return None
@@ -237,6 +245,8 @@ class Field(object):
 
 
 class String(FieldType):
+    is_primitive = True
+
     @staticmethod
     def coerce(obj, attr, value):
         # FIXME(danms): We should really try to avoid the need to do this
@@ -271,6 +281,8 @@ class Enum(String):
 
 
 class UUID(FieldType):
+    is_primitive = True
+
     @staticmethod
     def coerce(obj, attr, value):
         # FIXME(danms): We should actually verify the UUIDness here
@@ -278,17 +290,23 @@ class UUID(FieldType):
 
 
 class Integer(FieldType):
+    is_primitive = True
+
     @staticmethod
     def coerce(obj, attr, value):
         return int(value)
 
 
 class Float(FieldType):
+    is_primitive = True
+
     def coerce(self, obj, attr, value):
         return float(value)
 
 
 class Boolean(FieldType):
+    is_primitive = True
+
     @staticmethod
     def coerce(obj, attr, value):
         return bool(value)
@@ -266,6 +266,10 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         'vcpu_model': [('1.19', '1.0')],
     }
 
+    # Set on the instances loaded with only some of their columns, which
+    # lazy-load all their other columns at once and can't be saved
+    _projected = False
+
     def __init__(self, *args, **kwargs):
         super(Instance, self).__init__(*args, **kwargs)
         self._reset_metadata_tracking()
@@ -296,8 +300,23 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         self = super(Instance, cls)._obj_from_primitive(context, objver,
                                                         primitive)
         self._reset_metadata_tracking()
+        self._projected = primitive.get('nova_object.projected', False)
         return self
 
+    def obj_to_primitive(self, target_version=None):
+        primitive = super(Instance, self).obj_to_primitive(
+            target_version=target_version)
+        # The projection is not a field, carry it along so that a
+        # projected instance stays read-only on the other side.
+        if self._projected:
+            primitive['nova_object.projected'] = True
+        return primitive
+
+    def __deepcopy__(self, memo):
+        nobj = super(Instance, self).__deepcopy__(memo)
+        nobj._projected = self._projected
+        return nobj
+
     def obj_make_compatible(self, primitive, target_version):
         super(Instance, self).obj_make_compatible(primitive, target_version)
         target_version = utils.convert_version_to_tuple(target_version)
@@ -473,6 +492,24 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
                 migrated_flavor = True
         return migrated_flavor
 
+    @staticmethod
+    def _from_db_projection(context, instance, db_inst):
+        """Converts the columns of a projected database entity to an object.
+
+        Only the fields of the columns selected are set on the instance.
+        """
+        instance._context = context
+        instance._projected = True
+        for field in db_inst:
+            if field == 'deleted':
+                instance.deleted = db_inst['deleted'] == db_inst['id']
+            elif field == 'cleaned':
+                instance.cleaned = db_inst['cleaned'] == 1
+            else:
+                instance[field] = db_inst[field]
+        instance.obj_reset_changes()
+        return instance
+
     @staticmethod
     def _from_db_object(context, instance, db_inst, expected_attrs=None):
         """Method to help with migration to objects.
@@ -550,8 +587,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             # sure we know that flavor and system_metadata have been
             # touched so that the next save will update them. We can remove
             # this when we remove _migrate_flavor().
-            instance._changed_fields.add('system_metadata')
-            instance._changed_fields.add('flavor')
+            instance._changed_fields |= set(['system_metadata', 'flavor'])
         return instance
 
     @base.remotable_classmethod
@@ -758,6 +794,10 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         of task_state/vm_state
 
         """
+        if self._projected:
+            raise exception.ObjectActionError(
+                action='save',
+                reason='only some of the instance fields are loaded')
 
         cell_type = cells_opts.get_cell_type()
         if cell_type == 'api' and self.cell_name:
@@ -891,6 +931,22 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
                 action='obj_load_attr',
                 reason='loading %s requires recursion' % attrname)
 
+    def _load_projected_columns(self):
+        # The instance may have been listed with deleted ones.
+        with utils.temporary_mutation(self._context, read_deleted='yes'):
+            instance = self.__class__.get_by_uuid(self._context,
+                                                  uuid=self.uuid,
+                                                  expected_attrs=[])
+        loaded = []
+        for field in self.fields:
+            if (field not in INSTANCE_OPTIONAL_ATTRS and
+                    not self.obj_attr_is_set(field) and
+                    instance.obj_attr_is_set(field)):
+                self[field] = instance[field]
+                loaded.append(field)
+        self._projected = False
+        self.obj_reset_changes(loaded)
+
     def _load_fault(self):
         self.fault = objects.InstanceFault.get_latest_for_instance(
             self._context, self.uuid)
@@ -960,7 +1016,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
                 db_vcpu_model)
 
     def obj_load_attr(self, attrname):
-        if attrname not in INSTANCE_OPTIONAL_ATTRS:
+        if attrname not in INSTANCE_OPTIONAL_ATTRS and not self._projected:
             raise exception.ObjectActionError(
                 action='obj_load_attr',
                 reason='attribute %s not lazy-loadable' % attrname)
@@ -987,7 +1043,10 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
 
         # NOTE(danms): We handle some fields differently here so that we
         # can be more efficient
-        if attrname == 'fault':
+        if attrname not in INSTANCE_OPTIONAL_ATTRS:
+            self._load_projected_columns()
+            return
+        elif attrname == 'fault':
             self._load_fault()
         elif attrname == 'numa_topology':
             self._load_numa_topology()
@@ -1093,7 +1152,10 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     # Version 1.13: Instance <= version 1.17
     # Version 1.14: Instance <= version 1.18
     # Version 1.15: Instance <= version 1.19
-    VERSION = '1.15'
+    # Version 1.16: Added get_by_filters_projected, whose instances carry
+    #               the unversioned nova_object.projected key in their
+    #               primitives
+    VERSION = '1.16'
 
     fields = {
         'objects': fields.ListOfObjectsField('Instance'),
@@ -1115,6 +1177,7 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         '1.13': '1.17',
         '1.14': '1.18',
         '1.15': '1.19',
+        '1.16': '1.19',
         }
 
     @base.remotable_classmethod
@@ -1135,6 +1198,39 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         return _make_instance_list(context, cls(), db_inst_list,
                                    expected_attrs)
 
+    @base.remotable_classmethod
+    def get_by_filters_projected(cls, context, filters, fields, limit=None,
+                                 marker=None, use_slave=False,
+                                 sort_keys=None, sort_dirs=None):
+        """Return the instances matching filters with only fields loaded.
+
+        fields must be fields of the instances columns, uuid being always
+        loaded. The instances returned can't be saved, and lazy-load all
+        their other columns at once when one of them is accessed, their
+        optional attributes being lazy-loaded as usual.
+        """
+        columns = set(fields) | set(['uuid'])
+        if 'deleted' in columns:
+            columns.add('id')
+        for field in columns:
+            if (field not in objects.Instance.fields or
+                    field in INSTANCE_OPTIONAL_ATTRS):
+                raise exception.ObjectActionError(
+                    action='get_by_filters_projected',
+                    reason='%s is not a column field' % field)
+
+        db_inst_list = db.instance_get_all_by_filters_sort(
+            context, filters, limit=limit, marker=marker,
+            use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs,
+            columns=sorted(columns))
+        inst_list = cls()
+        inst_list.objects = [
+            objects.Instance._from_db_projection(
+                context, objects.Instance(context), db_inst)
+            for db_inst in db_inst_list]
+        inst_list.obj_reset_changes()
+        return inst_list
+
     @base.remotable_classmethod
     def get_by_host(cls, context, host, expected_attrs=None, use_slave=False):
         db_inst_list = db.instance_get_all_by_host(
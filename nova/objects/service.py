@@ -38,7 +38,8 @@ class Service(base.NovaPersistentObject, base.NovaObject,
     # Version 1.7: ComputeNode version 1.8
     # Version 1.8: ComputeNode version 1.9
     # Version 1.9: ComputeNode version 1.10
-    VERSION = '1.9'
+    # Version 1.10: ComputeNode version 1.11
+    VERSION = '1.10'
 
     fields = {
         'id': fields.IntegerField(read_only=True),
@@ -54,7 +55,8 @@ class Service(base.NovaPersistentObject, base.NovaObject,
 
     obj_relationships = {
         'compute_node': [('1.1', '1.4'), ('1.3', '1.5'), ('1.5', '1.6'),
-                         ('1.7', '1.8'), ('1.8', '1.9'), ('1.9', '1.10')],
+                         ('1.7', '1.8'), ('1.8', '1.9'), ('1.9', '1.10'),
+                         ('1.10', '1.11')],
     }
 
     @staticmethod
@@ -150,7 +152,8 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
     # Version 1.5: Service version 1.7
     # Version 1.6: Service version 1.8
     # Version 1.7: Service version 1.9
-    VERSION = '1.7'
+    # Version 1.8: Service version 1.10
+    VERSION = '1.8'
 
     fields = {
         'objects': fields.ListOfObjectsField('Service'),
@@ -165,6 +168,7 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
         '1.5': '1.7',
         '1.6': '1.8',
         '1.7': '1.9',
+        '1.8': '1.10',
         }
 
     @base.remotable_classmethod
@@ -14,7 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import copy
+import collections
 
 from oslo_log import log as logging
 
@@ -59,20 +59,64 @@ class PciDeviceStats(object):
         self.pools = [pci_pool.to_dict()
                       for pci_pool in stats] if stats else []
         self.pools.sort(self.pool_cmp)
+        self._invalidate_index()
+
+    def _invalidate_index(self):
+        """Drop the pool indexes, to be called when pools come and go."""
+        self._pools_by_keys = None
+        self._positions_by_ids = None
+
+    def _build_index(self):
+        # Positions of the pools by vendor id, and by vendor and product
+        # ids, so that request specs only look at the pools they may match.
+        positions_by_ids = collections.defaultdict(list)
+        pools_by_keys = {}
+        for position, pool in enumerate(self.pools):
+            vendor_id = pool.get('vendor_id')
+            positions_by_ids[vendor_id].append(position)
+            positions_by_ids[(vendor_id, pool.get('product_id'))].append(
+                position)
+            pools_by_keys.setdefault(self._get_pool_keys(pool), pool)
+        self._positions_by_ids = positions_by_ids
+        self._pools_by_keys = pools_by_keys
 
-    def _equal_properties(self, dev, entry, matching_keys):
-        return all(dev.get(prop) == entry.get(prop)
-                   for prop in matching_keys)
+    @staticmethod
+    def _get_pool_keys(pool):
+        return frozenset((k, v) for k, v in pool.iteritems()
+                         if k not in ('count', 'devices'))
 
     def _find_pool(self, dev_pool):
         """Return the first pool that matches dev."""
-        for pool in self.pools:
-            pool_keys = pool.copy()
-            del pool_keys['count']
-            del pool_keys['devices']
-            if (len(pool_keys.keys()) == len(dev_pool.keys()) and
-                self._equal_properties(dev_pool, pool_keys, dev_pool.keys())):
-                return pool
+        if self._pools_by_keys is None:
+            self._build_index()
+        return self._pools_by_keys.get(self._get_pool_keys(dev_pool))
+
+    def _get_candidate_pools(self, request_specs):
+        """Return the pools which may match the request specs, in order."""
+        if self._positions_by_ids is None:
+            self._build_index()
+        positions = set()
+        for spec in request_specs:
+            if 'vendor_id' not in spec:
+                return self.pools
+            if 'product_id' in spec:
+                key = (spec['vendor_id'], spec['product_id'])
+            else:
+                key = spec['vendor_id']
+            positions.update(self._positions_by_ids.get(key, ()))
+        return [self.pools[position] for position in sorted(positions)]
+
+    def _get_matching_pools(self, request_specs, numa_cells=None):
+        """Return the pools matching the request specs, in order.
+
+        If numa_cells is provided then only the pools of those nodes, or
+        of no node, are returned.
+        """
+        pools = [pool for pool in self._get_candidate_pools(request_specs)
+                 if utils.pci_device_prop_match(pool, request_specs)]
+        if numa_cells:
+            pools = self._filter_pools_for_numa_cells(pools, numa_cells)
+        return pools
 
     def _create_pool_keys_from_dev(self, dev):
         """create a stats pool dict that this dev is supposed to be part of
@@ -101,6 +145,7 @@ class PciDeviceStats(object):
                 dev_pool['devices'] = []
                 self.pools.append(dev_pool)
                 self.pools.sort(self.pool_cmp)
+                self._invalidate_index()
                 pool = dev_pool
             pool['count'] += 1
             pool['devices'].append(dev)
@@ -128,7 +173,10 @@ class PciDeviceStats(object):
                 raise exception.PciDevicePoolEmpty(
                     compute_node_id=dev.compute_node_id, address=dev.address)
             pool['devices'].remove(dev)
+            num_pools = len(self.pools)
             self._decrease_pool_count(self.pools, pool)
+            if len(self.pools) != num_pools:
+                self._invalidate_index()
 
     def get_free_devs(self):
         free_devs = []
@@ -143,9 +191,7 @@ class PciDeviceStats(object):
             spec = request.spec
             # For now, keep the same algorithm as during scheduling:
             # a spec may be able to match multiple pools.
-            pools = self._filter_pools_for_spec(self.pools, spec)
-            if numa_cells:
-                pools = self._filter_pools_for_numa_cells(pools, numa_cells)
+            pools = self._get_matching_pools(spec, numa_cells)
             # Failed to allocate the required number of devices
             # Return the devices already allocated back to their pools
             if sum([pool['count'] for pool in pools]) < count:
@@ -174,36 +220,46 @@ class PciDeviceStats(object):
                     break
         return alloc_devices
 
-    @staticmethod
-    def _filter_pools_for_spec(pools, request_specs):
-        return [pool for pool in pools
-                if utils.pci_device_prop_match(pool, request_specs)]
-
     @staticmethod
     def _filter_pools_for_numa_cells(pools, numa_cells):
         # Some systems don't report numa node info for pci devices, in
         # that case None is reported in pci_device.numa_node, by adding None
         # to numa_cells we allow assigning those devices to instances with
         # numa topology
-        numa_cells = [None] + [cell.id for cell in numa_cells]
+        numa_nodes = set([None] + [cell.id for cell in numa_cells])
         # filter out pools which numa_node is not included in numa_cells
-        return [pool for pool in pools if any(utils.pci_device_prop_match(
-                                pool, [{'numa_node': cell}])
-                                              for cell in numa_cells)]
+        return [pool for pool in pools if pool.get('numa_node') in numa_nodes]
+
+    def _apply_request(self, request, numa_cells=None, counts=None):
+        """Take the devices of a request out of the matching pools.
 
-    def _apply_request(self, pools, request, numa_cells=None):
+        If counts is provided, the pool counts are read from and written to
+        it, keyed by pool id, instead of the pools themselves.
+        """
         count = request.count
-        matching_pools = self._filter_pools_for_spec(pools, request.spec)
-        if numa_cells:
-            matching_pools = self._filter_pools_for_numa_cells(matching_pools,
-                                                          numa_cells)
-        if sum([pool['count'] for pool in matching_pools]) < count:
-            return False
-        else:
+        matching_pools = self._get_matching_pools(request.spec, numa_cells)
+        if counts is None:
+            if sum([pool['count'] for pool in matching_pools]) < count:
+                return False
+            num_pools = len(self.pools)
             for pool in matching_pools:
-                count = self._decrease_pool_count(pools, pool, count)
+                count = self._decrease_pool_count(self.pools, pool, count)
                 if not count:
                     break
+            if len(self.pools) != num_pools:
+                self._invalidate_index()
+            return True
+
+        available = [counts.get(id(pool), pool['count'])
+                     for pool in matching_pools]
+        if sum(available) < count:
+            return False
+        for pool, pool_count in zip(matching_pools, available):
+            num_alloc = min(pool_count, count)
+            counts[id(pool)] = pool_count - num_alloc
+            count -= num_alloc
+            if not count:
+                break
         return True
 
     def support_requests(self, requests, numa_cells=None):
@@ -217,9 +273,9 @@ class PciDeviceStats(object):
         """
         # note (yjiang5): this function has high possibility to fail,
         # so no exception should be triggered for performance reason.
-        pools = copy.deepcopy(self.pools)
-        return all([self._apply_request(pools, r, numa_cells)
-                        for r in requests])
+        counts = {}
+        return all(self._apply_request(r, numa_cells, counts)
+                   for r in requests)
 
     def apply_requests(self, requests, numa_cells=None):
         """Apply PCI requests to the PCI stats.
@@ -229,8 +285,8 @@ class PciDeviceStats(object):
         If numa_cells is provided then only devices contained in
         those nodes are considered.
         """
-        if not all([self._apply_request(self.pools, r, numa_cells)
-                                            for r in requests]):
+        if not all([self._apply_request(r, numa_cells)
+                    for r in requests]):
             raise exception.PciDeviceRequestFailed(requests=requests)
 
     @staticmethod
@@ -248,3 +304,4 @@ class PciDeviceStats(object):
     def clear(self):
         """Clear all the stats maintained."""
         self.pools = []
+        self._invalidate_index()
@@ -19,13 +19,14 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import heapq
 import random
 
 from oslo_config import cfg
 from oslo_log import log as logging
 
 from nova import exception
-from nova.i18n import _
+from nova.i18n import _, _LW
 from nova import rpc
 from nova.scheduler import driver
 from nova.scheduler import scheduler_options
@@ -44,7 +45,33 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_incremental_multi_instance',
+                default=False,
+                help='When scheduling several instances in one request, '
+                     'filter and weigh all the hosts only for the first '
+                     'instance. For the next ones, only the host consumed '
+                     'by the previous instance is filtered and weighed '
+                     'again, the other hosts keeping their weights. '
+                     'Requests with a server group are always fully '
+                     'filtered for each instance.'),
+    cfg.BoolOpt('scheduler_claim_resources',
+                default=False,
+                help='Claim the RAM, vCPUs and disk of each instance on the '
+                     'compute node record of the chosen host, by a '
+                     'compare-and-swap on the generation of the record. '
+                     'When the record changed since the host was '
+                     'filtered, because of another scheduler or of the '
+                     'compute node itself, the host is refreshed and '
+                     'chosen again, instead of failing the build on the '
+                     'compute node. This allows running several '
+                     'schedulers without rescheduling storms.'),
+    cfg.IntOpt('scheduler_claim_max_retries',
+               default=3,
+               help='Number of times a host is chosen again for an '
+                    'instance after a claim conflict. Once exhausted, the '
+                    'last chosen host is used without claim, leaving the '
+                    'compute node to decide.'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -130,36 +157,48 @@ class FilterScheduler(driver.Scheduler):
         # are being scanned in a filter or weighing function.
         hosts = self._get_all_host_states(elevated)
 
-        selected_hosts = []
         num_instances = request_spec.get('num_instances', 1)
+        if (CONF.scheduler_incremental_multi_instance and num_instances > 1
+                and not update_group_hosts):
+            return self._schedule_incremental(elevated, hosts,
+                                              filter_properties,
+                                              instance_properties,
+                                              num_instances)
+
+        selected_hosts = []
         for num in xrange(num_instances):
-            # Filter local hosts based on requirements ...
-            hosts = self.host_manager.get_filtered_hosts(hosts,
-                    filter_properties, index=num)
-            if not hosts:
-                # Can't get any more locally.
-                break
+            for attempt in xrange(self._get_claim_attempts()):
+                # Filter local hosts based on requirements ...
+                hosts = self.host_manager.get_filtered_hosts(hosts,
+                        filter_properties, index=num)
+                if not hosts:
+                    break
 
-            LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
+                LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
 
-            weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                    filter_properties)
+                scheduler_host_subset_size = self._get_host_subset_size()
 
-            LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
+                # Only the best hosts are candidates, so don't sort the
+                # others.
+                weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                        filter_properties, limit=scheduler_host_subset_size)
 
-            scheduler_host_subset_size = CONF.scheduler_host_subset_size
-            if scheduler_host_subset_size > len(weighed_hosts):
-                scheduler_host_subset_size = len(weighed_hosts)
-            if scheduler_host_subset_size < 1:
-                scheduler_host_subset_size = 1
+                LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
 
-            chosen_host = random.choice(
-                weighed_hosts[0:scheduler_host_subset_size])
+                chosen_host = random.choice(
+                    weighed_hosts[0:scheduler_host_subset_size])
+                if self._claim_resources(elevated, chosen_host.obj,
+                                         instance_properties, attempt):
+                    break
+            if not hosts:
+                # Can't get any more locally.
+                break
             selected_hosts.append(chosen_host)
 
             # Now consume the resources so the filter/weights
             # will change for the next instance.
-            chosen_host.obj.consume_from_instance(instance_properties)
+            self.host_manager.consume_from_instance(
+                elevated, chosen_host.obj, instance_properties)
             if update_group_hosts is True:
                 # NOTE(sbauza): Group details are serialized into a list now
                 # that they are populated by the conductor, we need to
@@ -170,6 +209,113 @@ class FilterScheduler(driver.Scheduler):
                 filter_properties['group_hosts'].add(chosen_host.obj.host)
         return selected_hosts
 
+    def _schedule_incremental(self, context, hosts, filter_properties,
+                              instance_properties, num_instances):
+        """Select hosts for several instances, filtering and weighing all
+        the hosts only once.
+
+        The weighed hosts are kept in a heap. Once an instance is placed,
+        only its host is filtered and weighed again before being pushed
+        back to the heap, as the other hosts did not change.
+        """
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                filter_properties, index=0)
+        if not hosts:
+            return []
+
+        LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
+
+        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                filter_properties)
+
+        LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
+
+        # The position of each host in the filtered list breaks the ties,
+        # so that equally weighed hosts keep the order they would have
+        # been sorted in.
+        positions = {id(host): i for i, host in enumerate(hosts)}
+        heap = [(-weighed_host.weight, positions[id(weighed_host.obj)],
+                 weighed_host) for weighed_host in weighed_hosts]
+        heapq.heapify(heap)
+
+        def _push_back(entry, index):
+            # The weighers normalize this single host against the bounds
+            # they recorded while weighing all the hosts.
+            host_state = entry[2].obj
+            if self.host_manager.get_filtered_hosts([host_state],
+                    filter_properties, index=index):
+                reweighed_host = self.host_manager.get_weighed_hosts(
+                    [host_state], filter_properties)[0]
+                heapq.heappush(heap, (-reweighed_host.weight, entry[1],
+                                      reweighed_host))
+
+        scheduler_host_subset_size = self._get_host_subset_size()
+        selected_hosts = []
+        for num in xrange(num_instances):
+            chosen = None
+            for attempt in xrange(self._get_claim_attempts()):
+                if not heap:
+                    break
+                subset = [heapq.heappop(heap) for i in
+                          xrange(min(scheduler_host_subset_size, len(heap)))]
+                chosen = random.choice(subset)
+                for entry in subset:
+                    if entry is not chosen:
+                        heapq.heappush(heap, entry)
+                if self._claim_resources(context, chosen[2].obj,
+                                         instance_properties, attempt):
+                    break
+                # The host was refreshed from its compute node.
+                _push_back(chosen, num)
+                chosen = None
+            if chosen is None:
+                # Can't get any more locally.
+                break
+            chosen_host = chosen[2]
+            selected_hosts.append(chosen_host)
+
+            # Now consume the resources so the filter/weights
+            # will change for the next instance.
+            self.host_manager.consume_from_instance(
+                context, chosen_host.obj, instance_properties)
+            if num + 1 == num_instances:
+                break
+            _push_back(chosen, num + 1)
+        return selected_hosts
+
+    def _get_claim_attempts(self):
+        if not CONF.scheduler_claim_resources:
+            return 1
+        return max(CONF.scheduler_claim_max_retries, 0) + 1
+
+    def _claim_resources(self, context, host_state, instance_properties,
+                         attempt):
+        """Claim the resources of the instance on the chosen host, if the
+        scheduler claims are enabled.
+
+        Return False if the host has to be chosen again, because its
+        compute node changed since it was filtered.
+        """
+        if not CONF.scheduler_claim_resources:
+            return True
+        if host_state.claim_from_instance(context, instance_properties):
+            return True
+        if attempt + 1 >= self._get_claim_attempts():
+            LOG.warning(_LW("Could not claim resources on %(host)s after "
+                            "%(attempts)d attempts, leaving the claim to "
+                            "the compute node"),
+                        {'host': host_state, 'attempts': attempt + 1})
+            return True
+        LOG.debug("Claim conflict on %(host)s, choosing a host again",
+                  {'host': host_state})
+        return False
+
+    def _get_host_subset_size(self):
+        scheduler_host_subset_size = CONF.scheduler_host_subset_size
+        if scheduler_host_subset_size < 1:
+            scheduler_host_subset_size = 1
+        return scheduler_host_subset_size
+
     def _get_all_host_states(self, context):
         """Template method, so a subclass can implement caching."""
         return self.host_manager.get_all_host_states(context)
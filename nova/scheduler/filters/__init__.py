@@ -32,6 +32,17 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    @staticmethod
+    def _save_limits(host_columns, mask, key, limits):
+        """Save an oversubscription limit on the hosts selected by mask.
+
+        This is the vectorized counterpart of setting host_state.limits[key]
+        in host_passes().
+        """
+        hosts = host_columns.selected_objs(mask)
+        for host_state, limit in zip(hosts, limits[mask].tolist()):
+            host_state.limits[key] = limit
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
@@ -36,6 +36,9 @@ class DifferentHostFilter(AffinityFilter):
     # The hosts the instances are running on doesn't change within a request
     run_filter_once_per_request = True
 
+    # But they change between requests
+    cache_results = False
+
     def host_passes(self, host_state, filter_properties):
         context = filter_properties['context']
         scheduler_hints = filter_properties.get('scheduler_hints') or {}
@@ -44,6 +47,8 @@ class DifferentHostFilter(AffinityFilter):
         if isinstance(affinity_uuids, six.string_types):
             affinity_uuids = [affinity_uuids]
         if affinity_uuids:
+            if host_state.instances is not None:
+                return host_state.instances.isdisjoint(affinity_uuids)
             return not self.compute_api.get_all(context,
                                                 {'host': host_state.host,
                                                  'uuid': affinity_uuids,
@@ -60,6 +65,9 @@ class SameHostFilter(AffinityFilter):
     # The hosts the instances are running on doesn't change within a request
     run_filter_once_per_request = True
 
+    # But they change between requests
+    cache_results = False
+
     def host_passes(self, host_state, filter_properties):
         context = filter_properties['context']
         scheduler_hints = filter_properties.get('scheduler_hints') or {}
@@ -68,6 +76,8 @@ class SameHostFilter(AffinityFilter):
         if isinstance(affinity_uuids, six.string_types):
             affinity_uuids = [affinity_uuids]
         if affinity_uuids:
+            if host_state.instances is not None:
+                return not host_state.instances.isdisjoint(affinity_uuids)
             return self.compute_api.get_all(context, {'host': host_state.host,
                                                       'uuid': affinity_uuids,
                                                       'deleted': False})
@@ -102,6 +112,10 @@ class _GroupAntiAffinityFilter(AffinityFilter):
     """Schedule the instance on a different host from a set of group
     hosts.
     """
+
+    # The group hosts change as the instances of the group are placed
+    cache_results = False
+
     def host_passes(self, host_state, filter_properties):
         # Only invoke the filter is 'anti-affinity' is configured
         policies = filter_properties.get('group_policies', [])
@@ -128,6 +142,10 @@ class ServerGroupAntiAffinityFilter(_GroupAntiAffinityFilter):
 class _GroupAffinityFilter(AffinityFilter):
     """Schedule the instance on to host from a set of group hosts.
     """
+
+    # The group hosts change as the instances of the group are placed
+    cache_results = False
+
     def host_passes(self, host_state, filter_properties):
         # Only invoke the filter is 'affinity' is configured
         policies = filter_properties.get('group_policies', [])
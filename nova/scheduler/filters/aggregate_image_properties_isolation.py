@@ -49,8 +49,8 @@ class AggregateImagePropertiesIsolation(filters.BaseHostFilter):
         spec = filter_properties.get('request_spec', {})
         image_props = spec.get('image', {}).get('properties', {})
         context = filter_properties['context']
-        metadata = utils.aggregate_metadata_get_by_host(context,
-                                                        host_state.host)
+        metadata = utils.aggregate_metadata_for_host(context,
+                                                     host_state)
 
         for key, options in metadata.iteritems():
             if (cfg_namespace and
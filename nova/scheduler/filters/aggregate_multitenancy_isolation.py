@@ -41,9 +41,9 @@ class AggregateMultiTenancyIsolation(filters.BaseHostFilter):
         tenant_id = props.get('project_id')
 
         context = filter_properties['context']
-        metadata = utils.aggregate_metadata_get_by_host(context,
-                                                        host_state.host,
-                                                        key="filter_tenant_id")
+        metadata = utils.aggregate_metadata_for_host(context,
+                                                     host_state,
+                                                     key="filter_tenant_id")
 
         if metadata != {}:
             if tenant_id not in metadata["filter_tenant_id"]:
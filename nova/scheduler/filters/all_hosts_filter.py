@@ -23,5 +23,7 @@ class AllHostsFilter(filters.BaseHostFilter):
     # list of hosts doesn't change within a request
     run_filter_once_per_request = True
 
+    process_safe = True
+
     def host_passes(self, host_state, filter_properties):
         return True
@@ -34,6 +34,9 @@ class ComputeFilter(filters.BaseHostFilter):
     # Host state does not change within a request
     run_filter_once_per_request = True
 
+    # Whether the service is up depends on the current time
+    cache_results = False
+
     def host_passes(self, host_state, filter_properties):
         """Returns True for only active compute nodes."""
         service = host_state.service
@@ -37,9 +37,20 @@ CONF.register_opt(cpu_allocation_ratio_opt)
 
 class BaseCoreFilter(filters.BaseHostFilter):
 
+    vectorized = True
+    process_safe = True
+
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         raise NotImplementedError
 
+    def _get_cpu_allocation_ratios(self, host_columns, filter_properties):
+        """Return the cpu allocation ratio of every host, as an array or a
+        single value shared by all of them.
+        """
+        return host_columns.values(
+            lambda host_state: self._get_cpu_allocation_ratio(
+                host_state, filter_properties))
+
     def host_passes(self, host_state, filter_properties):
         """Return True if host has sufficient CPU cores."""
         instance_type = filter_properties.get('instance_type')
@@ -73,6 +84,31 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
         return True
 
+    def filter_batch(self, host_columns, filter_properties):
+        """Return hosts with sufficient CPU cores."""
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return host_columns.full(True)
+
+        vcpus_total = host_columns['vcpus_total']
+        # Fail safe for hosts without VCPUs set (0, or None stored as NaN)
+        broken = (vcpus_total == 0) | (vcpus_total != vcpus_total)
+        if broken.any():
+            LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
+
+        instance_vcpus = instance_type['vcpus']
+        cpu_allocation_ratio = self._get_cpu_allocation_ratios(
+            host_columns, filter_properties)
+        vcpus_total = vcpus_total * cpu_allocation_ratio
+        free_vcpus = vcpus_total - host_columns['vcpus_used']
+        passes = broken | (free_vcpus >= instance_vcpus)
+
+        # Only provide a VCPU limit to compute if the virt driver is reporting
+        # an accurate count of installed VCPUs. (XenServer driver does not)
+        self._save_limits(host_columns, passes & (vcpus_total > 0), 'vcpu',
+                          vcpus_total)
+        return passes
+
 
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
@@ -80,6 +116,9 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         return CONF.cpu_allocation_ratio
 
+    def _get_cpu_allocation_ratios(self, host_columns, filter_properties):
+        return CONF.cpu_allocation_ratio
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -87,13 +126,13 @@ class AggregateCoreFilter(BaseCoreFilter):
     Fall back to global cpu_allocation_ratio if no per-aggregate setting found.
     """
 
+    # The aggregates may be read from the database
+    process_safe = False
+
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
+        aggregate_vals = utils.aggregate_values_for_host(
             filter_properties['context'],
-            host_state.host,
+            host_state,
             'cpu_allocation_ratio')
         try:
             ratio = utils.validate_num_values(
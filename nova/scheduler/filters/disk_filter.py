@@ -32,9 +32,18 @@ CONF.register_opt(disk_allocation_ratio_opt)
 class DiskFilter(filters.BaseHostFilter):
     """Disk Filter with over subscription flag."""
 
+    vectorized = True
+    process_safe = True
+
     def _get_disk_allocation_ratio(self, host_state, filter_properties):
         return CONF.disk_allocation_ratio
 
+    def _get_disk_allocation_ratios(self, host_columns, filter_properties):
+        """Return the disk allocation ratio of every host, as an array or a
+        single value shared by all of them.
+        """
+        return CONF.disk_allocation_ratio
+
     def host_passes(self, host_state, filter_properties):
         """Filter based on disk usage."""
         instance_type = filter_properties.get('instance_type')
@@ -64,6 +73,27 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def filter_batch(self, host_columns, filter_properties):
+        """Filter based on disk usage."""
+        instance_type = filter_properties.get('instance_type')
+        requested_disk = (1024 * (instance_type['root_gb'] +
+                                 instance_type['ephemeral_gb']) +
+                         instance_type['swap'])
+
+        total_usable_disk_mb = host_columns['total_usable_disk_gb'] * 1024
+
+        disk_allocation_ratio = self._get_disk_allocation_ratios(
+            host_columns, filter_properties)
+
+        disk_mb_limit = total_usable_disk_mb * disk_allocation_ratio
+        used_disk_mb = total_usable_disk_mb - host_columns['free_disk_mb']
+        usable_disk_mb = disk_mb_limit - used_disk_mb
+        passes = usable_disk_mb >= requested_disk
+
+        self._save_limits(host_columns, passes, 'disk_gb',
+                          disk_mb_limit / 1024)
+        return passes
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -72,13 +102,18 @@ class AggregateDiskFilter(DiskFilter):
     found.
     """
 
+    # The aggregates may be read from the database
+    process_safe = False
+
+    def _get_disk_allocation_ratios(self, host_columns, filter_properties):
+        return host_columns.values(
+            lambda host_state: self._get_disk_allocation_ratio(
+                host_state, filter_properties))
+
     def _get_disk_allocation_ratio(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
+        aggregate_vals = utils.aggregate_values_for_host(
             filter_properties['context'],
-            host_state.host,
+            host_state,
             'disk_allocation_ratio')
         try:
             ratio = utils.validate_num_values(
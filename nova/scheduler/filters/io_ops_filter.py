@@ -36,9 +36,18 @@ CONF.register_opt(max_io_ops_per_host_opt)
 class IoOpsFilter(filters.BaseHostFilter):
     """Filter out hosts with too many concurrent I/O operations."""
 
+    vectorized = True
+    process_safe = True
+
     def _get_max_io_ops_per_host(self, host_state, filter_properties):
         return CONF.max_io_ops_per_host
 
+    def _get_max_io_ops_per_hosts(self, host_columns, filter_properties):
+        """Return the max I/O operations of every host, as an array or a
+        single value shared by all of them.
+        """
+        return CONF.max_io_ops_per_host
+
     def host_passes(self, host_state, filter_properties):
         """Use information about current vm and task states collected from
         compute node statistics to decide whether to filter.
@@ -54,6 +63,11 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def filter_batch(self, host_columns, filter_properties):
+        max_io_ops = self._get_max_io_ops_per_hosts(host_columns,
+                                                    filter_properties)
+        return host_columns['num_io_ops'] < max_io_ops
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -61,13 +75,18 @@ class AggregateIoOpsFilter(IoOpsFilter):
     Fall back to global max_io_ops_per_host if no per-aggregate setting found.
     """
 
+    # The aggregates may be read from the database
+    process_safe = False
+
+    def _get_max_io_ops_per_hosts(self, host_columns, filter_properties):
+        return host_columns.values(
+            lambda host_state: self._get_max_io_ops_per_host(
+                host_state, filter_properties))
+
     def _get_max_io_ops_per_host(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
+        aggregate_vals = utils.aggregate_values_for_host(
             filter_properties['context'],
-            host_state.host,
+            host_state,
             'max_io_ops_per_host')
         try:
             value = utils.validate_num_values(
@@ -14,6 +14,7 @@
 #    under the License.
 
 
+import collections
 import operator
 
 from oslo_serialization import jsonutils
@@ -21,11 +22,25 @@ import six
 
 from nova.scheduler import filters
 
+# Number of distinct queries whose compiled form is kept
+MAX_COMPILED_QUERIES = 64
+
 
 class JsonFilter(filters.BaseHostFilter):
     """Host Filter to allow simple JSON-based grammar for
     selecting hosts.
+
+    Queries are compiled once into functions of the host state, with the
+    capability lookups resolved to attribute accessors, and the most
+    recently used ones are cached.
     """
+
+    process_safe = True
+
+    def __init__(self):
+        super(JsonFilter, self).__init__()
+        self._compiled_queries = collections.OrderedDict()
+
     def _op_compare(self, args, op):
         """Returns True if the specified operator can successfully
         compare the first item in the args with all the rest. Will
@@ -88,11 +103,14 @@ class JsonFilter(filters.BaseHostFilter):
         'and': _and,
     }
 
-    def _parse_string(self, string, host_state):
+    def _compile_string(self, string):
         """Strings prefixed with $ are capability lookups in the
         form '$variable' where 'variable' is an attribute in the
         HostState class.  If $variable is a dictionary, you may
         use: $variable.dictkey
+
+        Return a function looking the capability up in a host state, or
+        the string itself if it is not a capability lookup.
         """
         if not string:
             return None
@@ -100,31 +118,63 @@ class JsonFilter(filters.BaseHostFilter):
             return string
 
         path = string[1:].split(".")
-        obj = getattr(host_state, path[0], None)
-        if obj is None:
-            return None
-        for item in path[1:]:
-            obj = obj.get(item, None)
-            if obj is None:
-                return None
-        return obj
-
-    def _process_filter(self, query, host_state):
-        """Recursively parse the query structure."""
+        name = path[0]
+        keys = path[1:]
+
+        def _lookup(host_state):
+            obj = getattr(host_state, name, None)
+            for key in keys:
+                if obj is None:
+                    return None
+                obj = obj.get(key, None)
+            return obj
+        return _lookup
+
+    def _compile_filter(self, query):
+        """Recursively compile the query structure into a function of the
+        host state returning the result of the query.
+        """
         if not query:
-            return True
+            return lambda host_state: True
         cmd = query[0]
         method = self.commands[cmd]
-        cooked_args = []
+        # (is_lookup, value or lookup function) of each argument, in order
+        args = []
         for arg in query[1:]:
             if isinstance(arg, list):
-                arg = self._process_filter(arg, host_state)
+                arg = self._compile_filter(arg)
             elif isinstance(arg, six.string_types):
-                arg = self._parse_string(arg, host_state)
+                arg = self._compile_string(arg)
             if arg is not None:
+                args.append((callable(arg), arg))
+
+        if not any(is_lookup for is_lookup, value in args):
+            cooked_args = [value for is_lookup, value in args]
+            return lambda host_state: method(self, cooked_args)
+
+        def _evaluate(host_state):
+            cooked_args = []
+            for is_lookup, arg in args:
+                if is_lookup:
+                    arg = arg(host_state)
+                    if arg is None:
+                        continue
                 cooked_args.append(arg)
-        result = method(self, cooked_args)
-        return result
+            return method(self, cooked_args)
+        return _evaluate
+
+    def _get_compiled_query(self, query):
+        """Return the compiled query, from the cache if it was recently
+        compiled.
+        """
+        compiled = self._compiled_queries.pop(query, None)
+        if compiled is None:
+            compiled = self._compile_filter(jsonutils.loads(query))
+            if len(self._compiled_queries) >= MAX_COMPILED_QUERIES:
+                # Evict the least recently used query
+                self._compiled_queries.popitem(last=False)
+        self._compiled_queries[query] = compiled
+        return compiled
 
     def host_passes(self, host_state, filter_properties):
         """Return a list of hosts that can fulfill the requirements
@@ -140,7 +190,7 @@ class JsonFilter(filters.BaseHostFilter):
         # NOTE(comstud): Not checking capabilities or service for
         # enabled/disabled so that a provided json filter can decide
 
-        result = self._process_filter(jsonutils.loads(query), host_state)
+        result = self._get_compiled_query(query)(host_state)
         if isinstance(result, list):
             # If any succeeded, include the host
             result = any(result)
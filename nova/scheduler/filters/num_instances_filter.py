@@ -33,9 +33,18 @@ CONF.register_opt(max_instances_per_host_opt)
 class NumInstancesFilter(filters.BaseHostFilter):
     """Filter out hosts with too many instances."""
 
+    vectorized = True
+    process_safe = True
+
     def _get_max_instances_per_host(self, host_state, filter_properties):
         return CONF.max_instances_per_host
 
+    def _get_max_instances_per_hosts(self, host_columns, filter_properties):
+        """Return the max instances of every host, as an array or a single
+        value shared by all of them.
+        """
+        return CONF.max_instances_per_host
+
     def host_passes(self, host_state, filter_properties):
         num_instances = host_state.num_instances
         max_instances = self._get_max_instances_per_host(
@@ -48,6 +57,11 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def filter_batch(self, host_columns, filter_properties):
+        max_instances = self._get_max_instances_per_hosts(host_columns,
+                                                          filter_properties)
+        return host_columns['num_instances'] < max_instances
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -56,13 +70,18 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
     found.
     """
 
+    # The aggregates may be read from the database
+    process_safe = False
+
+    def _get_max_instances_per_hosts(self, host_columns, filter_properties):
+        return host_columns.values(
+            lambda host_state: self._get_max_instances_per_host(
+                host_state, filter_properties))
+
     def _get_max_instances_per_host(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solutnumn here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
+        aggregate_vals = utils.aggregate_values_for_host(
             filter_properties['context'],
-            host_state.host,
+            host_state,
             'max_instances_per_host')
         try:
             value = utils.validate_num_values(
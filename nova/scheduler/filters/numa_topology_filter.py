@@ -23,12 +23,19 @@ CONF.import_opt('ram_allocation_ratio', 'nova.scheduler.filters.ram_filter')
 class NUMATopologyFilter(filters.BaseHostFilter):
     """Filter on requested NUMA topology."""
 
+    # The instance topology fitted to the host is set on the request
+    cache_results = False
+
     def host_passes(self, host_state, filter_properties):
         ram_ratio = CONF.ram_allocation_ratio
         cpu_ratio = CONF.cpu_allocation_ratio
         request_spec = filter_properties.get('request_spec', {})
         instance = request_spec.get('instance_properties', {})
         requested_topology = hardware.instance_topology_from_instance(instance)
+        if requested_topology and not hardware.numa_capacity_may_fit(
+                host_state.numa_capacity, requested_topology,
+                cpu_ratio=cpu_ratio, ram_ratio=ram_ratio):
+            return False
         host_topology, _fmt = hardware.host_topology_and_format_from_host(
                 host_state)
         pci_requests = filter_properties.get('pci_requests')
@@ -36,9 +36,20 @@ CONF.register_opt(ram_allocation_ratio_opt)
 
 class BaseRamFilter(filters.BaseHostFilter):
 
+    vectorized = True
+    process_safe = True
+
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         raise NotImplementedError
 
+    def _get_ram_allocation_ratios(self, host_columns, filter_properties):
+        """Return the ram allocation ratio of every host, as an array or a
+        single value shared by all of them.
+        """
+        return host_columns.values(
+            lambda host_state: self._get_ram_allocation_ratio(
+                host_state, filter_properties))
+
     def host_passes(self, host_state, filter_properties):
         """Only return hosts with sufficient available RAM."""
         instance_type = filter_properties.get('instance_type')
@@ -64,6 +75,24 @@ class BaseRamFilter(filters.BaseHostFilter):
         host_state.limits['memory_mb'] = memory_mb_limit
         return True
 
+    def filter_batch(self, host_columns, filter_properties):
+        """Only return hosts with sufficient available RAM."""
+        instance_type = filter_properties.get('instance_type')
+        requested_ram = instance_type['memory_mb']
+        total_usable_ram_mb = host_columns['total_usable_ram_mb']
+
+        ram_allocation_ratio = self._get_ram_allocation_ratios(
+            host_columns, filter_properties)
+
+        memory_mb_limit = total_usable_ram_mb * ram_allocation_ratio
+        used_ram_mb = total_usable_ram_mb - host_columns['free_ram_mb']
+        usable_ram = memory_mb_limit - used_ram_mb
+        passes = usable_ram >= requested_ram
+
+        # save oversubscription limit for compute node to test against:
+        self._save_limits(host_columns, passes, 'memory_mb', memory_mb_limit)
+        return passes
+
 
 class RamFilter(BaseRamFilter):
     """Ram Filter with over subscription flag."""
@@ -72,6 +101,9 @@ class RamFilter(BaseRamFilter):
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         return self.ram_allocation_ratio
 
+    def _get_ram_allocation_ratios(self, host_columns, filter_properties):
+        return self.ram_allocation_ratio
+
 
 class AggregateRamFilter(BaseRamFilter):
     """AggregateRamFilter with per-aggregate ram subscription flag.
@@ -79,13 +111,13 @@ class AggregateRamFilter(BaseRamFilter):
     Fall back to global ram_allocation_ratio if no per-aggregate setting found.
     """
 
+    # The aggregates may be read from the database
+    process_safe = False
+
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
+        aggregate_vals = utils.aggregate_values_for_host(
             filter_properties['context'],
-            host_state.host,
+            host_state,
             'ram_allocation_ratio')
 
         try:
@@ -25,6 +25,11 @@ class RetryFilter(filters.BaseHostFilter):
     purposes
     """
 
+    # The attempted hosts differ between otherwise identical requests
+    cache_results = False
+
+    process_safe = True
+
     def host_passes(self, host_state, filter_properties):
         """Skip nodes that have already been attempted."""
         retry = filter_properties.get('retry', None)
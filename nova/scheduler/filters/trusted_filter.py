@@ -257,6 +257,9 @@ class TrustedFilter(filters.BaseHostFilter):
     # The hosts the instances are running on doesn't change within a request
     run_filter_once_per_request = True
 
+    # The attestation service has its own cache
+    cache_results = False
+
     def host_passes(self, host_state, filter_properties):
         instance_type = filter_properties.get('instance_type', {})
         extra = instance_type.get('extra_specs', {})
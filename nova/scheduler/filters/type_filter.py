@@ -26,6 +26,9 @@ class TypeAffinityFilter(filters.BaseHostFilter):
     (spread) set to 1 (default).
     """
 
+    # The instances of the host are read from the database
+    cache_results = False
+
     def host_passes(self, host_state, filter_properties):
         """Dynamically limits hosts to one instance type
 
@@ -53,11 +56,8 @@ class AggregateTypeAffinityFilter(filters.BaseHostFilter):
     def host_passes(self, host_state, filter_properties):
         instance_type = filter_properties.get('instance_type')
 
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        aggregate_vals = utils.aggregate_values_from_db(
-            filter_properties['context'], host_state.host, 'instance_type')
+        aggregate_vals = utils.aggregate_values_for_host(
+            filter_properties['context'], host_state, 'instance_type')
 
         if not aggregate_vals:
             return True
@@ -49,6 +49,36 @@ def aggregate_metadata_get_by_host(context, host, key=None):
     return metadata
 
 
+def aggregate_values_for_host(context, host_state, key_name):
+    """Returns a set of values based on a metadata key for a host state.
+
+    The aggregates indexed on the host state by the HostManager are used,
+    falling back to the database when they were not indexed.
+    """
+    if host_state.aggregates is None:
+        return aggregate_values_from_db(context, host_state.host, key_name)
+    return set(aggr.metadata[key_name] for aggr in host_state.aggregates
+               if key_name in aggr.metadata)
+
+
+def aggregate_metadata_for_host(context, host_state, key=None):
+    """Returns a dict of all metadata for a host state.
+
+    The aggregates indexed on the host state by the HostManager are used,
+    falling back to the database when they were not indexed.
+    """
+    if host_state.aggregates is None:
+        return aggregate_metadata_get_by_host(context, host_state.host,
+                                              key=key)
+    metadata = collections.defaultdict(set)
+    for aggr in host_state.aggregates:
+        if key is not None and key not in aggr.metadata:
+            continue
+        for k, v in aggr.metadata.iteritems():
+            metadata[k].add(v)
+    return metadata
+
+
 def validate_num_values(vals, default=None, cast_to=int, based_on=min):
     """Returns a corretly casted value based on a set of values.
 
@@ -18,19 +18,26 @@ Manage hosts in the current zone.
 """
 
 import collections
+import datetime
+import itertools
+import multiprocessing
 import UserDict
 
+from eventlet import tpool
 import iso8601
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
+import six
 
 from nova.compute import task_states
 from nova.compute import vm_states
 from nova import exception
-from nova.i18n import _, _LI, _LW
+from nova import filters as base_filters
+from nova.i18n import _, _LE, _LI, _LW
 from nova import objects
+from nova.objects import base as obj_base
 from nova.pci import stats as pci_stats
 from nova.scheduler import filters
 from nova.scheduler import weights
@@ -59,6 +66,102 @@ host_manager_opts = [
     cfg.ListOpt('scheduler_weight_classes',
                 default=['nova.scheduler.weights.all_weighers'],
                 help='Which weight class names to use for weighing hosts'),
+    cfg.BoolOpt('scheduler_vectorized_filters',
+                default=False,
+                help='Run the filters supporting it (RamFilter, CoreFilter, '
+                     'DiskFilter, IoOpsFilter, NumInstancesFilter and their '
+                     'aggregate variants) on all the hosts at once, using '
+                     'NumPy arrays of the host resources. The other filters '
+                     'still run host by host. Requires NumPy to be '
+                     'installed.'),
+    cfg.BoolOpt('scheduler_adaptive_filter_order',
+                default=False,
+                help='Run the filters in the order minimizing the time '
+                     'spent filtering, as measured on the previous '
+                     'requests: cheap filters rejecting many hosts first, '
+                     'expensive filters last, so that they run on as few '
+                     'hosts as possible. When disabled, the filters run in '
+                     'the order they are listed in.'),
+    cfg.BoolOpt('scheduler_vectorized_weighers',
+                default=False,
+                help='Compute the weights of all the hosts at once, using '
+                     'NumPy arrays of the host resources for the weighers '
+                     'supporting it (RAMWeigher, IoOpsWeigher and '
+                     'MetricsWeigher). Requires NumPy to be installed.'),
+    cfg.BoolOpt('scheduler_index_aggregates',
+                default=True,
+                help='Load all the host aggregates once per request and '
+                     'attach them to the host states, so that the '
+                     'aggregate based filters look up the aggregates of '
+                     'a host in memory instead of querying the database '
+                     'for each host.'),
+    cfg.BoolOpt('scheduler_tracks_instance_changes',
+                default=False,
+                help='Keep the UUIDs of the instances of each host in '
+                     'memory, updated by the compute nodes when instances '
+                     'are built, deleted or migrated, so that the '
+                     'DifferentHostFilter and SameHostFilter don\'t query '
+                     'the database for each host. Must be set the same on '
+                     'the scheduler and compute nodes.'),
+    cfg.IntOpt('scheduler_instance_sync_interval',
+               default=600,
+               help='When scheduler_tracks_instance_changes is enabled, '
+                    'interval in seconds at which the instances of all the '
+                    'hosts are reloaded from the database, to recover from '
+                    'lost updates. Set to 0 to only load them once.'),
+    cfg.BoolOpt('scheduler_incremental_host_refresh',
+                default=False,
+                help='Keep the host states warm between requests and only '
+                     'fetch the compute nodes which were created, updated '
+                     'or deleted since the previous refresh, instead of '
+                     'loading every compute node from the database for '
+                     'each request.'),
+    cfg.IntOpt('scheduler_full_host_refresh_interval',
+               default=600,
+               help='When scheduler_incremental_host_refresh is enabled, '
+                    'number of seconds after which all compute nodes are '
+                    'reloaded from the database anyway. A value of 0 or '
+                    'less disables the periodic full refresh.'),
+    cfg.IntOpt('scheduler_host_refresh_margin',
+               default=10,
+               help='When scheduler_incremental_host_refresh is enabled, '
+                    'number of seconds subtracted from the latest compute '
+                    'node timestamp seen when asking for the changed '
+                    'compute nodes. The timestamps come from the clocks of '
+                    'the nodes writing them and transactions may commit '
+                    'out of order, so a change can be stored with a '
+                    'timestamp older than changes already seen.'),
+    cfg.IntOpt('scheduler_filter_shards',
+               default=1,
+               help='Number of shards the hosts are split into to be '
+                    'filtered in parallel. Every shard but the first one is '
+                    'filtered by a worker process forked for the request, '
+                    'while the scheduler filters the first one. A value of '
+                    '1 filters all the hosts in the scheduler process. The '
+                    'hosts are only sharded when all the filters to run '
+                    'are process safe, that is when none of them queries '
+                    'the database or other services, the workers '
+                    'inheriting the connections of the scheduler.'),
+    cfg.IntOpt('scheduler_filter_shard_min_hosts',
+               default=1000,
+               help='Minimum number of hosts in each shard when '
+                    'scheduler_filter_shards is greater than 1, so that '
+                    'fewer shards are used for small clouds, where forking '
+                    'the workers costs more than filtering the hosts.'),
+    cfg.IntOpt('scheduler_filter_cache_ttl',
+               default=0,
+               help='Number of seconds the results of the filters are kept '
+                    'for identical requests, such as the ones sent when '
+                    'scaling out a group of instances. Only the hosts whose '
+                    'state changed since are filtered again. The filters '
+                    'depending on anything else than the host state and '
+                    'the request are always run. A value of 0 disables the '
+                    'cache.'),
+    cfg.IntOpt('scheduler_filter_cache_size',
+               default=64,
+               help='Maximum number of distinct requests whose filter '
+                    'results are cached when scheduler_filter_cache_ttl is '
+                    'set.'),
     ]
 
 CONF = cfg.CONF
@@ -67,6 +170,17 @@ CONF.import_opt('compute_topic', 'nova.compute.rpcapi')
 
 LOG = logging.getLogger(__name__)
 
+# Keys of the request spec and of the instance properties which differ
+# between otherwise identical requests, and are left out of their
+# fingerprint
+_PER_INSTANCE_REQUEST_KEYS = frozenset([
+    'instance_uuids', 'num_instances', 'uuid', 'id', 'display_name',
+    'display_description', 'hostname', 'launch_index', 'reservation_id',
+    'created_at', 'updated_at'])
+
+# Generations of the host states
+_state_generations = itertools.count(1)
+
 
 class ReadOnlyDict(UserDict.IterableUserDict):
     """A read-only dict."""
@@ -126,6 +240,11 @@ class HostState(object):
         self.vcpus_used = 0
         self.numa_topology = None
 
+        # Capacity summary of the NUMA cells of the host, and the topology
+        # it was computed from
+        self._numa_capacity = None
+        self._numa_capacity_topology = None
+
         # Additional host information from the compute node stats:
         self.num_instances = 0
         self.num_io_ops = 0
@@ -144,11 +263,41 @@ class HostState(object):
         # Generic metrics from compute nodes
         self.metrics = {}
 
+        # Aggregates the host belongs to, or None when they were not
+        # indexed by the HostManager
+        self.aggregates = None
+
+        # UUIDs of the instances on the host, or None when they are not
+        # tracked by the HostManager
+        self.instances = None
+
+        # Record and generation of the compute node the host state was
+        # loaded from, used to claim resources on it
+        self.compute_id = None
+        self.generation = None
+
+        # Generation of the host state, telling whether the cached filter
+        # results of the host are current, and the version of the compute
+        # node record the state was last updated from. Generations are
+        # drawn from a counter shared by all the host states, so that a
+        # host state rebuilt for a node which went away never matches the
+        # results cached for the previous one.
+        self.state_generation = next(_state_generations)
+        self._compute_version = None
+        self._service_version = None
+
         self.updated = None
         if compute:
             self.update_from_compute_node(compute)
 
     def update_service(self, service):
+        # The heartbeat fields change at each report interval and are only
+        # looked at by the ComputeFilter, whose results are never cached.
+        service_version = {key: value for key, value in service.items()
+                           if key not in ('updated_at', 'report_count')}
+        if service_version != self._service_version:
+            self.state_generation = next(_state_generations)
+            self._service_version = service_version
         self.service = ReadOnlyDict(service)
 
     def _update_metrics_from_compute_node(self, compute):
@@ -172,11 +321,37 @@ class HostState(object):
             else:
                 LOG.warning(_LW("Metric name unknown of %r"), item)
 
+    @property
+    def numa_capacity(self):
+        """Capacity summary of the NUMA cells of the host, or None.
+
+        See hardware.numa_capacity_from_host_topology(). It is computed the
+        first time it is needed after the NUMA topology of the host changed,
+        that is after an update from a changed compute node or after an
+        instance was consumed.
+        """
+        if self._numa_capacity_topology is not self.numa_topology:
+            host_topology, _fmt = hardware.host_topology_and_format_from_host(
+                self)
+            if host_topology is None:
+                self._numa_capacity = None
+            else:
+                self._numa_capacity = (
+                    hardware.numa_capacity_from_host_topology(host_topology))
+            self._numa_capacity_topology = self.numa_topology
+        return self._numa_capacity
+
     def update_from_compute_node(self, compute):
         """Update information about a host from a ComputeNode object."""
         if (self.updated and compute.updated_at
                 and self.updated > compute.updated_at):
             return
+        compute_version = (compute.updated_at,
+                           compute.generation
+                           if compute.obj_attr_is_set('generation') else None)
+        if compute_version != self._compute_version:
+            self.state_generation = next(_state_generations)
+            self._compute_version = compute_version
         all_ram_mb = compute.memory_mb
 
         # Assume virtual size is all consumed by instances if use qcow2 disk.
@@ -203,7 +378,12 @@ class HostState(object):
         self.vcpus_total = compute.vcpus
         self.vcpus_used = compute.vcpus_used
         self.updated = compute.updated_at
-        self.numa_topology = compute.numa_topology
+        if compute.obj_attr_is_set('generation'):
+            self.compute_id = compute.id
+            self.generation = compute.generation
+        # An unchanged topology is kept as is, and so is its capacity.
+        if compute.numa_topology != self.numa_topology:
+            self.numa_topology = compute.numa_topology
         if compute.pci_device_pools is not None:
             self.pci_stats = pci_stats.PciDeviceStats(
                 compute.pci_device_pools)
@@ -247,6 +427,9 @@ class HostState(object):
         now = timeutils.utcnow()
         # NOTE(sbauza): Objects are UTC tz-aware by default
         self.updated = now.replace(tzinfo=iso8601.iso8601.Utc())
+        # The state no longer matches any compute node record.
+        self.state_generation = next(_state_generations)
+        self._compute_version = None
 
         # Track number of instances on host
         self.num_instances += 1
@@ -280,12 +463,72 @@ class HostState(object):
                 task_states.RESCUING]:
             self.num_io_ops += 1
 
+    def claim_from_instance(self, context, instance):
+        """Claim the resources of an instance on the compute node record.
+
+        The claim only succeeds if the compute node was not updated since
+        the host state was loaded from it. Otherwise the host state is
+        refreshed from the compute node and False is returned.
+        """
+        if self.compute_id is None or self.generation is None:
+            return True
+        try:
+            compute = objects.ComputeNode.claim_resources(
+                context, self.compute_id, self.generation,
+                memory_mb=instance['memory_mb'], vcpus=instance['vcpus'],
+                local_gb=instance['root_gb'] + instance['ephemeral_gb'])
+        except exception.ComputeNodeGenerationConflict:
+            compute = objects.ComputeNode.get_by_id(context, self.compute_id)
+            # What was consumed locally since the last refresh is now
+            # accounted for by the compute node, or lost to the other
+            # claims, so the record wins whatever its timestamp.
+            self.updated = None
+            self.update_from_compute_node(compute)
+            return False
+        self.generation = compute.generation
+        return True
+
     def __repr__(self):
         return ("(%s, %s) ram:%s disk:%s io_ops:%s instances:%s" %
                 (self.host, self.nodename, self.free_ram_mb, self.free_disk_mb,
                  self.num_io_ops, self.num_instances))
 
 
+class FilterResultCache(object):
+    """Results of the filters for recent requests, by request fingerprint.
+
+    The result for each host is stored along with the generation of the
+    host state it was computed from and the limits the filters set, so that
+    only the hosts which changed since are filtered again.
+    """
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self._entries = collections.OrderedDict()
+
+    def get(self, fingerprint):
+        """Return the results of a request, by host state key.
+
+        The returned dict is empty if the results are unknown or expired,
+        and is to be updated in place.
+        """
+        entry = self._entries.pop(fingerprint, None)
+        if entry is None or timeutils.is_older_than(entry[0], self.ttl):
+            entry = (timeutils.utcnow(), {})
+            if len(self._entries) >= self.size:
+                # Evict the least recently used request
+                self._entries.popitem(last=False)
+        self._entries[fingerprint] = entry
+        return entry[1]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class HostManager(object):
     """Base HostManager class."""
 
@@ -295,6 +538,22 @@ class HostManager(object):
 
     def __init__(self):
         self.host_state_map = {}
+        # Compute nodes known to the scheduler, keyed by id, and the DB
+        # timestamp up to which they are known to be current. Only used
+        # when scheduler_incremental_host_refresh is enabled.
+        self.compute_nodes = {}
+        self.compute_nodes_synced_at = None
+        self.last_full_refresh = None
+        # Aggregates by id, and ids of the aggregates of each host. Only
+        # used when scheduler_index_aggregates is enabled.
+        self.aggs_by_id = {}
+        self.host_aggregates_map = {}
+        self.aggregates_signature = None
+        # UUIDs of the instances by host, and host of each instance. Only
+        # used when scheduler_tracks_instance_changes is enabled.
+        self.host_instances_map = {}
+        self.instance_host_map = {}
+        self.instances_synced_at = None
         self.filter_handler = filters.HostFilterHandler()
         filter_classes = self.filter_handler.get_matching_classes(
                 CONF.scheduler_available_filters)
@@ -302,10 +561,26 @@ class HostManager(object):
         self.filter_obj_map = {}
         self.default_filters = self._choose_host_filters(
                 CONF.scheduler_default_filters)
+        self.vectorized_filters = CONF.scheduler_vectorized_filters
+        if self.vectorized_filters and base_filters.numpy is None:
+            LOG.warning(_LW("NumPy is not available, disabling vectorized "
+                            "filters"))
+            self.vectorized_filters = False
+        self.adaptive_filter_order = CONF.scheduler_adaptive_filter_order
+        self.vectorized_weighers = CONF.scheduler_vectorized_weighers
+        if self.vectorized_weighers and base_filters.numpy is None:
+            LOG.warning(_LW("NumPy is not available, disabling vectorized "
+                            "weighers"))
+            self.vectorized_weighers = False
         self.weight_handler = weights.HostWeightHandler()
         weigher_classes = self.weight_handler.get_matching_classes(
                 CONF.scheduler_weight_classes)
         self.weighers = [cls() for cls in weigher_classes]
+        self.filter_cache = None
+        if CONF.scheduler_filter_cache_ttl > 0:
+            self.filter_cache = FilterResultCache(
+                CONF.scheduler_filter_cache_ttl,
+                max(CONF.scheduler_filter_cache_size, 1))
 
     def _choose_host_filters(self, filter_cls_names):
         """Since the caller may specify which filters to use we need
@@ -405,13 +680,215 @@ class HostManager(object):
                     return name_to_cls_map.values()
             hosts = name_to_cls_map.itervalues()
 
+        if self.filter_cache is not None:
+            return self._get_filtered_hosts_cached(filters, hosts,
+                                                   filter_properties, index)
+        return self._run_filters(filters, hosts, filter_properties, index)
+
+    def _run_filters(self, filters, hosts, filter_properties, index):
+        if CONF.scheduler_filter_shards > 1:
+            return self._get_filtered_hosts_sharded(filters, hosts,
+                                                    filter_properties, index)
         return self.filter_handler.get_filtered_objects(filters,
-                hosts, filter_properties, index)
+                hosts, filter_properties, index,
+                vectorized=self.vectorized_filters,
+                reorder=self.adaptive_filter_order)
+
+    @staticmethod
+    def _get_request_fingerprint(filters, filter_properties, index):
+        """Return a string identifying the request as seen by the filters
+        whose results are cached, or None if it can't be serialized.
+        """
+        def _default(value):
+            if isinstance(value, obj_base.NovaObject):
+                return obj_base.obj_to_primitive(value)
+            if isinstance(value, (set, frozenset)):
+                return sorted(value)
+            return jsonutils.to_primitive(value, convert_instances=True)
+
+        request_spec = dict(filter_properties.get('request_spec') or {})
+        instance_properties = request_spec.pop('instance_properties', None)
+        request = {key: value
+                   for key, value in six.iteritems(filter_properties)
+                   if key not in ('context', 'request_spec')}
+        request['request_spec'] = {
+            key: value for key, value in six.iteritems(request_spec)
+            if key not in _PER_INSTANCE_REQUEST_KEYS}
+        request['instance_properties'] = {
+            key: value for key, value in six.iteritems(
+                instance_properties or {})
+            if key not in _PER_INSTANCE_REQUEST_KEYS}
+        request['filters'] = [filter.__class__.__name__
+                              for filter in filters if filter.cache_results]
+        request['index'] = index
+        try:
+            return jsonutils.dumps(request, sort_keys=True, default=_default)
+        except (TypeError, ValueError):
+            return None
+
+    def _get_filtered_hosts_cached(self, filters, hosts, filter_properties,
+                                   index):
+        """Filter the hosts, reusing the results of identical requests.
+
+        The filters whose results are cached run first, on the hosts which
+        changed since they were last filtered for the same request, and
+        then the other filters run on the hosts which passed.
+        """
+        cached_filters = [f for f in filters if f.cache_results]
+        other_filters = [f for f in filters if not f.cache_results]
+        fingerprint = None
+        if cached_filters and all(f.commutative for f in filters):
+            fingerprint = self._get_request_fingerprint(
+                filters, filter_properties, index)
+        if fingerprint is None:
+            return self._run_filters(filters, hosts, filter_properties, index)
+
+        hosts = list(hosts)
+        results = self.filter_cache.get(fingerprint)
+        stale_hosts = [host for host in hosts
+                       if results.get((host.host, host.nodename),
+                                      (None,))[0] != host.state_generation]
+        LOG.debug("Filtering %(stale)d of %(total)d host(s) with cached "
+                  "filters", {'stale': len(stale_hosts), 'total': len(hosts)})
+        if stale_hosts:
+            passed_hosts = self._run_filters(cached_filters, stale_hosts,
+                                             filter_properties, index)
+            if passed_hosts is None:
+                return None
+            passed = set(id(host) for host in passed_hosts)
+            for host in stale_hosts:
+                host_passes = id(host) in passed
+                results[(host.host, host.nodename)] = (
+                    host.state_generation, host_passes,
+                    dict(host.limits) if host_passes else None)
+
+        filtered_hosts = []
+        for host in hosts:
+            _generation, host_passes, limits = results[(host.host,
+                                                        host.nodename)]
+            if host_passes:
+                host.limits.update(limits)
+                filtered_hosts.append(host)
+        if other_filters and filtered_hosts:
+            return self._run_filters(other_filters, filtered_hosts,
+                                     filter_properties, index)
+        return filtered_hosts
+
+    def _get_filtered_hosts_sharded(self, filters, hosts, filter_properties,
+                                    index):
+        """Filter the hosts split into shards, in parallel.
+
+        The workers are forked for each request, so that they see the
+        current host states, including the resources consumed by the
+        previous requests, without having them sent over. They send back
+        the positions of the hosts passing the filters in their shard, the
+        limits set by the filters on those hosts and the filter statistics.
+        The hosts passing the filters are returned in the order they were
+        given, as if they were filtered at once. The hosts are filtered in
+        the scheduler process when any of the filters is not process safe.
+        """
+        hosts = list(hosts)
+        num_shards = min(CONF.scheduler_filter_shards,
+                         len(hosts) // max(
+                             CONF.scheduler_filter_shard_min_hosts, 1))
+        if self.adaptive_filter_order:
+            # Every shard has to run the filters in the same order.
+            filters = self.filter_handler.order_filters(filters)
+        if num_shards > 1:
+            unsafe_filters = [f.__class__.__name__ for f in filters
+                              if not f.process_safe]
+            if unsafe_filters:
+                LOG.debug("Not sharding the hosts, filters %s can't run in "
+                          "worker processes", ', '.join(unsafe_filters))
+                num_shards = 1
+        if num_shards <= 1:
+            return self._filter_shard(filters, hosts, filter_properties,
+                                      index)
+
+        shard_size = -(-len(hosts) // num_shards)
+        shards = [hosts[start:start + shard_size]
+                  for start in xrange(0, len(hosts), shard_size)]
+        workers = []
+        for shard in shards[1:]:
+            reader, writer = multiprocessing.Pipe(duplex=False)
+            worker = multiprocessing.Process(
+                target=self._run_filter_worker,
+                args=(writer, filters, shard, filter_properties, index))
+            worker.start()
+            writer.close()
+            workers.append((worker, reader, shard))
+
+        filtered_hosts = self._filter_shard(filters, shards[0],
+                                            filter_properties, index)
+        for worker, reader, shard in workers:
+            try:
+                # Wait for the worker in a native thread, not to block the
+                # other greenthreads of the scheduler.
+                result, filter_stats = tpool.execute(reader.recv)
+            except EOFError:
+                LOG.warning(_LW("Filter worker %(pid)s failed, filtering "
+                                "its %(count)d host(s) again"),
+                            {'pid': worker.pid, 'count': len(shard)})
+                result = None
+                shard_hosts = self._filter_shard(filters, shard,
+                                                 filter_properties, index)
+            else:
+                for cls_name, stats in six.iteritems(filter_stats):
+                    self.filter_handler.filter_stats.setdefault(
+                        cls_name, base_filters.FilterStats()).merge(stats)
+                shard_hosts = None
+                if result is not None:
+                    shard_hosts = []
+                    for position, limits in result:
+                        shard[position].limits.update(limits)
+                        shard_hosts.append(shard[position])
+            finally:
+                reader.close()
+                tpool.execute(worker.join)
+            if filtered_hosts is None or shard_hosts is None:
+                # A filter said to stop filtering.
+                filtered_hosts = None
+            else:
+                filtered_hosts.extend(shard_hosts)
+        return filtered_hosts
+
+    def _filter_shard(self, filters, hosts, filter_properties, index):
+        hosts = self.filter_handler.get_filtered_objects(filters,
+                hosts, filter_properties, index,
+                vectorized=self.vectorized_filters)
+        return list(hosts) if hosts is not None else None
+
+    def _run_filter_worker(self, writer, filters, hosts, filter_properties,
+                           index):
+        """Filter a shard of the hosts in a forked worker process."""
+        # Only send back the statistics of this shard.
+        self.filter_handler.filter_stats = {}
+        try:
+            filtered_hosts = self._filter_shard(filters, hosts,
+                                                filter_properties, index)
+            result = None
+            if filtered_hosts is not None:
+                positions = {id(host): position
+                             for position, host in enumerate(hosts)}
+                result = [(positions[id(host)], host.limits)
+                          for host in filtered_hosts]
+            writer.send((result, self.filter_handler.filter_stats))
+        except Exception:
+            LOG.exception(_LE("Error filtering %d host(s)"), len(hosts))
+        finally:
+            writer.close()
+
+    def get_filter_stats(self):
+        """Return the time spent in each filter and the ratio of the hosts
+        passing it, accumulated since the scheduler started.
+        """
+        return self.filter_handler.get_filter_stats()
 
-    def get_weighed_hosts(self, hosts, weight_properties):
-        """Weigh the hosts."""
+    def get_weighed_hosts(self, hosts, weight_properties, limit=None):
+        """Weigh the hosts, returning only the limit best ones if set."""
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, weight_properties)
+                hosts, weight_properties, limit=limit,
+                vectorized=self.vectorized_weighers)
 
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
@@ -422,8 +899,16 @@ class HostManager(object):
         service_refs = {service.host: service
                         for service in objects.ServiceList.get_by_topic(
                             context, CONF.compute_topic)}
+        if CONF.scheduler_index_aggregates:
+            self._update_aggregates(context)
+        if CONF.scheduler_tracks_instance_changes:
+            interval = CONF.scheduler_instance_sync_interval
+            if (self.instances_synced_at is None or
+                    (interval > 0 and timeutils.is_older_than(
+                        self.instances_synced_at, interval))):
+                self._sync_instance_info(context)
         # Get resource usage across the available compute nodes:
-        compute_nodes = objects.ComputeNodeList.get_all(context)
+        compute_nodes, changed_nodes = self._get_compute_nodes(context)
         seen_nodes = set()
         for compute in compute_nodes:
             service = service_refs.get(compute.host)
@@ -439,11 +924,19 @@ class HostManager(object):
             state_key = (host, node)
             host_state = self.host_state_map.get(state_key)
             if host_state:
-                host_state.update_from_compute_node(compute)
+                if changed_nodes is None or compute.id in changed_nodes:
+                    host_state.update_from_compute_node(compute)
             else:
                 host_state = self.host_state_cls(host, node, compute=compute)
                 self.host_state_map[state_key] = host_state
             host_state.update_service(dict(service.iteritems()))
+            if CONF.scheduler_index_aggregates:
+                host_state.aggregates = self.get_host_aggregates(host)
+            if CONF.scheduler_tracks_instance_changes:
+                # Shared with the index, so that the updates sent by the
+                # compute nodes are seen by the host state.
+                host_state.instances = self.host_instances_map.setdefault(
+                    host, set())
             seen_nodes.add(state_key)
 
         # remove compute nodes from host_state_map if they are not active
@@ -455,3 +948,129 @@ class HostManager(object):
             del self.host_state_map[state_key]
 
         return self.host_state_map.itervalues()
+
+    def _update_aggregates(self, context):
+        """Reload the aggregates and the index of the aggregates by host."""
+        aggregates = objects.AggregateList.get_all(context)
+        self.aggs_by_id = {aggregate.id: aggregate for aggregate in aggregates}
+        signature = sorted((aggregate.id, sorted(aggregate.hosts or []),
+                            sorted((aggregate.metadata or {}).items()))
+                           for aggregate in aggregates)
+        if signature != self.aggregates_signature:
+            # The aggregate based filters may pass other hosts.
+            self.aggregates_signature = signature
+            if self.filter_cache is not None:
+                self.filter_cache.clear()
+        host_aggregates_map = collections.defaultdict(set)
+        for aggregate in aggregates:
+            for host in aggregate.hosts:
+                host_aggregates_map[host].add(aggregate.id)
+        self.host_aggregates_map = host_aggregates_map
+
+    def get_host_aggregates(self, host):
+        """Return the aggregates the given host belongs to."""
+        return [self.aggs_by_id[agg_id]
+                for agg_id in self.host_aggregates_map.get(host, ())]
+
+    def _sync_instance_info(self, context):
+        """Reload the instances of all the hosts from the database."""
+        self.instances_synced_at = timeutils.utcnow()
+        instances = objects.InstanceList.get_by_filters(
+            context, {'deleted': False}, expected_attrs=[])
+        host_instances_map = collections.defaultdict(set)
+        instance_host_map = {}
+        for instance in instances:
+            if instance.host:
+                host_instances_map[instance.host].add(instance.uuid)
+                instance_host_map[instance.uuid] = instance.host
+        self.host_instances_map = dict(host_instances_map)
+        self.instance_host_map = instance_host_map
+
+    def update_instance_info(self, context, host_name, instance_uuids):
+        """Record that the given instances now run on the given host."""
+        instances = self.host_instances_map.setdefault(host_name, set())
+        for instance_uuid in instance_uuids:
+            previous_host = self.instance_host_map.get(instance_uuid)
+            if previous_host is not None and previous_host != host_name:
+                self.host_instances_map[previous_host].discard(
+                    instance_uuid)
+            instances.add(instance_uuid)
+            self.instance_host_map[instance_uuid] = host_name
+
+    def consume_from_instance(self, context, host_state, instance):
+        """Consume the resources of an instance placed on a host state.
+
+        The instance is also recorded on the host, and dropped from the
+        host it was previously recorded on, if any.
+        """
+        host_state.consume_from_instance(instance)
+        if CONF.scheduler_tracks_instance_changes and instance.get('uuid'):
+            self.update_instance_info(context, host_state.host,
+                                      [instance['uuid']])
+
+    def delete_instance_info(self, context, host_name, instance_uuid):
+        """Record that the given instance left the given host."""
+        instances = self.host_instances_map.get(host_name)
+        if instances is not None:
+            instances.discard(instance_uuid)
+        if self.instance_host_map.get(instance_uuid) == host_name:
+            del self.instance_host_map[instance_uuid]
+
+    def _get_compute_nodes(self, context):
+        """Return the active compute nodes and the ids of the changed ones.
+
+        The second item of the returned tuple is None when every compute
+        node was loaded from the database, meaning that all of them have to
+        be considered as changed.
+        """
+        if not CONF.scheduler_incremental_host_refresh:
+            return objects.ComputeNodeList.get_all(context), None
+
+        interval = CONF.scheduler_full_host_refresh_interval
+        if (self.compute_nodes_synced_at is None or
+                (interval > 0 and timeutils.is_older_than(
+                    self.last_full_refresh, interval))):
+            self.last_full_refresh = timeutils.utcnow()
+            compute_nodes = objects.ComputeNodeList.get_all(context)
+            self.compute_nodes = {compute.id: compute
+                                  for compute in compute_nodes}
+            self.compute_nodes_synced_at = self._latest_timestamp(
+                compute_nodes)
+            return compute_nodes, None
+
+        changed_nodes = set()
+        margin = datetime.timedelta(
+            seconds=max(CONF.scheduler_host_refresh_margin, 0))
+        changes = objects.ComputeNodeList.get_all_changed_since(
+            context, self.compute_nodes_synced_at - margin)
+        for compute in changes:
+            if compute.deleted:
+                self.compute_nodes.pop(compute.id, None)
+            else:
+                self.compute_nodes[compute.id] = compute
+                changed_nodes.add(compute.id)
+        # The watermark is the latest DB timestamp seen. Those timestamps
+        # come from the clocks of the writers and the rows may be committed
+        # out of order, so a change can land below the watermark: the
+        # changes are asked for from a safety margin before it, and the
+        # full refresh catches whatever is still older. Rows fetched again
+        # are applied as a full refresh would, which is harmless.
+        latest = self._latest_timestamp(changes)
+        if latest is not None and latest > self.compute_nodes_synced_at:
+            self.compute_nodes_synced_at = latest
+        LOG.debug("Refreshed %(changed)d out of %(total)d compute node(s)",
+                  {'changed': len(changes), 'total': len(self.compute_nodes)})
+        return self.compute_nodes.values(), changed_nodes
+
+    @staticmethod
+    def _latest_timestamp(compute_nodes):
+        """Return the most recent DB timestamp found in compute_nodes."""
+        latest = None
+        for compute in compute_nodes:
+            for attr in ('created_at', 'updated_at', 'deleted_at'):
+                if not compute.obj_attr_is_set(attr):
+                    continue
+                value = getattr(compute, attr)
+                if value is not None and (latest is None or value > latest):
+                    latest = value
+        return latest
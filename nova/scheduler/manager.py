@@ -55,7 +55,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    target = messaging.Target(version='4.0')
+    target = messaging.Target(version='4.1')
 
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         if not scheduler_driver:
@@ -86,6 +86,16 @@ class SchedulerManager(manager.Manager):
             filter_properties)
         return jsonutils.to_primitive(dests)
 
+    def update_instance_info(self, context, host_name, instance_uuids):
+        """Record that the given instances now run on the given host."""
+        self.driver.host_manager.update_instance_info(context, host_name,
+                                                      instance_uuids)
+
+    def delete_instance_info(self, context, host_name, instance_uuid):
+        """Record that the given instance left the given host."""
+        self.driver.host_manager.delete_instance_info(context, host_name,
+                                                      instance_uuid)
+
 
 class _SchedulerManagerV3Proxy(object):
 
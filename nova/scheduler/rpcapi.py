@@ -87,6 +87,7 @@ class SchedulerAPI(object):
         * 3.1 - Made select_destinations() send flavor object
 
         * 4.0 - Removed backwards compat for Icehouse
+        * 4.1 - Add update_instance_info() and delete_instance_info()
 
 
     '''
@@ -112,3 +113,17 @@ class SchedulerAPI(object):
         cctxt = self.client.prepare(version='4.0')
         return cctxt.call(ctxt, 'select_destinations',
             request_spec=request_spec, filter_properties=filter_properties)
+
+    def update_instance_info(self, ctxt, host_name, instance_uuids):
+        if not self.client.can_send_version('4.1'):
+            return
+        cctxt = self.client.prepare(version='4.1', fanout=True)
+        cctxt.cast(ctxt, 'update_instance_info', host_name=host_name,
+                   instance_uuids=instance_uuids)
+
+    def delete_instance_info(self, ctxt, host_name, instance_uuid):
+        if not self.client.can_send_version('4.1'):
+            return
+        cctxt = self.client.prepare(version='4.1', fanout=True)
+        cctxt.cast(ctxt, 'delete_instance_info', host_name=host_name,
+                   instance_uuid=instance_uuid)
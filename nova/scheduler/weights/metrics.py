@@ -29,6 +29,7 @@ in the configuration file as the followings:
 from oslo_config import cfg
 
 from nova import exception
+from nova import filters
 from nova.scheduler import utils
 from nova.scheduler import weights
 
@@ -68,6 +69,8 @@ CONF.register_opts(metrics_weight_opts, group='metrics')
 
 
 class MetricsWeigher(weights.BaseHostWeigher):
+    vectorized = True
+
     def __init__(self):
         self._parse_setting()
 
@@ -102,3 +105,30 @@ class MetricsWeigher(weights.BaseHostWeigher):
                         return CONF.metrics.weight_of_unavailable
 
         return value
+
+    def _weigh_batch(self, host_columns, weight_properties):
+        numpy = filters.numpy
+        value = numpy.zeros(len(host_columns))
+        unavailable = host_columns.full(False)
+
+        for (name, ratio) in self.setting:
+            metric = host_columns.values(
+                lambda host_state: (host_state.metrics[name].value
+                                    if name in host_state.metrics else None))
+            missing = numpy.isnan(metric)
+            if missing.any():
+                if CONF.metrics.required:
+                    host_state = host_columns.selected_objs(missing)[0]
+                    raise exception.ComputeHostMetricNotFound(
+                            host=host_state.host,
+                            node=host_state.nodename,
+                            name=name)
+                # Same as in _weigh_object(), the hosts missing a metric
+                # get the weight_of_unavailable value.
+                if ratio * self.weight_multiplier() != 0:
+                    unavailable |= missing
+                metric[missing] = 0.0
+            value += metric * ratio
+
+        value[unavailable] = CONF.metrics.weight_of_unavailable
+        return value
@@ -37,6 +37,7 @@ CONF.register_opts(ram_weight_opts)
 
 class RAMWeigher(weights.BaseHostWeigher):
     minval = 0
+    vectorized = True
 
     def weight_multiplier(self):
         """Override the weight multiplier."""
@@ -45,3 +46,6 @@ class RAMWeigher(weights.BaseHostWeigher):
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         return host_state.free_ram_mb
+
+    def _weigh_batch(self, host_columns, weight_properties):
+        return host_columns['free_ram_mb']
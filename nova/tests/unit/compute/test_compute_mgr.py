@@ -82,6 +82,31 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             mock_sync.assert_called_with(mock.ANY, mock_get.return_value,
                                          pwr_state)
 
+    def test_update_scheduler_instance_info(self):
+        instance = fake_instance.fake_instance_obj(self.context)
+        with mock.patch.object(self.compute.scheduler_rpcapi,
+                               'update_instance_info') as update:
+            self.compute._update_scheduler_instance_info(self.context,
+                                                         instance)
+            self.assertFalse(update.called)
+            self.flags(scheduler_tracks_instance_changes=True)
+            self.compute._update_scheduler_instance_info(self.context,
+                                                         instance)
+            update.assert_called_once_with(self.context, self.compute.host,
+                                           [instance.uuid])
+
+    def test_delete_scheduler_instance_info(self):
+        with mock.patch.object(self.compute.scheduler_rpcapi,
+                               'delete_instance_info') as delete:
+            self.compute._delete_scheduler_instance_info(self.context,
+                                                         'fake-uuid')
+            self.assertFalse(delete.called)
+            self.flags(scheduler_tracks_instance_changes=True)
+            self.compute._delete_scheduler_instance_info(self.context,
+                                                         'fake-uuid')
+            delete.assert_called_once_with(self.context, self.compute.host,
+                                           'fake-uuid')
+
     def test_allocate_network_succeeds_after_retries(self):
         self.flags(network_allocate_retries=8)
 
@@ -15,6 +15,7 @@
 
 """Tests for compute resource tracking."""
 
+import datetime
 import uuid
 
 import mock
@@ -569,6 +570,8 @@ class BaseTrackerTestCase(BaseTestCase):
                 self._fake_service_get_by_compute_host)
         self.stubs.Set(db, 'compute_node_get_by_host_and_nodename',
                 self._fake_compute_node_get_by_host_and_nodename)
+        self.stubs.Set(db, 'compute_node_get',
+                self._fake_compute_node_get)
         self.stubs.Set(db, 'compute_node_update',
                 self._fake_compute_node_update)
         self.stubs.Set(db, 'compute_node_delete',
@@ -594,6 +597,9 @@ class BaseTrackerTestCase(BaseTestCase):
         self.compute = self._create_compute_node()
         return self.compute
 
+    def _fake_compute_node_get(self, ctx, compute_node_id):
+        return self.compute
+
     def _fake_compute_node_update(self, ctx, compute_node_id, values,
             prune_stats=False):
         self.update_call_count += 1
@@ -742,8 +748,37 @@ class SchedulerClientTrackerTestCase(BaseTrackerTestCase):
         values = {'stats': {}, 'foo': 'bar', 'baz_count': 0}
         self.tracker._update(self.context, values)
 
-        expected = {'stats': '{}', 'foo': 'bar', 'baz_count': 0,
-                    'id': 1}
+        # The stats did not change since the tracker was initialized
+        expected = {'foo': 'bar', 'baz_count': 0, 'id': 1}
+        self.tracker.scheduler_client.update_resource_stats.\
+            assert_called_once_with(self.context,
+                                    ("fakehost", "fakenode"),
+                                    expected)
+
+    def test_update_resource_unchanged(self):
+        self.tracker._write_ext_resources = mock.Mock()
+        self.tracker._update(self.context, {'stats': {}, 'foo': 'bar'})
+        self.tracker.scheduler_client.update_resource_stats.reset_mock()
+
+        self.tracker._update(self.context, {'stats': {}, 'foo': 'bar'})
+        self.assertFalse(
+            self.tracker.scheduler_client.update_resource_stats.called)
+
+        self.tracker._update(self.context, {'stats': {}, 'foo': 'baz'})
+        self.tracker.scheduler_client.update_resource_stats.\
+            assert_called_once_with(self.context,
+                                    ("fakehost", "fakenode"),
+                                    {'foo': 'baz', 'id': 1})
+
+    def test_update_resource_full_update_interval(self):
+        self.flags(resource_tracker_full_update_interval=60)
+        self.tracker._write_ext_resources = mock.Mock()
+        self.tracker.last_full_update = (timeutils.utcnow() -
+                                         datetime.timedelta(seconds=61))
+        values = {'stats': {}, 'foo': 'bar'}
+        self.tracker._update(self.context, values)
+
+        expected = {'stats': '{}', 'foo': 'bar', 'id': 1}
         self.tracker.scheduler_client.update_resource_stats.\
             assert_called_once_with(self.context,
                                     ("fakehost", "fakenode"),
@@ -1553,6 +1588,155 @@ class TrackerPeriodicTestCase(BaseTrackerTestCase):
         _test()
 
 
+class IncrementalAuditTestCase(BaseTrackerTestCase):
+
+    def setUp(self):
+        self.flags(resource_tracker_incremental_audit=True)
+        super(IncrementalAuditTestCase, self).setUp()
+
+    def _audit(self):
+        with mock.patch.object(self.tracker, '_update_available_resource',
+                wraps=self.tracker._update_available_resource) as mock_full:
+            self.tracker.update_available_resource(self.context)
+        return mock_full.called
+
+    def _claim(self, **kwargs):
+        instance = self._fake_instance(vm_state=vm_states.ACTIVE, **kwargs)
+        self.tracker.instance_claim(self.context, instance, self.limits)
+        return instance
+
+    def test_first_audit_is_full(self):
+        self.assertIsNotNone(self.tracker.last_full_audit)
+        self.assertIsNotNone(self.tracker.audited_resources)
+
+    def test_audit_without_drift(self):
+        self.assertFalse(self._audit())
+        self._assert(0, 'memory_mb_used')
+
+    def test_audit_after_claim(self):
+        instance = self._claim()
+        self.assertFalse(self._audit())
+        self._assert(instance['memory_mb'] + FAKE_VIRT_MEMORY_OVERHEAD,
+                     'memory_mb_used')
+        self._assert(1, 'running_vms')
+
+    def _audit_update(self):
+        with mock.patch.object(self.tracker.scheduler_client,
+                               'update_resource_stats') as mock_update:
+            self.assertFalse(self._audit())
+        if mock_update.called:
+            return mock_update.call_args[0][2]
+
+    def test_audit_without_drift_sends_nothing(self):
+        self.assertIsNone(self._audit_update())
+
+    def _scheduler_claim(self, memory_mb):
+        # What a scheduler claim does to the compute node record
+        self.compute['memory_mb_used'] += memory_mb
+        self.compute['free_ram_mb'] -= memory_mb
+
+    def test_audit_releases_stale_scheduler_claim(self):
+        memory_mb_used = self.tracker.compute_node['memory_mb_used']
+        free_ram_mb = self.tracker.compute_node['free_ram_mb']
+        self._scheduler_claim(512)
+
+        # The claim may be in flight
+        self.assertIsNone(self._audit_update())
+        values = self._audit_update()
+
+        self.assertEqual(memory_mb_used, values['memory_mb_used'])
+        self.assertEqual(free_ram_mb, values['free_ram_mb'])
+        self.assertNotIn('vcpus_used', values)
+
+    def test_full_audit_releases_stale_scheduler_claim(self):
+        memory_mb_used = self.tracker.compute_node['memory_mb_used']
+        self._scheduler_claim(512)
+        self.assertIsNone(self._audit_update())
+        self.tracker.last_full_audit = None
+
+        with mock.patch.object(self.tracker.scheduler_client,
+                               'update_resource_stats') as mock_update:
+            self.assertTrue(self._audit())
+
+        values = mock_update.call_args[0][2]
+        self.assertEqual(memory_mb_used, values['memory_mb_used'])
+
+    def test_audit_keeps_claims_in_flight(self):
+        self._scheduler_claim(512)
+        self.assertIsNone(self._audit_update())
+        self._scheduler_claim(256)
+        self.assertIsNone(self._audit_update())
+
+    def test_audit_sends_tracked_values_only(self):
+        resources = self.tracker.driver.get_available_resource('fakenode')
+        resources['disk_available_least'] = 42
+        with mock.patch.object(self.tracker.driver, 'get_available_resource',
+                               return_value=resources):
+            values = self._audit_update()
+
+        self.assertEqual(42, values['disk_available_least'])
+        self.assertEqual(self.tracker.compute_node['id'], values['id'])
+        for key in ('created_at', 'updated_at', 'service_id', 'deleted',
+                    'supported_hv_specs', 'pci_device_pools',
+                    'pci_passthrough_devices', 'memory_mb_used'):
+            self.assertNotIn(key, values)
+        self._assert(42, 'disk_available_least')
+
+    def test_audit_state_change(self):
+        instance = self._claim()
+        instance['task_state'] = task_states.IMAGE_SNAPSHOT
+        self.assertFalse(self._audit())
+        self._assert(1, 'current_workload')
+        self.assertEqual(1, self.tracker.stats['io_workload'])
+
+    def test_audit_untracked_instance(self):
+        instance = self._fake_instance(vm_state=vm_states.ACTIVE,
+                                       host=self.host)
+        self.assertTrue(self._audit())
+        self._assert(instance['memory_mb'] + FAKE_VIRT_MEMORY_OVERHEAD,
+                     'memory_mb_used')
+        self.assertFalse(self._audit())
+
+    def test_audit_deleted_instance(self):
+        instance = self._claim()
+        del self._instances[instance['uuid']]
+        self.assertTrue(self._audit())
+        self._assert(0, 'memory_mb_used')
+
+    def test_audit_resized_instance(self):
+        instance = self._claim()
+        self._instances[instance['uuid']] = dict(
+            instance, memory_mb=instance['memory_mb'] + 1)
+        self.assertTrue(self._audit())
+
+    def test_audit_hypervisor_change(self):
+        self.tracker.driver.memory_mb += 1
+        self.assertTrue(self._audit())
+        self._assert(FAKE_VIRT_MEMORY_MB + 1, 'memory_mb')
+        self.assertFalse(self._audit())
+
+    def test_audit_refreshes_hypervisor_values(self):
+        resources = self.tracker.driver.get_available_resource('fakenode')
+        resources['disk_available_least'] = 42
+        with mock.patch.object(self.tracker.driver, 'get_available_resource',
+                               return_value=resources):
+            self.assertFalse(self._audit())
+        self._assert(42, 'disk_available_least')
+
+    def test_audit_orphans(self):
+        with mock.patch.object(self.tracker.driver, 'get_per_instance_usage',
+                               return_value={'fake-uuid': {
+                                   'uuid': 'fake-uuid', 'memory_mb': 1}}):
+            self.assertTrue(self._audit())
+
+    def test_full_audit_interval(self):
+        self.flags(resource_tracker_full_audit_interval=60)
+        self.tracker.last_full_audit = (timeutils.utcnow() -
+                                        datetime.timedelta(seconds=61))
+        self.assertTrue(self._audit())
+        self.assertFalse(self._audit())
+
+
 class StatsDictTestCase(BaseTrackerTestCase):
     """Test stats handling for a virt driver that provides
     stats as a dictionary.
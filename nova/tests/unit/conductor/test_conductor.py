@@ -589,6 +589,73 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
         self.assertIn('dict', updates)
         self.assertEqual({'foo': 'bar'}, updates['dict'])
 
+    def _test_object_action_nested_object(self, method):
+        class TestChild(obj_base.NovaObject):
+            fields = {'foo': fields.IntegerField()}
+
+        class TestObject(obj_base.NovaObject):
+            fields = {'bar': fields.IntegerField(),
+                      'child': fields.ObjectField('TestChild')}
+
+            def touch_bar(self, context):
+                self.bar = 2
+                self.child = TestChild(foo=self.child.foo)
+                self.obj_reset_changes(recursive=True)
+
+            def touch_child(self, context):
+                self.child = TestChild(foo=2)
+                self.obj_reset_changes(recursive=True)
+
+            def touch_bar_in_place(self, context):
+                self.bar = 2
+                self.obj_reset_changes()
+
+            def touch_child_in_place(self, context):
+                self.child.foo = 2
+
+            def refresh_child(self, context):
+                self.child.foo = 2
+                self.child.obj_reset_changes()
+
+        obj = TestObject(bar=1, child=TestChild(foo=1))
+        obj.obj_reset_changes(recursive=True)
+        with mock.patch.object(TestChild, 'obj_to_primitive',
+                               autospec=True,
+                               side_effect=TestChild.obj_to_primitive.im_func
+                               ) as mock_to_primitive:
+            updates, result = self.conductor.object_action(
+                self.context, obj, method, tuple(), {})
+        self.primitive_count = mock_to_primitive.call_count
+        return updates
+
+    def test_object_action_skips_equal_nested_object(self):
+        updates = self._test_object_action_nested_object('touch_bar')
+        self.assertEqual(2, updates['bar'])
+        self.assertNotIn('child', updates)
+
+    def test_object_action_sends_changed_nested_object(self):
+        updates = self._test_object_action_nested_object('touch_child')
+        self.assertNotIn('bar', updates)
+        self.assertEqual(2, updates['child']['nova_object.data']['foo'])
+
+    def test_object_action_skips_untouched_nested_object(self):
+        updates = self._test_object_action_nested_object('touch_bar_in_place')
+        self.assertEqual(2, updates['bar'])
+        self.assertNotIn('child', updates)
+        # The untouched nested object is not even serialized
+        self.assertEqual(0, self.primitive_count)
+
+    def test_object_action_sends_refreshed_nested_object(self):
+        updates = self._test_object_action_nested_object('refresh_child')
+        self.assertEqual(2, updates['child']['nova_object.data']['foo'])
+        self.assertNotIn('nova_object.changes', updates['child'])
+
+    def test_object_action_sends_nested_object_changed_in_place(self):
+        updates = self._test_object_action_nested_object(
+            'touch_child_in_place')
+        self.assertEqual(2, updates['child']['nova_object.data']['foo'])
+        self.assertEqual(['foo'], updates['child']['nova_object.changes'])
+
     def _test_expected_exceptions(self, db_method, conductor_method, errors,
                                   *args, **kwargs):
         # Tests that expected exceptions are handled properly.
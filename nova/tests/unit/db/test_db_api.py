@@ -420,6 +420,61 @@ class NotDbApiTestCase(DbTestCase):
                               filters={},
                               sort_keys=keys)
 
+    def test_instance_get_all_by_filters_sort_marker_key_invalid(self):
+        '''InvalidSortKey raised if an invalid key is given with a marker.'''
+        inst = self.create_instance_with_args()
+        self.assertRaises(exception.InvalidSortKey,
+                          db.instance_get_all_by_filters_sort,
+                          self.context, filters={}, marker=inst['uuid'],
+                          sort_keys=['foo'])
+
+    def test_instance_get_all_by_filters_sort_marker_same_created_at(self):
+        '''Instances created at the same time are paged through by id.'''
+        created_at = timeutils.utcnow()
+        insts = [self.create_instance_with_args(created_at=created_at)
+                 for i in range(4)]
+        correct_order = sorted(insts, key=lambda inst: inst['id'],
+                               reverse=True)
+
+        marker = None
+        for i in range(0, 4, 2):
+            result = self._assert_equals_inst_order(
+                correct_order[i:i + 2], {'deleted': False}, limit=2,
+                marker=marker)
+            marker = result[-1]['uuid']
+        self._assert_equals_inst_order([], {'deleted': False},
+                                       marker=marker)
+
+    def test_instance_get_all_by_filters_sort_columns(self):
+        inst1 = self.create_instance_with_args(display_name='test1')
+        inst2 = self.create_instance_with_args(display_name='test2')
+        self.create_instance_with_args(display_name='other')
+
+        result = db.instance_get_all_by_filters_sort(
+            self.context, {'display_name': 'test', 'deleted': False},
+            sort_keys=['display_name'], sort_dirs=['asc'],
+            columns=['uuid', 'display_name'])
+        self.assertEqual([{'uuid': inst1['uuid'], 'display_name': 'test1'},
+                          {'uuid': inst2['uuid'], 'display_name': 'test2'}],
+                         result)
+
+        result = db.instance_get_all_by_filters_sort(
+            self.context, {'display_name': 'test'}, marker=inst2['uuid'],
+            sort_keys=['display_name'], columns=['uuid'])
+        self.assertEqual([{'uuid': inst1['uuid']}], result)
+
+        self.assertRaises(exception.InvalidInput,
+                          db.instance_get_all_by_filters_sort,
+                          self.context, {}, columns=['metadata'])
+
+    def test_instance_get_all_by_filters_sort_marker_other_project(self):
+        '''The marker must be an instance of the project listed.'''
+        inst = self.create_instance_with_args(
+            context=context.RequestContext('fake', 'other'))
+        self.assertRaises(exception.MarkerNotFound,
+                          db.instance_get_all_by_filters_sort,
+                          self.context, filters={}, marker=inst['uuid'])
+
     def test_convert_objects_related_datetimes(self):
 
         t1 = timeutils.utcnow()
@@ -6349,7 +6404,8 @@ class S3ImageTestCase(test.TestCase):
 
 class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
 
-    _ignored_keys = ['id', 'deleted', 'deleted_at', 'created_at', 'updated_at']
+    _ignored_keys = ['id', 'deleted', 'deleted_at', 'created_at', 'updated_at',
+                     'generation']
 
     def setUp(self):
         super(ComputeNodeTestCase, self).setUp()
@@ -6433,6 +6489,31 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
             # Clean up the service
             db.service_destroy(self.ctxt, service['id'])
 
+    def test_compute_node_get_all_changed_since(self):
+        since = self.item['created_at'] + datetime.timedelta(hours=1)
+        self.assertEqual([], db.compute_node_get_all_changed_since(
+            self.ctxt, since))
+
+        timeutils.set_time_override(since)
+        self.addCleanup(timeutils.clear_time_override)
+        compute_node_data = self.compute_node_dict.copy()
+        compute_node_data['hypervisor_hostname'] = 'new-node'
+        new_node = db.compute_node_create(self.ctxt, compute_node_data)
+        compute_node_data['hypervisor_hostname'] = 'gone-node'
+        gone_node = db.compute_node_create(self.ctxt, compute_node_data)
+        db.compute_node_delete(self.ctxt, gone_node['id'])
+
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(set([new_node['id'], gone_node['id']]),
+                         set([node['id'] for node in nodes]))
+        deleted = {node['id']: node['deleted'] for node in nodes}
+        self.assertFalse(deleted[new_node['id']])
+        self.assertTrue(deleted[gone_node['id']])
+
+        db.compute_node_update(self.ctxt, self.item['id'], {'vcpus': 4})
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertIn(self.item['id'], [node['id'] for node in nodes])
+
     def test_compute_node_get_all_mult_compute_nodes_one_service_entry(self):
         service_data = self.service_dict.copy()
         service_data['host'] = 'host2'
@@ -6567,6 +6648,32 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         new_stats = jsonutils.loads(item_updated['stats'])
         self.assertEqual(stats, new_stats)
 
+    def test_compute_node_update_increments_generation(self):
+        self.assertEqual(0, self.item['generation'])
+        item_updated = db.compute_node_update(self.ctxt, self.item['id'],
+                                              {'vcpus': 4, 'generation': 42})
+        self.assertEqual(1, item_updated['generation'])
+
+    def test_compute_node_claim(self):
+        item_claimed = db.compute_node_claim(self.ctxt, self.item['id'], 0,
+                                             memory_mb=512, vcpus=1,
+                                             local_gb=10)
+        self.assertEqual(1, item_claimed['generation'])
+        self.assertEqual(512, item_claimed['memory_mb_used'])
+        self.assertEqual(512, item_claimed['free_ram_mb'])
+        self.assertEqual(1, item_claimed['vcpus_used'])
+        self.assertEqual(10, item_claimed['local_gb_used'])
+        self.assertEqual(2038, item_claimed['free_disk_gb'])
+
+    def test_compute_node_claim_conflict(self):
+        db.compute_node_update(self.ctxt, self.item['id'], {'vcpus': 4})
+        self.assertRaises(exception.ComputeNodeGenerationConflict,
+                          db.compute_node_claim, self.ctxt, self.item['id'],
+                          0, memory_mb=512, vcpus=1, local_gb=10)
+        node = db.compute_node_get(self.ctxt, self.item['id'])
+        self.assertEqual(0, node['memory_mb_used'])
+        self.assertEqual(1, node['generation'])
+
     def test_compute_node_delete(self):
         compute_node_id = self.item['id']
         db.compute_node_delete(self.ctxt, compute_node_id)
@@ -807,6 +807,34 @@ class NovaMigrationsCheckers(test_migrations.ModelsMigrationsSync,
         self.assertColumnNotExists(engine, 'shadow_instance_extra',
                                    'vcpu_model')
 
+    def _check_277(self, engine, data):
+        self.assertColumnExists(engine, 'compute_nodes', 'generation')
+        self.assertColumnExists(engine, 'shadow_compute_nodes', 'generation')
+
+        compute_nodes = oslodbutils.get_table(engine, 'compute_nodes')
+        shadow_compute_nodes = oslodbutils.get_table(
+                engine, 'shadow_compute_nodes')
+        self.assertIsInstance(compute_nodes.c.generation.type,
+                              sqlalchemy.types.Integer)
+        self.assertIsInstance(shadow_compute_nodes.c.generation.type,
+                              sqlalchemy.types.Integer)
+
+    def _post_downgrade_277(self, engine):
+        self.assertColumnNotExists(engine, 'compute_nodes', 'generation')
+        self.assertColumnNotExists(engine, 'shadow_compute_nodes',
+                                   'generation')
+
+    def _check_278(self, engine, data):
+        self.assertIndexMembers(
+            engine, 'instances',
+            'instances_project_id_deleted_created_at_id_idx',
+            ['project_id', 'deleted', 'created_at', 'id'])
+
+    def _post_downgrade_278(self, engine):
+        self.assertIndexNotExists(
+            engine, 'instances',
+            'instances_project_id_deleted_created_at_id_idx')
+
 
 class TestNovaMigrationsSQLite(NovaMigrationsCheckers,
                                test.TestCase,
@@ -12,6 +12,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
+import iso8601
 import mock
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
@@ -76,6 +79,7 @@ fake_compute_node = {
     'numa_topology': fake_numa_topology_db_format,
     'supported_instances': fake_supported_hv_specs_db_format,
     'pci_stats': fake_pci,
+    'generation': 7,
     }
 # FIXME(sbauza) : For compatibility checking, to be removed once we are sure
 # that all computes are running latest DB version with host field in it.
@@ -285,6 +289,28 @@ class _TestComputeNodeObject(object):
         self.assertRaises(exception.ObjectActionError, compute.create,
                           self.context)
 
+    @mock.patch.object(db, 'compute_node_claim')
+    def test_claim_resources(self, mock_claim):
+        mock_claim.return_value = fake_compute_node
+
+        compute = compute_node.ComputeNode.claim_resources(
+            self.context, 123, 6, memory_mb=512, vcpus=1, local_gb=10)
+
+        mock_claim.assert_called_once_with(self.context, 123, 6, 512, 1, 10)
+        self.compare_obj(compute, fake_compute_node,
+                         subs=self.subs(),
+                         comparators=self.comparators())
+
+    @mock.patch.object(db, 'compute_node_claim')
+    def test_claim_resources_conflict(self, mock_claim):
+        mock_claim.side_effect = exception.ComputeNodeGenerationConflict(
+            compute_id=123, generation=6)
+
+        self.assertRaises(exception.ComputeNodeGenerationConflict,
+                          compute_node.ComputeNode.claim_resources,
+                          self.context, 123, 6, memory_mb=512, vcpus=1,
+                          local_gb=10)
+
     def test_save(self):
         self.mox.StubOutWithMock(db, 'compute_node_update')
         db.compute_node_update(
@@ -346,6 +372,20 @@ class _TestComputeNodeObject(object):
                          subs=self.subs(),
                          comparators=self.comparators())
 
+    @mock.patch('nova.db.compute_node_get_all_changed_since')
+    def test_get_all_changed_since(self, cn_get_changed):
+        cn_get_changed.return_value = [fake_compute_node]
+        since = datetime.datetime(2015, 1, 1, 12, 30, 15, 123,
+                                  tzinfo=iso8601.iso8601.Utc())
+        computes = compute_node.ComputeNodeList.get_all_changed_since(
+            self.context, since)
+        self.assertEqual(1, cn_get_changed.call_count)
+        self.assertEqual(since, cn_get_changed.call_args[0][1])
+        self.assertEqual(1, len(computes))
+        self.compare_obj(computes[0], fake_compute_node,
+                         subs=self.subs(),
+                         comparators=self.comparators())
+
     def test_get_by_hypervisor(self):
         self.mox.StubOutWithMock(db, 'compute_node_search_by_hypervisor')
         db.compute_node_search_by_hypervisor(self.context, 'hyper').AndReturn(
@@ -425,6 +465,12 @@ class _TestComputeNodeObject(object):
         primitive = compute.obj_to_primitive(target_version='1.8')
         self.assertNotIn('pci_device_pools', primitive)
 
+    def test_compat_generation(self):
+        compute = compute_node.ComputeNode()
+        compute.generation = 1
+        primitive = compute.obj_to_primitive(target_version='1.10')
+        self.assertNotIn('generation', primitive)
+
 
 class TestComputeNodeObject(test_objects._LocalTest,
                             _TestComputeNodeObject):
@@ -70,6 +70,20 @@ class TestField(test.NoDBTestCase):
         self.assertEqual('123', self.field.stringify(123))
 
 
+class TestIsPrimitive(test.NoDBTestCase):
+    def test_is_primitive(self):
+        for field in (fields.StringField(), fields.EnumField(['foo']),
+                      fields.UUIDField(), fields.IntegerField(),
+                      fields.FloatField(), fields.BooleanField(nullable=True)):
+            self.assertTrue(field.is_primitive)
+
+    def test_is_not_primitive(self):
+        for field in (fields.Field(FakeFieldType()), fields.DateTimeField(),
+                      fields.IPAddressField(), fields.DictOfStringsField(),
+                      fields.ListOfStringsField(), fields.ObjectField('Foo')):
+            self.assertFalse(field.is_primitive)
+
+
 class TestString(TestField):
     def setUp(self):
         super(TestString, self).setUp()
@@ -97,8 +97,8 @@ class _TestInstanceObject(object):
                         {'uuid': 'fake-uuid',
                          'access_ip_v4': '1.2.3.4',
                          'access_ip_v6': '::1'},
-                    'nova_object.changes': ['uuid', 'access_ip_v6',
-                                            'access_ip_v4']}
+                    'nova_object.changes': ['access_ip_v4', 'access_ip_v6',
+                                            'uuid']}
         self.assertEqual(primitive, expected)
         inst2 = instance.Instance.obj_from_primitive(primitive)
         self.assertIsInstance(inst2.access_ip_v4, netaddr.IPAddress)
@@ -1015,6 +1015,62 @@ class _TestInstanceObject(object):
                                          expected_attrs=['metadata'])
         self.assertNotIn('metadata', inst.obj_what_changed())
 
+    @mock.patch.object(objects.Instance, 'get_by_uuid')
+    def test_load_projected_columns(self, mock_get):
+        mock_get.return_value = instance.Instance(host='foo', node='bar',
+                                                  display_name='other')
+        inst = instance.Instance._from_db_projection(
+            self.context, instance.Instance(),
+            {'uuid': 'fake-uuid', 'display_name': 'name'})
+
+        self.assertEqual('foo', inst.host)
+        self.assertEqual('bar', inst.node)
+        self.assertEqual('name', inst.display_name)
+        mock_get.assert_called_once_with(self.context, uuid='fake-uuid',
+                                         expected_attrs=[])
+        self.assertEqual(set(), inst.obj_what_changed())
+        self.assertFalse(inst._projected)
+
+    @mock.patch.object(objects.Instance, 'get_by_uuid')
+    def test_load_projected_columns_deleted(self, mock_get):
+        def fake_get_by_uuid(context, uuid, expected_attrs):
+            self.assertEqual('yes', context.read_deleted)
+            return instance.Instance(host='foo', deleted=True)
+
+        mock_get.side_effect = fake_get_by_uuid
+        inst = instance.Instance._from_db_projection(
+            self.context, instance.Instance(), {'uuid': 'fake-uuid'})
+
+        self.assertEqual('foo', inst.host)
+        self.assertEqual('no', self.context.read_deleted)
+
+    def test_save_projected(self):
+        inst = instance.Instance._from_db_projection(
+            self.context, instance.Instance(), {'uuid': 'fake-uuid'})
+        inst.display_name = 'foo'
+        self.assertRaises(exception.ObjectActionError, inst.save)
+
+    def test_projected_serialization(self):
+        inst = instance.Instance._from_db_projection(
+            self.context, instance.Instance(), {'uuid': 'fake-uuid'})
+        serializer = base.NovaObjectSerializer()
+
+        primitive = serializer.serialize_entity(self.context, inst)
+        inst2 = serializer.deserialize_entity(self.context, primitive)
+        self.assertTrue(inst2._projected)
+        self.assertTrue(inst.obj_clone()._projected)
+
+        inst._projected = False
+        primitive = serializer.serialize_entity(self.context, inst)
+        self.assertNotIn('nova_object.projected', primitive)
+        inst2 = serializer.deserialize_entity(self.context, primitive)
+        self.assertFalse(inst2._projected)
+
+    def test_load_column_not_projected(self):
+        inst = instance.Instance(context=self.context, uuid='fake-uuid')
+        self.assertRaises(exception.ObjectActionError,
+                          inst.obj_load_attr, 'host')
+
     @mock.patch('nova.db.instance_fault_get_by_instance_uuids')
     def test_load_fault(self, mock_get):
         fake_fault = test_instance_fault.fake_faults['fake-uuid'][0]
@@ -1279,6 +1335,38 @@ class _TestInstanceListObject(object):
             sort_keys=['key1', 'key2'], sort_dirs=['dir1', 'dir2'])
         self.assertEqual(0, mock_get_by_filters.call_count)
 
+    @mock.patch.object(db, 'instance_get_all_by_filters_sort')
+    def test_get_by_filters_projected(self, mock_get):
+        mock_get.return_value = [
+            {'id': 1, 'uuid': 'fake-uuid1', 'display_name': 'foo',
+             'deleted': 0},
+            {'id': 2, 'uuid': 'fake-uuid2', 'display_name': 'bar',
+             'deleted': 2}]
+        inst_list = instance.InstanceList.get_by_filters_projected(
+            self.context, {'foo': 'bar'}, ['display_name', 'deleted'],
+            limit=100, marker='uuid', sort_keys=['key1'],
+            sort_dirs=['dir1'])
+
+        mock_get.assert_called_once_with(
+            self.context, {'foo': 'bar'}, limit=100, marker='uuid',
+            use_slave=False, sort_keys=['key1'], sort_dirs=['dir1'],
+            columns=['deleted', 'display_name', 'id', 'uuid'])
+        self.assertEqual(2, len(inst_list))
+        self.assertEqual('fake-uuid1', inst_list[0].uuid)
+        self.assertEqual('foo', inst_list[0].display_name)
+        self.assertFalse(inst_list[0].deleted)
+        self.assertTrue(inst_list[1].deleted)
+        self.assertFalse(inst_list[0].obj_attr_is_set('host'))
+        self.assertTrue(inst_list[0]._projected)
+        self.assertEqual(set(), inst_list[0].obj_what_changed())
+        self.assertRemotes()
+
+    def test_get_by_filters_projected_not_column(self):
+        for field in ('metadata', 'foo'):
+            self.assertRaises(exception.ObjectActionError,
+                              instance.InstanceList.get_by_filters_projected,
+                              self.context, {}, [field])
+
     def test_get_all_by_filters_works_for_cleaned(self):
         fakes = [self.fake_instance(1),
                  self.fake_instance(2, updates={'deleted': 2,
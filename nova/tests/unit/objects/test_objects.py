@@ -18,6 +18,7 @@ import datetime
 import hashlib
 import inspect
 import os
+import pickle
 import pprint
 
 import mock
@@ -204,6 +205,66 @@ class TestMetaclass(test.TestCase):
         self.assertRaises(exception.ObjectFieldInvalid,
                           create_class, int)
 
+    def test_field_slots(self):
+        self.assertEqual(('_bar', '_created_at', '_deleted', '_deleted_at',
+                          '_foo', '_missing', '_readonly', '_rel_object',
+                          '_rel_objects', '_updated_at'),
+                         MyObj.__slots__)
+        self.assertEqual((), MyObjDiffVers.__dict__.get('__slots__', ()))
+        obj = MyObj(foo=1)
+        self.assertEqual(1, obj.foo)
+        self.assertNotIn('_foo', obj.__dict__)
+        del obj._foo
+        self.assertFalse(obj.obj_attr_is_set('foo'))
+
+    def test_field_slots_mixin(self):
+        obj = TestSubclassedObject(foo=1, new_field='foo')
+        self.assertEqual(('_new_field',), TestSubclassedObject.__slots__)
+        self.assertEqual(set(['foo', 'new_field']), obj.obj_what_changed())
+        obj.random_attribute = 'foo'
+        self.assertEqual({'random_attribute': 'foo'}, obj.__dict__)
+
+    def test_field_slots_pickle(self):
+        obj = TestSubclassedObject(foo=1, new_field='foo')
+        obj.obj_reset_changes(['foo'])
+        obj.random_attribute = 'bar'
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            obj2 = pickle.loads(pickle.dumps(obj, protocol))
+            self.assertEqual(1, obj2.foo)
+            self.assertEqual('foo', obj2.new_field)
+            self.assertFalse(obj2.obj_attr_is_set('bar'))
+            self.assertEqual(set(['new_field']), obj2.obj_what_changed())
+            self.assertEqual('bar', obj2.random_attribute)
+
+    def test_field_slots_several_object_bases(self):
+        class Foo(base.NovaObject):
+            fields = {'foo': fields.IntegerField()}
+
+        class Bar(base.NovaObject):
+            fields = {'bar': fields.IntegerField()}
+
+        def create_class():
+            class FooBar(Foo, Bar):
+                pass
+
+        self.assertRaises(TypeError, create_class)
+
+    def test_primitive_plan(self):
+        self.assertEqual(
+            [('bar', '_bar', base._PRIMITIVE_FIELD),
+             ('created_at', '_created_at', base._OTHER_FIELD),
+             ('deleted', '_deleted', base._PRIMITIVE_FIELD),
+             ('deleted_at', '_deleted_at', base._OTHER_FIELD),
+             ('foo', '_foo', base._PRIMITIVE_FIELD),
+             ('missing', '_missing', base._PRIMITIVE_FIELD),
+             ('readonly', '_readonly', base._PRIMITIVE_FIELD),
+             ('rel_object', '_rel_object', base._OBJECT_FIELD),
+             ('rel_objects', '_rel_objects', base._OBJECT_LIST_FIELD),
+             ('updated_at', '_updated_at', base._OTHER_FIELD)],
+            [step[:3] for step in MyObj._obj_primitive_plan])
+        self.assertEqual(MyObj.fields['foo'],
+                         MyObj._obj_primitive_plan[4][3])
+
 
 class TestObjToPrimitive(test.TestCase):
 
@@ -645,6 +706,19 @@ class _TestObject(object):
         self.assertEqual(obj.bar, 'updated')
         self.assertRemotes()
 
+    def test_changed_fields_bitmask(self):
+        obj = MyObj()
+        self.assertEqual(0, obj._obj_changes)
+        obj.foo = 1
+        obj.bar = 'bar'
+        self.assertEqual(frozenset(['foo', 'bar']), obj._changed_fields)
+        self.assertEqual(MyObj._obj_field_bits['foo'] |
+                         MyObj._obj_field_bits['bar'], obj._obj_changes)
+        obj.obj_reset_changes(['foo', 'unknown'])
+        self.assertEqual(frozenset(['bar']), obj._changed_fields)
+        obj._changed_fields = ['foo', 'unknown']
+        self.assertEqual(set(['foo']), obj.obj_what_changed())
+
     def test_base_attributes(self):
         dt = datetime.datetime(1955, 11, 5)
         obj = MyObj(created_at=dt, updated_at=dt, deleted_at=None,
@@ -653,7 +727,7 @@ class _TestObject(object):
                     'nova_object.namespace': 'nova',
                     'nova_object.version': '1.6',
                     'nova_object.changes':
-                        ['deleted', 'created_at', 'deleted_at', 'updated_at'],
+                        ['created_at', 'deleted', 'deleted_at', 'updated_at'],
                     'nova_object.data':
                         {'created_at': timeutils.isotime(dt),
                          'updated_at': timeutils.isotime(dt),
@@ -867,6 +941,36 @@ class _TestObject(object):
 
 
 class TestObject(_LocalTest, _TestObject):
+    def test_obj_to_primitive_skips_primitive_fields(self):
+        obj = MyObj(foo=1, bar='bar', created_at=timeutils.utcnow(),
+                    rel_objects=[MyOwnedObject(baz=1)])
+        with mock.patch.object(fields.Field, 'to_primitive',
+                               return_value='prim') as mock_to:
+            primitive = obj.obj_to_primitive()
+        mock_to.assert_called_once_with(obj, 'created_at', obj.created_at)
+        data = primitive['nova_object.data']
+        self.assertEqual(1, data['foo'])
+        self.assertEqual('bar', data['bar'])
+        self.assertEqual('prim', data['created_at'])
+        self.assertEqual(
+            {'baz': 1},
+            data['rel_objects'][0]['nova_object.data'])
+
+    def test_obj_from_primitive_skips_primitive_fields(self):
+        primitive = MyObj(foo=1, bar='bar', rel_object=None,
+                          rel_objects=[MyOwnedObject(baz=1)]
+                          ).obj_to_primitive()
+        with mock.patch.object(fields.Field, 'from_primitive', autospec=True,
+                               side_effect=fields.Field.from_primitive
+                               ) as mock_from:
+            obj = MyObj.obj_from_primitive(primitive)
+        self.assertEqual(set(['rel_object', 'rel_objects']),
+                         set(call[0][2] for call in mock_from.call_args_list))
+        self.assertEqual(1, obj.foo)
+        self.assertEqual('bar', obj.bar)
+        self.assertIsNone(obj.rel_object)
+        self.assertEqual(1, obj.rel_objects[0].baz)
+
     def test_set_defaults(self):
         obj = MyObj()
         obj.obj_set_defaults('foo')
@@ -1146,8 +1250,8 @@ object_data = {
     'BandwidthUsageList': '1.2-5b564cbfd5ae6e106443c086938e7602',
     'BlockDeviceMapping': '1.8-c53f09c7f969e0222d9f6d67a950a08e',
     'BlockDeviceMappingList': '1.9-0faaeebdca213010c791bc37a22546e3',
-    'ComputeNode': '1.10-70202a38b858977837b313d94475a26b',
-    'ComputeNodeList': '1.10-4ae1f844c247029fbcdb5fdccbe9e619',
+    'ComputeNode': '1.11-e68ca6182e3a21c26bf76037236045c6',
+    'ComputeNodeList': '1.12-40c6887ee35b19008bc94636eea36dea',
     'DNSDomain': '1.0-5bdc288d7c3b723ce86ede998fd5c9ba',
     'DNSDomainList': '1.0-cfb3e7e82be661501c31099523154db4',
     'EC2InstanceMapping': '1.0-627baaf4b12c9067200979bdc4558a99',
@@ -1171,7 +1275,7 @@ object_data = {
     'InstanceGroup': '1.9-95ece99f092e8f4f88327cdbb44162c9',
     'InstanceGroupList': '1.6-c6b78f3c9d9080d33c08667e80589817',
     'InstanceInfoCache': '1.5-ef64b604498bfa505a8c93747a9d8b2f',
-    'InstanceList': '1.15-20d822b2abb0051d72f81ed686a79e5b',
+    'InstanceList': '1.16-a1b76392cc0258c1c0ac5c1212226efb',
     'InstanceNUMACell': '1.2-5d2dfa36e9ecca9b63f24bf3bc958ea4',
     'InstanceNUMATopology': '1.1-86b95d263c4c68411d44c6741b8d2bb0',
     'InstancePCIRequest': '1.1-e082d174f4643e5756ba098c47c1510f',
@@ -1200,8 +1304,8 @@ object_data = {
     'SecurityGroupList': '1.0-528e6448adfeeb78921ebeda499ab72f',
     'SecurityGroupRule': '1.1-a9175baf7664439af1a16c2010b55576',
     'SecurityGroupRuleList': '1.1-667fca3a9928f23d2d10e61962c55f3c',
-    'Service': '1.9-82bbfd46a744a9c89bc44b47a1b81683',
-    'ServiceList': '1.7-b856301eb7714839248e189bf4886168',
+    'Service': '1.10-82bbfd46a744a9c89bc44b47a1b81683',
+    'ServiceList': '1.8-41d0a9f83d49950ffb6efa4978201d57',
     'Tag': '1.0-a11531f4e4e3166eef6243d6d58a18bd',
     'TagList': '1.0-e89bf8c8055f1f1d654fb44f0abf1f53',
     'TestSubclassedObject': '1.6-87177ccbefd7a740a9e261f958e15b00',
@@ -1237,7 +1341,7 @@ object_relationships = {
     'NUMACell': {'NUMAPagesTopology': '1.0'},
     'NUMATopology': {'NUMACell': '1.2'},
     'SecurityGroupRule': {'SecurityGroup': '1.1'},
-    'Service': {'ComputeNode': '1.10'},
+    'Service': {'ComputeNode': '1.11'},
     'TestSubclassedObject': {'MyOwnedObject': '1.0'},
     'VirtCPUModel': {'VirtCPUFeature': '1.0', 'VirtCPUTopology': '1.0'},
 }
@@ -188,6 +188,58 @@ class PciDeviceStatsTestCase(test.NoDBTestCase):
         self.assertEqual(set(['v3']),
                          set([dev['vendor_id'] for dev in devs]))
 
+    def test_support_requests_does_not_copy_pools(self):
+        with mock.patch('copy.deepcopy') as mock_deepcopy:
+            self.assertTrue(self.pci_stats.support_requests(pci_requests))
+        self.assertFalse(mock_deepcopy.called)
+        self.assertEqual(set([1, 2]),
+                         set([d['count'] for d in self.pci_stats]))
+
+    def test_support_requests_counts_across_requests(self):
+        # The v1 pool holds two devices, which can't be requested twice.
+        requests = [objects.InstancePCIRequest(count=2,
+                        spec=[{'vendor_id': 'v1'}]),
+                    objects.InstancePCIRequest(count=1,
+                        spec=[{'vendor_id': 'v1', 'product_id': 'p1'}])]
+        self.assertFalse(self.pci_stats.support_requests(requests))
+        self.assertTrue(self.pci_stats.support_requests(requests[:1]))
+
+    def test_support_requests_multiple_specs(self):
+        requests = [objects.InstancePCIRequest(count=3,
+                        spec=[{'vendor_id': 'v1', 'product_id': 'p1'},
+                              {'vendor_id': 'v3'}])]
+        self.assertTrue(self.pci_stats.support_requests(requests))
+        requests[0].count = 4
+        self.assertFalse(self.pci_stats.support_requests(requests))
+
+    def test_support_requests_without_ids(self):
+        requests = [objects.InstancePCIRequest(count=2,
+                        spec=[{'product_id': 'p1'}])]
+        self.assertTrue(self.pci_stats.support_requests(requests))
+        requests[0].count = 3
+        self.assertFalse(self.pci_stats.support_requests(requests))
+
+    def test_support_requests_unknown_product(self):
+        requests = [objects.InstancePCIRequest(count=1,
+                        spec=[{'vendor_id': 'v1', 'product_id': 'p2'}])]
+        self.assertFalse(self.pci_stats.support_requests(requests))
+
+    def test_apply_requests_updates_index(self):
+        self.pci_stats.apply_requests(pci_requests)
+        self.assertFalse(self.pci_stats.support_requests(
+            [objects.InstancePCIRequest(count=1, spec=[{'vendor_id': 'v2'}])]))
+        self.assertTrue(self.pci_stats.support_requests(
+            [objects.InstancePCIRequest(count=1, spec=[{'vendor_id': 'v3'}])]))
+        self.pci_stats.add_device(self.fake_dev_2)
+        self.assertTrue(self.pci_stats.support_requests(
+            [objects.InstancePCIRequest(count=1, spec=[{'vendor_id': 'v2'}])]))
+        self.assertEqual(3, len(self.pci_stats.pools))
+
+    def test_clear(self):
+        self.pci_stats.clear()
+        self.assertEqual([], self.pci_stats.pools)
+        self.assertFalse(self.pci_stats.support_requests(pci_requests))
+
 
 @mock.patch.object(whitelist, 'get_pci_devices_filter')
 class PciDeviceStatsWithTagsTestCase(test.NoDBTestCase):
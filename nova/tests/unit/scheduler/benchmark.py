@@ -0,0 +1,416 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the scheduler drivers against synthetic clouds.
+
+A FakeCloud holds a population of compute nodes, with NUMA topologies, PCI
+device pools and availability zone aggregates, and serves them in place of
+the database. A stream of boot requests is replayed through
+select_destinations() of the scheduler driver, using the configured filters
+and weighers, and the latency of each request is recorded along with the
+time spent in each filter.
+
+Run like:
+
+    python -m nova.tests.unit.scheduler.benchmark --hosts 10000 \
+        --requests 1000 --scheduler caching
+
+Any other scheduler option, like the filters or the weighers to use, can be
+set in a configuration file given with --config-file.
+"""
+
+from __future__ import print_function
+
+import math
+import random
+import sys
+import time
+import uuid
+
+import mock
+from oslo_config import cfg
+from oslo_utils import timeutils
+
+from nova.compute import vm_states
+from nova import config
+from nova import context
+from nova import exception
+from nova import objects
+from nova.scheduler import caching_scheduler
+from nova.scheduler import filter_scheduler
+
+benchmark_opts = [
+    cfg.IntOpt('hosts',
+               default=1000,
+               help='Number of compute nodes of the synthetic cloud'),
+    cfg.IntOpt('requests',
+               default=1000,
+               help='Number of boot requests to replay'),
+    cfg.StrOpt('scheduler',
+               default='filter',
+               choices=('filter', 'caching'),
+               help='Scheduler driver to benchmark'),
+    cfg.IntOpt('aggregates',
+               default=4,
+               help='Number of availability zone aggregates'),
+    cfg.FloatOpt('numa-ratio',
+                 default=0.2,
+                 help='Ratio of the requests asking for a NUMA topology'),
+    cfg.FloatOpt('pci-ratio',
+                 default=0.1,
+                 help='Ratio of the requests asking for PCI devices'),
+    cfg.IntOpt('max-num-instances',
+               default=1,
+               help='Maximum number of instances of a request'),
+    cfg.IntOpt('seed',
+               default=0,
+               help='Seed of the random generator building the cloud and '
+                    'the requests'),
+]
+
+CONF = cfg.CONF
+CONF.import_opt('compute_topic', 'nova.compute.rpcapi')
+CONF.import_opt('scheduler_default_filters', 'nova.scheduler.host_manager')
+
+# Hardware of the compute nodes, picked at random for each node
+HOST_PROFILES = [
+    {'vcpus': 8, 'memory_mb': 16384, 'local_gb': 500,
+     'numa_nodes': 1, 'pci_devices': 0},
+    {'vcpus': 16, 'memory_mb': 65536, 'local_gb': 1000,
+     'numa_nodes': 2, 'pci_devices': 0},
+    {'vcpus': 32, 'memory_mb': 131072, 'local_gb': 2000,
+     'numa_nodes': 2, 'pci_devices': 8},
+    {'vcpus': 48, 'memory_mb': 262144, 'local_gb': 4000,
+     'numa_nodes': 4, 'pci_devices': 16},
+]
+
+FLAVORS = [
+    {'flavorid': '1', 'name': 'm1.tiny', 'memory_mb': 512, 'vcpus': 1,
+     'root_gb': 1, 'ephemeral_gb': 0},
+    {'flavorid': '2', 'name': 'm1.small', 'memory_mb': 2048, 'vcpus': 1,
+     'root_gb': 20, 'ephemeral_gb': 0},
+    {'flavorid': '3', 'name': 'm1.medium', 'memory_mb': 4096, 'vcpus': 2,
+     'root_gb': 40, 'ephemeral_gb': 0},
+    {'flavorid': '4', 'name': 'm1.large', 'memory_mb': 8192, 'vcpus': 4,
+     'root_gb': 80, 'ephemeral_gb': 0},
+    {'flavorid': '5', 'name': 'm1.xlarge', 'memory_mb': 16384, 'vcpus': 8,
+     'root_gb': 160, 'ephemeral_gb': 0},
+]
+
+# Virtual function of an Intel 82599 NIC
+PCI_VENDOR_ID = '8086'
+PCI_PRODUCT_ID = '10ed'
+
+
+def percentile(values, percent):
+    """Return the given percentile of the values, by the nearest rank."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(ordered)))
+    return ordered[max(rank, 1) - 1]
+
+
+class FakeCloud(object):
+    """Synthetic population of compute nodes, served as the database."""
+
+    def __init__(self, num_hosts, num_aggregates=0, seed=0):
+        self.random = random.Random(seed)
+        self.compute_nodes = []
+        self.services = []
+        self.aggregates = []
+        self._numa_topologies = {}
+        for i in xrange(num_hosts):
+            self._add_host(i)
+        hosts = [service.host for service in self.services]
+        for i in xrange(num_aggregates):
+            self.aggregates.append(objects.Aggregate(
+                id=i + 1, name='agg%d' % i, hosts=hosts[i::num_aggregates],
+                metadata={'availability_zone': 'az%d' % i}))
+
+    @property
+    def availability_zones(self):
+        return [aggregate.metadata['availability_zone']
+                for aggregate in self.aggregates]
+
+    def _numa_topology(self, profile, vcpus_used, memory_mb_used):
+        # Nodes sharing a profile and a usage share the same topology,
+        # which saves serializing it for every node.
+        key = (profile['vcpus'], profile['memory_mb'], profile['numa_nodes'],
+               vcpus_used, memory_mb_used)
+        topology = self._numa_topologies.get(key)
+        if topology is None:
+            num_cells = profile['numa_nodes']
+            cpus_per_cell = profile['vcpus'] // num_cells
+            cells = []
+            for cell_id in xrange(num_cells):
+                first_cpu = cell_id * cpus_per_cell
+                cells.append(objects.NUMACell(
+                    id=cell_id,
+                    cpuset=set(range(first_cpu, first_cpu + cpus_per_cell)),
+                    memory=profile['memory_mb'] // num_cells,
+                    cpu_usage=vcpus_used // num_cells,
+                    memory_usage=memory_mb_used // num_cells,
+                    mempages=[], siblings=[], pinned_cpus=set()))
+            topology = objects.NUMATopology(cells=cells)._to_json()
+            self._numa_topologies[key] = topology
+        return topology
+
+    def _add_host(self, index):
+        profile = self.random.choice(HOST_PROFILES)
+        host = 'host%d' % index
+        # Fill each host with a random number of small instances
+        num_instances = self.random.randint(0, profile['vcpus'] // 2)
+        vcpus_used = num_instances
+        memory_mb_used = num_instances * 2048
+        local_gb_used = num_instances * 20
+
+        pci_device_pools = objects.PciDevicePoolList(objects=[])
+        if profile['pci_devices']:
+            pci_device_pools.objects.append(objects.PciDevicePool(
+                vendor_id=PCI_VENDOR_ID, product_id=PCI_PRODUCT_ID,
+                tags={'numa_node': '0'},
+                count=self.random.randint(0, profile['pci_devices'])))
+
+        now = timeutils.utcnow()
+        self.compute_nodes.append(objects.ComputeNode(
+            id=index + 1, host=host, hypervisor_hostname=host,
+            vcpus=profile['vcpus'], vcpus_used=vcpus_used,
+            memory_mb=profile['memory_mb'],
+            free_ram_mb=profile['memory_mb'] - memory_mb_used,
+            memory_mb_used=memory_mb_used,
+            local_gb=profile['local_gb'], local_gb_used=local_gb_used,
+            free_disk_gb=profile['local_gb'] - local_gb_used,
+            disk_available_least=None,
+            numa_topology=self._numa_topology(profile, vcpus_used,
+                                              memory_mb_used),
+            pci_device_pools=pci_device_pools,
+            host_ip='10.%d.%d.%d' % (index >> 16 & 255, index >> 8 & 255,
+                                     index & 255),
+            hypervisor_type='QEMU', hypervisor_version=2000000,
+            cpu_info='', supported_hv_specs=[],
+            stats={'num_instances': str(num_instances), 'io_workload': '0'},
+            metrics=None, created_at=now, updated_at=None, deleted=False))
+        self.services.append(objects.Service(
+            id=index + 1, host=host, binary='nova-compute',
+            topic=CONF.compute_topic, disabled=False, report_count=1,
+            created_at=now, updated_at=now))
+
+    def get_services(self, context, topic, *args, **kwargs):
+        # The services are kept alive for the whole benchmark
+        now = timeutils.utcnow()
+        for service in self.services:
+            service.updated_at = now
+        return self.services
+
+    def get_compute_nodes(self, context, *args, **kwargs):
+        return self.compute_nodes
+
+    def get_aggregates(self, context, *args, **kwargs):
+        return self.aggregates
+
+    def patch_db(self):
+        """Return patchers serving the cloud in place of the database."""
+        return [
+            mock.patch.object(objects.ServiceList, 'get_by_topic',
+                              side_effect=self.get_services),
+            mock.patch.object(objects.ComputeNodeList, 'get_all',
+                              side_effect=self.get_compute_nodes),
+            mock.patch.object(objects.ComputeNodeList,
+                              'get_all_changed_since', return_value=[]),
+            mock.patch.object(objects.AggregateList, 'get_all',
+                              side_effect=self.get_aggregates),
+            mock.patch.object(objects.InstanceList, 'get_by_filters',
+                              return_value=[]),
+        ]
+
+
+class RequestGenerator(object):
+    """Stream of random boot requests for a FakeCloud."""
+
+    def __init__(self, cloud, numa_ratio=0.0, pci_ratio=0.0,
+                 max_num_instances=1, seed=0):
+        self.cloud = cloud
+        self.numa_ratio = numa_ratio
+        self.pci_ratio = pci_ratio
+        self.max_num_instances = max_num_instances
+        self.random = random.Random(seed)
+
+    def _numa_topology(self, flavor):
+        if flavor['vcpus'] < 2 or self.random.random() >= self.numa_ratio:
+            return None
+        vcpus_per_cell = flavor['vcpus'] // 2
+        return objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(
+                id=cell_id,
+                cpuset=set(range(cell_id * vcpus_per_cell,
+                                 (cell_id + 1) * vcpus_per_cell)),
+                memory=flavor['memory_mb'] // 2)
+            for cell_id in xrange(2)])
+
+    def _pci_requests(self, instance_uuid):
+        if self.random.random() >= self.pci_ratio:
+            return None
+        return objects.InstancePCIRequests(
+            instance_uuid=instance_uuid,
+            requests=[objects.InstancePCIRequest(
+                count=1, alias_name='vf',
+                spec=[{'vendor_id': PCI_VENDOR_ID,
+                       'product_id': PCI_PRODUCT_ID}])])
+
+    def generate(self, num_requests):
+        """Yield (request_spec, filter_properties) tuples."""
+        for i in xrange(num_requests):
+            yield self.request()
+
+    def request(self):
+        flavor = dict(self.random.choice(FLAVORS), extra_specs={})
+        instance_uuid = str(uuid.UUID(int=self.random.getrandbits(128)))
+        availability_zones = self.cloud.availability_zones
+        pci_requests = self._pci_requests(instance_uuid)
+        instance_properties = {
+            'uuid': instance_uuid,
+            'project_id': 'project%d' % self.random.randint(0, 99),
+            'os_type': 'linux',
+            'vm_state': vm_states.BUILDING,
+            'task_state': None,
+            'memory_mb': flavor['memory_mb'],
+            'vcpus': flavor['vcpus'],
+            'root_gb': flavor['root_gb'],
+            'ephemeral_gb': flavor['ephemeral_gb'],
+            'availability_zone': (self.random.choice(availability_zones)
+                                  if availability_zones else None),
+            'numa_topology': self._numa_topology(flavor),
+            'pci_requests': pci_requests,
+        }
+        request_spec = {
+            'num_instances': self.random.randint(1, self.max_num_instances),
+            'instance_properties': instance_properties,
+            'instance_type': flavor,
+            'image': {'properties': {}},
+            'instance_uuids': [instance_uuid],
+        }
+        filter_properties = {'scheduler_hints': {}}
+        if pci_requests:
+            filter_properties['pci_requests'] = pci_requests
+        return request_spec, filter_properties
+
+
+class BenchmarkResult(object):
+    """Latencies of the replayed requests and cost of the filters."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.failures = 0
+        self.filter_stats = {}
+
+    def record(self, elapsed, failed=False):
+        self.latencies.append(elapsed)
+        if failed:
+            self.failures += 1
+
+    @property
+    def requests_per_second(self):
+        total = sum(self.latencies)
+        if not total:
+            return 0.0
+        return len(self.latencies) / total
+
+    def to_dict(self):
+        return {'scheduler': self.name,
+                'requests': len(self.latencies),
+                'failures': self.failures,
+                'p50': percentile(self.latencies, 50),
+                'p99': percentile(self.latencies, 99),
+                'requests_per_second': self.requests_per_second,
+                'filter_stats': self.filter_stats}
+
+    def report(self):
+        """Return the result as text lines."""
+        result = self.to_dict()
+        lines = ['%(scheduler)s: %(requests)d requests, %(failures)d '
+                 'without a valid host' % result]
+        if self.latencies:
+            lines.append('latency p50 %.6fs, p99 %.6fs, %.1f requests/s' %
+                         (result['p50'], result['p99'],
+                          result['requests_per_second']))
+        for name, stats in sorted(self.filter_stats.items()):
+            lines.append('  %s: %.6fs in %d runs, %d/%d hosts passing' %
+                         (name, stats['elapsed'], stats['runs'],
+                          stats['objects_out'], stats['objects_in']))
+        return lines
+
+
+def run_benchmark(scheduler, cloud, requests):
+    """Replay the requests through the scheduler, returning the result.
+
+    The periodic tasks of the scheduler are run once before the first
+    request, which fills the host cache of the CachingScheduler.
+    """
+    ctxt = context.get_admin_context()
+    result = BenchmarkResult(scheduler.__class__.__name__)
+    patchers = cloud.patch_db()
+    for patcher in patchers:
+        patcher.start()
+    try:
+        scheduler.run_periodic_tasks(ctxt)
+        for request_spec, filter_properties in requests:
+            start = time.time()
+            try:
+                scheduler.select_destinations(ctxt, request_spec,
+                                              filter_properties)
+                failed = False
+            except exception.NoValidHost:
+                failed = True
+            result.record(time.time() - start, failed)
+    finally:
+        for patcher in reversed(patchers):
+            patcher.stop()
+    result.filter_stats = scheduler.host_manager.get_filter_stats()
+    return result
+
+
+SCHEDULERS = {
+    'filter': filter_scheduler.FilterScheduler,
+    'caching': caching_scheduler.CachingScheduler,
+}
+
+
+def main():
+    CONF.register_cli_opts(benchmark_opts)
+    # The requests asking for NUMA topologies and PCI devices need their
+    # filters, unless others are set in a configuration file.
+    CONF.set_default('scheduler_default_filters',
+                     CONF.scheduler_default_filters +
+                     ['NUMATopologyFilter', 'PciPassthroughFilter'])
+    config.parse_args(sys.argv)
+    objects.register_all()
+
+    cloud = FakeCloud(CONF.hosts, num_aggregates=CONF.aggregates,
+                      seed=CONF.seed)
+    generator = RequestGenerator(cloud, numa_ratio=CONF.numa_ratio,
+                                 pci_ratio=CONF.pci_ratio,
+                                 max_num_instances=CONF.max_num_instances,
+                                 seed=CONF.seed)
+    scheduler = SCHEDULERS[CONF.scheduler]()
+    result = run_benchmark(scheduler, cloud, generator.generate(CONF.requests))
+    for line in result.report():
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -43,6 +43,18 @@ class TestDifferentHostFilter(test.NoDBTestCase):
                                               'uuid': ['fake'],
                                               'deleted': False})
 
+    def test_affinity_different_filter_tracked_instances(self,
+                                                         get_all_mock):
+        host = fakes.FakeHostState('host1', 'node1',
+                                   {'instances': set(['fake1'])})
+        self.assertTrue(self.filt_cls.host_passes(
+            host, {'context': mock.sentinel.ctx,
+                   'scheduler_hints': {'different_host': ['fake2']}}))
+        self.assertFalse(self.filt_cls.host_passes(
+            host, {'context': mock.sentinel.ctx,
+                   'scheduler_hints': {'different_host': ['fake1']}}))
+        self.assertFalse(get_all_mock.called)
+
     def test_affinity_different_filter_no_list_passes(self, get_all_mock):
         host = fakes.FakeHostState('host1', 'node1', {})
         get_all_mock.return_value = []
@@ -102,6 +114,17 @@ class TestSameHostFilter(test.NoDBTestCase):
                                               'uuid': ['fake'],
                                               'deleted': False})
 
+    def test_affinity_same_filter_tracked_instances(self, get_all_mock):
+        host = fakes.FakeHostState('host1', 'node1',
+                                   {'instances': set(['fake1'])})
+        self.assertTrue(self.filt_cls.host_passes(
+            host, {'context': mock.sentinel.ctx,
+                   'scheduler_hints': {'same_host': ['fake1', 'fake2']}}))
+        self.assertFalse(self.filt_cls.host_passes(
+            host, {'context': mock.sentinel.ctx,
+                   'scheduler_hints': {'same_host': ['fake2']}}))
+        self.assertFalse(get_all_mock.called)
+
     def test_affinity_same_filter_no_list_passes(self, get_all_mock):
         host = fakes.FakeHostState('host1', 'node1', {})
         get_all_mock.return_value = [mock.sentinel.images]
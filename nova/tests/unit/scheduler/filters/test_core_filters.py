@@ -11,7 +11,9 @@
 #    under the License.
 
 import mock
+import testtools
 
+from nova import filters
 from nova.scheduler.filters import core_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -85,3 +87,20 @@ class TestCoreFilter(test.NoDBTestCase):
         # use the minimum ratio from aggregates
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
         self.assertEqual(4 * 2, host.limits['vcpu'])
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_core_filter_batch(self):
+        self.filt_cls = core_filter.CoreFilter()
+        filter_properties = {'instance_type': {'vcpus': 1}}
+        self.flags(cpu_allocation_ratio=2)
+        hosts = [fakes.FakeHostState('host1', 'node1',
+                    {'vcpus_total': 4, 'vcpus_used': 7}),
+                 fakes.FakeHostState('host2', 'node2',
+                    {'vcpus_total': 4, 'vcpus_used': 8}),
+                 fakes.FakeHostState('host3', 'node3', {})]
+        passes = self.filt_cls.filter_batch(filters.ObjectColumns(hosts),
+                                            filter_properties)
+        self.assertEqual([True, False, True], passes.tolist())
+        self.assertEqual(4 * 2, hosts[0].limits['vcpu'])
+        self.assertNotIn('vcpu', hosts[1].limits)
+        self.assertNotIn('vcpu', hosts[2].limits)
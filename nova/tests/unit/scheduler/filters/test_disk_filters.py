@@ -11,7 +11,9 @@
 #    under the License.
 
 import mock
+import testtools
 
+from nova import filters
 from nova.scheduler.filters import disk_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -98,3 +100,19 @@ class TestDiskFilter(test.NoDBTestCase):
 
         agg_mock.return_value = set(['2'])
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_disk_filter_batch(self):
+        self.flags(disk_allocation_ratio=10.0)
+        filt_cls = disk_filter.DiskFilter()
+        filter_properties = {'instance_type': {'root_gb': 100,
+            'ephemeral_gb': 18, 'swap': 1024}}
+        hosts = [fakes.FakeHostState('host1', 'node1',
+                    {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 12}),
+                 fakes.FakeHostState('host2', 'node2',
+                    {'free_disk_mb': 10 * 1024, 'total_usable_disk_gb': 12})]
+        passes = filt_cls.filter_batch(filters.ObjectColumns(hosts),
+                                       filter_properties)
+        self.assertEqual([True, False], passes.tolist())
+        self.assertEqual(12 * 10.0, hosts[0].limits['disk_gb'])
+        self.assertNotIn('disk_gb', hosts[1].limits)
@@ -12,7 +12,9 @@
 
 
 import mock
+import testtools
 
+from nova import filters
 from nova.scheduler.filters import io_ops_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -61,3 +63,25 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         agg_mock.assert_called_once_with(mock.sentinel.ctx, 'host1',
             'max_io_ops_per_host')
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_filter_num_iops_batch(self):
+        self.flags(max_io_ops_per_host=8)
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        hosts = [fakes.FakeHostState('host1', 'node1', {'num_io_ops': 7}),
+                 fakes.FakeHostState('host2', 'node2', {'num_io_ops': 8})]
+        passes = self.filt_cls.filter_batch(filters.ObjectColumns(hosts), {})
+        self.assertEqual([True, False], passes.tolist())
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_db')
+    def test_aggregate_filter_num_iops_batch(self, agg_mock):
+        self.flags(max_io_ops_per_host=7)
+        self.filt_cls = io_ops_filter.AggregateIoOpsFilter()
+        hosts = [fakes.FakeHostState('host1', 'node1', {'num_io_ops': 7}),
+                 fakes.FakeHostState('host2', 'node2', {'num_io_ops': 7})]
+        filter_properties = {'context': mock.sentinel.ctx}
+        agg_mock.side_effect = [set(['8']), set([])]
+        passes = self.filt_cls.filter_batch(filters.ObjectColumns(hosts),
+                                            filter_properties)
+        self.assertEqual([True, False], passes.tolist())
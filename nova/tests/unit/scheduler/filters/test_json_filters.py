@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
 from oslo_serialization import jsonutils
 
 from nova.scheduler.filters import json_filter
@@ -287,3 +288,40 @@ class TestJsonFilter(test.NoDBTestCase):
             },
         }
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
+
+    def test_json_filter_compiles_query_once(self):
+        filter_properties = {'scheduler_hints': {'query': self.json_query}}
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'free_ram_mb': free_ram_mb,
+                                      'free_disk_mb': 200 * 1024})
+                 for i, free_ram_mb in enumerate([512, 1024, 2048])]
+
+        with mock.patch.object(jsonutils, 'loads',
+                               side_effect=jsonutils.loads) as mock_loads:
+            result = [self.filt_cls.host_passes(host, filter_properties)
+                      for host in hosts]
+
+        self.assertEqual([False, True, True], result)
+        self.assertEqual(1, mock_loads.call_count)
+
+    def test_json_filter_compiled_lookup_follows_host_state(self):
+        filter_properties = {'scheduler_hints': {'query': jsonutils.dumps(
+            ['=', '$stats.key', 'value'])}}
+        host = fakes.FakeHostState('host1', 'node1',
+                                   {'stats': {'key': 'value'}})
+        self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
+        host.stats['key'] = 'other'
+        self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
+
+    def test_json_filter_evicts_least_recently_used_query(self):
+        self.stubs.Set(json_filter, 'MAX_COMPILED_QUERIES', 2)
+        host = fakes.FakeHostState('host1', 'node1', {'free_ram_mb': 1024})
+        queries = [jsonutils.dumps(['>=', '$free_ram_mb', ram])
+                   for ram in (256, 512, 1024)]
+
+        for query in (queries[0], queries[1], queries[0], queries[2]):
+            self.filt_cls.host_passes(
+                host, {'scheduler_hints': {'query': query}})
+
+        self.assertEqual([queries[0], queries[2]],
+                         list(self.filt_cls._compiled_queries))
@@ -11,7 +11,9 @@
 #    under the License.
 
 import mock
+import testtools
 
+from nova import filters
 from nova.scheduler.filters import num_instances_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -61,3 +63,12 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         agg_mock.assert_called_once_with(mock.sentinel.ctx, 'host1',
             'max_instances_per_host')
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_filter_num_instances_batch(self):
+        self.flags(max_instances_per_host=5)
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        hosts = [fakes.FakeHostState('host1', 'node1', {'num_instances': 4}),
+                 fakes.FakeHostState('host2', 'node2', {'num_instances': 5})]
+        passes = self.filt_cls.filter_batch(filters.ObjectColumns(hosts), {})
+        self.assertEqual([True, False], passes.tolist())
@@ -148,3 +148,20 @@ class TestNUMATopologyFilter(test.NoDBTestCase):
         self.assertEqual(limits_topology.cells[1].cpu_limit, 42)
         self.assertEqual(limits_topology.cells[0].memory_limit, 665)
         self.assertEqual(limits_topology.cells[1].memory_limit, 665)
+
+    @mock.patch.object(hardware, 'numa_fit_instance_to_host')
+    def test_numa_topology_filter_fail_capacity_without_fit(self, mock_fit):
+        instance_topology = objects.InstanceNUMATopology(
+            cells=[objects.InstanceNUMACell(id=0, cpuset=set([1]),
+                                            memory=1024)])
+        instance = fake_instance.fake_instance_obj(mock.sentinel.ctx)
+        instance.numa_topology = instance_topology
+        filter_properties = {
+            'request_spec': {
+                'instance_properties': jsonutils.to_primitive(
+                    obj_base.obj_to_primitive(instance))}}
+        host = fakes.FakeHostState('host1', 'node1',
+                                   {'numa_topology': fakes.NUMA_TOPOLOGY,
+                                    'pci_stats': None})
+        self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
+        self.assertFalse(mock_fit.called)
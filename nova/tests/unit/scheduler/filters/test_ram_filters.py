@@ -11,7 +11,9 @@
 #    under the License.
 
 import mock
+import testtools
 
+from nova import filters
 from nova.scheduler.filters import ram_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
@@ -45,6 +47,20 @@ class TestRamFilter(test.NoDBTestCase):
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         self.assertEqual(2048 * 2.0, host.limits['memory_mb'])
 
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_ram_filter_batch(self):
+        ram_filter.RamFilter.ram_allocation_ratio = 2.0
+        filter_properties = {'instance_type': {'memory_mb': 1024}}
+        hosts = [fakes.FakeHostState('host1', 'node1',
+                    {'free_ram_mb': -1024, 'total_usable_ram_mb': 2048}),
+                 fakes.FakeHostState('host2', 'node2',
+                    {'free_ram_mb': -1025, 'total_usable_ram_mb': 2048})]
+        passes = self.filt_cls.filter_batch(filters.ObjectColumns(hosts),
+                                            filter_properties)
+        self.assertEqual([True, False], passes.tolist())
+        self.assertEqual(2048 * 2.0, hosts[0].limits['memory_mb'])
+        self.assertNotIn('memory_mb', hosts[1].limits)
+
 
 @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_db')
 class TestAggregateRamFilter(test.NoDBTestCase):
@@ -87,3 +103,18 @@ class TestAggregateRamFilter(test.NoDBTestCase):
         # use the minimum ratio from aggregates
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         self.assertEqual(1024 * 1.5, host.limits['memory_mb'])
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_aggregate_ram_filter_batch(self, agg_mock):
+        self.flags(ram_allocation_ratio=1.0)
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'instance_type': {'memory_mb': 1024}}
+        hosts = [fakes.FakeHostState('host1', 'node1',
+                    {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024}),
+                 fakes.FakeHostState('host2', 'node2',
+                    {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024})]
+        agg_mock.side_effect = [set(['2.0']), set()]
+        passes = self.filt_cls.filter_batch(filters.ObjectColumns(hosts),
+                                            filter_properties)
+        self.assertEqual([True, False], passes.tolist())
+        self.assertEqual(1024 * 2.0, hosts[0].limits['memory_mb'])
@@ -0,0 +1,111 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the scheduler benchmark harness.
+"""
+
+from nova import objects
+from nova.scheduler import caching_scheduler
+from nova.scheduler import filter_scheduler
+from nova import test
+from nova.tests.unit.scheduler import benchmark
+
+
+class BenchmarkTestCase(test.NoDBTestCase):
+    """Test case for the scheduler benchmark harness."""
+
+    def setUp(self):
+        super(BenchmarkTestCase, self).setUp()
+        self.flags(scheduler_default_filters=[
+            'AvailabilityZoneFilter', 'RamFilter', 'ComputeFilter',
+            'NUMATopologyFilter', 'PciPassthroughFilter'])
+        self.cloud = benchmark.FakeCloud(20, num_aggregates=2, seed=1)
+        self.generator = benchmark.RequestGenerator(
+            self.cloud, numa_ratio=0.5, pci_ratio=0.5, max_num_instances=3,
+            seed=1)
+
+    def test_percentile(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(3, benchmark.percentile(values, 50))
+        self.assertEqual(5, benchmark.percentile(values, 99))
+        self.assertEqual(1, benchmark.percentile(values, 0))
+        self.assertIsNone(benchmark.percentile([], 50))
+
+    def test_fake_cloud(self):
+        self.assertEqual(20, len(self.cloud.compute_nodes))
+        self.assertEqual(20, len(self.cloud.services))
+        self.assertEqual(['az0', 'az1'], self.cloud.availability_zones)
+        self.assertEqual(10, len(self.cloud.aggregates[0].hosts))
+        for compute in self.cloud.compute_nodes:
+            self.assertLessEqual(compute.vcpus_used, compute.vcpus)
+            self.assertIsNotNone(compute.numa_topology)
+            self.assertIsInstance(compute.pci_device_pools,
+                                  objects.PciDevicePoolList)
+
+    def test_fake_cloud_is_deterministic(self):
+        other = benchmark.FakeCloud(20, num_aggregates=2, seed=1)
+        self.assertEqual(
+            [compute.free_ram_mb for compute in self.cloud.compute_nodes],
+            [compute.free_ram_mb for compute in other.compute_nodes])
+
+    def test_generate_requests(self):
+        requests = list(self.generator.generate(10))
+
+        self.assertEqual(10, len(requests))
+        for request_spec, filter_properties in requests:
+            props = request_spec['instance_properties']
+            self.assertIn(props['availability_zone'], ['az0', 'az1'])
+            self.assertIn(request_spec['num_instances'], [1, 2, 3])
+            self.assertEqual(props['memory_mb'],
+                             request_spec['instance_type']['memory_mb'])
+            self.assertIs(props['pci_requests'],
+                          filter_properties.get('pci_requests'))
+
+    def _test_run_benchmark(self, scheduler):
+        result = benchmark.run_benchmark(scheduler, self.cloud,
+                                         self.generator.generate(10))
+
+        self.assertEqual(10, len(result.latencies))
+        result_dict = result.to_dict()
+        self.assertEqual(10, result_dict['requests'])
+        self.assertLessEqual(result_dict['p50'], result_dict['p99'])
+        self.assertGreater(result_dict['requests_per_second'], 0)
+        self.assertEqual(set(['AvailabilityZoneFilter', 'RamFilter',
+                              'ComputeFilter', 'NUMATopologyFilter',
+                              'PciPassthroughFilter']),
+                         set(result.filter_stats))
+        self.assertEqual(2 + len(result.filter_stats), len(result.report()))
+        return result
+
+    def test_run_benchmark_filter_scheduler(self):
+        result = self._test_run_benchmark(
+            filter_scheduler.FilterScheduler())
+        self.assertEqual('FilterScheduler', result.name)
+
+    def test_run_benchmark_caching_scheduler(self):
+        scheduler = caching_scheduler.CachingScheduler()
+        result = self._test_run_benchmark(scheduler)
+        self.assertEqual('CachingScheduler', result.name)
+        self.assertEqual(20, len(scheduler.all_host_states))
+
+    def test_run_benchmark_without_valid_host(self):
+        cloud = benchmark.FakeCloud(0)
+        generator = benchmark.RequestGenerator(cloud)
+
+        result = benchmark.run_benchmark(filter_scheduler.FilterScheduler(),
+                                         cloud, generator.generate(2))
+
+        self.assertEqual(2, result.failures)
+        self.assertEqual(2, len(result.latencies))
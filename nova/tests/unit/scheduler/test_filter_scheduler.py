@@ -20,9 +20,11 @@ import mock
 
 from nova import exception
 from nova.scheduler import filter_scheduler
+from nova.scheduler.filters import ram_filter
 from nova.scheduler import host_manager
 from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
+from nova.scheduler.weights import ram
 from nova.tests.unit.scheduler import fakes
 from nova.tests.unit.scheduler import test_scheduler
 
@@ -51,7 +53,7 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 1.0
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options, **kwargs):
             self.next_weight += 2.0
             host_state = hosts[0]
             return [weights.WeighedHost(host_state, self.next_weight)]
@@ -141,11 +143,17 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                             instance_type={})
         filter_properties = {}
         self.mox.ReplayAll()
-        hosts = self.driver._schedule(self.context, request_spec,
-                filter_properties=filter_properties)
+        host_manager = self.driver.host_manager
+        with mock.patch.object(host_manager, 'get_weighed_hosts',
+                side_effect=host_manager.get_weighed_hosts) as mock_weighed:
+            hosts = self.driver._schedule(self.context, request_spec,
+                    filter_properties=filter_properties)
 
         # one host should be chosen
         self.assertEqual(len(hosts), 1)
+        # and only the subset should have been sorted
+        mock_weighed.assert_called_once_with(mock.ANY, filter_properties,
+                                             limit=2)
 
     @mock.patch('nova.objects.ServiceList.get_by_topic',
                 return_value=fakes.SERVICES)
@@ -200,7 +208,7 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 50
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options, **kwargs):
             this_weight = self.next_weight
             self.next_weight = 0
             host_state = hosts[0]
@@ -250,7 +258,7 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         selected_hosts = []
         selected_nodes = []
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options, **kwargs):
             self.next_weight += 2.0
             host_state = hosts[0]
             selected_hosts.append(host_state.host)
@@ -279,6 +287,140 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertEqual(host, selected_hosts[0])
         self.assertEqual(node, selected_nodes[0])
 
+    def _schedule_ram_hosts(self, num_instances, filter_properties=None):
+        hosts = [fakes.FakeHostState('host%s' % i, 'node%s' % i,
+                                     {'free_ram_mb': free_ram_mb,
+                                      'total_usable_ram_mb': 4096,
+                                      'free_disk_mb': 10240,
+                                      'vcpus_total': 4})
+                 for i, free_ram_mb in enumerate([3072, 4096, 1024, 3072])]
+        self.driver.host_manager.default_filters = [ram_filter.RamFilter()]
+        self.driver.host_manager.weighers = [ram.RAMWeigher()]
+        instance_properties = {'project_id': 1,
+                               'root_gb': 1,
+                               'memory_mb': 1024,
+                               'ephemeral_gb': 0,
+                               'vcpus': 1,
+                               'os_type': 'Linux',
+                               'uuid': 'fake-uuid'}
+        request_spec = {'instance_type': {'memory_mb': 1024, 'root_gb': 1,
+                                          'ephemeral_gb': 0, 'vcpus': 1},
+                        'instance_properties': instance_properties,
+                        'num_instances': num_instances}
+        with mock.patch.object(self.driver, '_get_all_host_states',
+                               return_value=iter(hosts)):
+            selected_hosts = self.driver._schedule(self.context, request_spec,
+                    filter_properties=filter_properties or {})
+        return [weighed_host.obj.host for weighed_host in selected_hosts]
+
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_schedule_incremental_multi_instance(self, mock_get_extra):
+        ram_filter.RamFilter.ram_allocation_ratio = 1.0
+        expected = self._schedule_ram_hosts(10)
+        self.flags(scheduler_incremental_multi_instance=True)
+        with mock.patch.object(self.driver, '_schedule_incremental',
+                side_effect=self.driver._schedule_incremental) as mock_incr:
+            self.assertEqual(expected, self._schedule_ram_hosts(10))
+            self.assertTrue(mock_incr.called)
+
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_schedule_incremental_refilters_consumed_host(self,
+                                                         mock_get_extra):
+        ram_filter.RamFilter.ram_allocation_ratio = 1.0
+        self.flags(scheduler_incremental_multi_instance=True)
+        host_manager = self.driver.host_manager
+        with mock.patch.object(host_manager, 'get_filtered_hosts',
+                side_effect=host_manager.get_filtered_hosts) as mock_filter:
+            self.assertEqual(['host1', 'host0', 'host1'],
+                             self._schedule_ram_hosts(3))
+        # All the hosts are filtered once, then only the consumed ones.
+        self.assertEqual(3, mock_filter.call_count)
+        for call in mock_filter.call_args_list[1:]:
+            self.assertEqual(1, len(call[0][0]))
+
+    @mock.patch.object(filter_scheduler.FilterScheduler,
+                       '_schedule_incremental')
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_schedule_incremental_not_with_group(self, mock_get_extra,
+                                                 mock_incr):
+        ram_filter.RamFilter.ram_allocation_ratio = 1.0
+        self.flags(scheduler_incremental_multi_instance=True)
+        self._schedule_ram_hosts(2, filter_properties={'group_updated': True,
+                                                       'group_hosts': set()})
+        self.assertFalse(mock_incr.called)
+
+    def _claim_conflict_on(self, conflicting_hosts):
+        claimed = []
+
+        def fake_claim(host_state, context, instance):
+            claimed.append(host_state.host)
+            if host_state.host in conflicting_hosts:
+                conflicting_hosts.remove(host_state.host)
+                # Another scheduler took the whole host.
+                host_state.free_ram_mb = 0
+                return False
+            return True
+
+        patcher = mock.patch.object(host_manager.HostState,
+                                    'claim_from_instance', autospec=True,
+                                    side_effect=fake_claim)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return claimed
+
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_schedule_claim_conflict_chooses_again(self, mock_get_extra):
+        ram_filter.RamFilter.ram_allocation_ratio = 1.0
+        self.flags(scheduler_claim_resources=True)
+        claimed = self._claim_conflict_on(['host1'])
+
+        self.assertEqual(['host0'], self._schedule_ram_hosts(1))
+        self.assertEqual(['host1', 'host0'], claimed)
+
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_schedule_incremental_claim_conflict(self, mock_get_extra):
+        ram_filter.RamFilter.ram_allocation_ratio = 1.0
+        self.flags(scheduler_claim_resources=True,
+                   scheduler_incremental_multi_instance=True)
+        claimed = self._claim_conflict_on(['host1'])
+
+        self.assertEqual(['host0', 'host3'], self._schedule_ram_hosts(2))
+        self.assertEqual(['host1', 'host0', 'host3'], claimed)
+
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_schedule_claim_retries_exhausted(self, mock_get_extra):
+        ram_filter.RamFilter.ram_allocation_ratio = 1.0
+        self.flags(scheduler_claim_resources=True,
+                   scheduler_claim_max_retries=1)
+
+        with mock.patch.object(host_manager.HostState, 'claim_from_instance',
+                               return_value=False) as mock_claim:
+            self.assertEqual(['host1'], self._schedule_ram_hosts(1))
+        self.assertEqual(2, mock_claim.call_count)
+
+    @mock.patch('nova.db.instance_extra_get_by_instance_uuid',
+                return_value={'numa_topology': None,
+                              'pci_requests': None})
+    def test_schedule_no_claim_by_default(self, mock_get_extra):
+        ram_filter.RamFilter.ram_allocation_ratio = 1.0
+
+        with mock.patch.object(host_manager.HostState,
+                               'claim_from_instance') as mock_claim:
+            self.assertEqual(['host1'], self._schedule_ram_hosts(1))
+        self.assertFalse(mock_claim.called)
+
     @mock.patch.object(filter_scheduler.FilterScheduler, '_schedule')
     def test_select_destinations_notifications(self, mock_schedule):
         mock_schedule.return_value = [mock.Mock()]
@@ -18,6 +18,9 @@ Tests For Scheduler Host Filters.
 import inspect
 import sys
 
+import mock
+import testtools
+
 from nova import filters
 from nova import loadables
 from nova import test
@@ -199,3 +202,159 @@ class FiltersTestCase(test.NoDBTestCase):
                                                      filter_objs_initial,
                                                      filter_properties)
         self.assertIsNone(result)
+
+
+class FilterStatsTestCase(test.NoDBTestCase):
+    def test_rank(self):
+        stats = filters.FilterStats()
+        self.assertEqual(0.0, stats.rank())
+        stats.record(10, 5, 1.0)
+        stats.record(10, 5, 1.0)
+        self.assertEqual(0.5, stats.pass_ratio)
+        self.assertEqual(0.1, stats.cost)
+        self.assertEqual(0.2, stats.rank())
+        stats.record(20, 20, 0.0)
+        self.assertEqual(0.75, stats.pass_ratio)
+        self.assertAlmostEqual(0.2, stats.rank())
+
+    def test_rank_no_rejection(self):
+        stats = filters.FilterStats()
+        stats.record(10, 10, 0.1)
+        self.assertEqual(float('inf'), stats.rank())
+
+    def test_merge(self):
+        stats = filters.FilterStats()
+        stats.record(10, 5, 1.0)
+        other = filters.FilterStats()
+        other.record(10, 0, 1.0)
+        stats.merge(other)
+        self.assertEqual(1, stats.runs)
+        self.assertEqual(20, stats.objects_in)
+        self.assertEqual(5, stats.objects_out)
+        self.assertEqual(2.0, stats.elapsed)
+
+
+class FilterOrderingTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(FilterOrderingTestCase, self).setUp()
+        self.stubs.Set(loadables.BaseLoader, '__init__',
+                       lambda *args, **kwargs: None)
+        self.filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+
+    def _record(self, filter, objects_out, elapsed):
+        self.filter_handler._get_stats(filter).record(10, objects_out,
+                                                      elapsed)
+
+    def test_order_filters(self):
+        filt1 = Filter1()
+        filt2 = Filter2()
+        self.assertEqual([filt1, filt2],
+                         self.filter_handler.order_filters([filt1, filt2]))
+        # Filter2 is cheaper and rejects more objects.
+        self._record(filt1, 8, 1.0)
+        self._record(filt2, 2, 0.1)
+        self.assertEqual([filt2, filt1],
+                         self.filter_handler.order_filters([filt1, filt2]))
+
+    def test_order_filters_not_commutative(self):
+        filt1 = Filter1()
+        filt2 = Filter2()
+        barrier = filters.BaseFilter()
+        barrier.commutative = False
+        self._record(filt1, 8, 1.0)
+        self._record(filt2, 2, 0.1)
+        self.assertEqual([filt1, barrier, filt2],
+                         self.filter_handler.order_filters(
+                             [filt1, barrier, filt2]))
+
+    def test_get_filtered_objects_stats(self):
+        class OddFilter(filters.BaseFilter):
+            def _filter_one(self, obj, filter_properties):
+                return obj % 2 == 1
+
+        filt1 = Filter1()
+        odd_filter = OddFilter()
+        result = self.filter_handler.get_filtered_objects(
+            [filt1, odd_filter], range(10), {})
+        self.assertEqual([1, 3, 5, 7, 9], result)
+        stats = self.filter_handler.get_filter_stats()
+        self.assertEqual(1, stats['OddFilter']['runs'])
+        self.assertEqual(10, stats['OddFilter']['objects_in'])
+        self.assertEqual(5, stats['OddFilter']['objects_out'])
+        self.assertEqual(1.0, stats['Filter1']['pass_ratio'])
+
+        with mock.patch.object(self.filter_handler, 'order_filters',
+                               return_value=[odd_filter, filt1]):
+            self.filter_handler.get_filtered_objects(
+                [filt1, odd_filter], range(10), {}, reorder=True)
+        stats = self.filter_handler.get_filter_stats()
+        self.assertEqual(15, stats['Filter1']['objects_out'])
+
+
+class FakeObj(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class VectorizedFilter(filters.BaseFilter):
+    """Keeps the objects having a value lower than 3."""
+    vectorized = True
+
+    def filter_batch(self, columns, filter_properties):
+        return columns['value'] < 3
+
+
+class OddFilter(filters.BaseFilter):
+    """Keeps the objects having an odd value."""
+    def _filter_one(self, obj, filter_properties):
+        return obj.value % 2 == 1
+
+
+@testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+class ObjectColumnsTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(ObjectColumnsTestCase, self).setUp()
+        self.objs = [FakeObj(value) for value in (1, 2, None, 4)]
+        self.columns = filters.ObjectColumns(self.objs)
+        self.stubs.Set(loadables.BaseLoader, '__init__',
+                       lambda *args, **kwargs: None)
+
+    def test_getitem(self):
+        values = self.columns['value']
+        self.assertEqual([1, 2], values[:2].tolist())
+        self.assertNotEqual(values[2], values[2])
+        self.assertIs(values, self.columns['value'])
+
+    def test_select(self):
+        self.columns['value']
+        mask = filters.numpy.array([False, True, False, True])
+        selected = self.columns.select(mask)
+        self.assertEqual([self.objs[1], self.objs[3]], selected.objs)
+        self.assertEqual([2, 4], selected['value'].tolist())
+        self.assertEqual([self.objs[1], self.objs[3]],
+                         self.columns.selected_objs(mask))
+
+    def test_subset(self):
+        self.columns['value']
+        subset = self.columns.subset([self.objs[3], self.objs[0]])
+        self.assertEqual([self.objs[3], self.objs[0]], subset.objs)
+        self.assertEqual([4, 1], subset['value'].tolist())
+
+    def test_get_filtered_objects_vectorized(self):
+        filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+        objs = [FakeObj(value) for value in range(6)]
+        result = filter_handler.get_filtered_objects(
+            [VectorizedFilter(), OddFilter(), VectorizedFilter()], objs,
+            {}, vectorized=True)
+        self.assertEqual([objs[1]], result)
+
+    def test_get_filtered_objects_not_vectorized(self):
+        filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+        vect_filter = VectorizedFilter()
+        self.mox.StubOutWithMock(vect_filter, 'filter_batch')
+        self.mox.StubOutWithMock(vect_filter, 'filter_all')
+        vect_filter.filter_all(['obj'], {}).AndReturn(['obj'])
+        self.mox.ReplayAll()
+        result = filter_handler.get_filtered_objects([vect_filter], ['obj'],
+                                                     {})
+        self.assertEqual(['obj'], result)
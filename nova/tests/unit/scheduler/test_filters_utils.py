@@ -16,6 +16,7 @@ import mock
 
 from nova import objects
 from nova.scheduler.filters import utils
+from nova.scheduler import host_manager
 from nova import test
 
 
@@ -98,3 +99,59 @@ class UtilsTestCase(test.NoDBTestCase):
         get_by_host.assert_called_with(context.elevated(),
                                        'fake-host', key='k3')
         self.assertEqual({}, metadata)
+
+    def _get_host_state(self, aggregates):
+        host_state = host_manager.HostState('fake-host', 'fake-node')
+        host_state.aggregates = aggregates
+        return host_state
+
+    @mock.patch("nova.objects.aggregate.AggregateList.get_by_host")
+    def test_aggregate_values_for_host(self, get_by_host):
+        host_state = self._get_host_state(_AGGREGATE_FIXTURES)
+
+        values = utils.aggregate_values_for_host(mock.sentinel.ctx,
+                                                 host_state, 'k1')
+
+        self.assertFalse(get_by_host.called)
+        self.assertEqual(set(['1', '3']), values)
+        self.assertEqual(set(), utils.aggregate_values_for_host(
+            mock.sentinel.ctx, host_state, 'k3'))
+
+    @mock.patch.object(utils, 'aggregate_values_from_db')
+    def test_aggregate_values_for_host_not_indexed(self, values_from_db):
+        host_state = self._get_host_state(None)
+
+        values = utils.aggregate_values_for_host(mock.sentinel.ctx,
+                                                 host_state, 'k1')
+
+        values_from_db.assert_called_once_with(mock.sentinel.ctx,
+                                               'fake-host', 'k1')
+        self.assertEqual(values_from_db.return_value, values)
+
+    @mock.patch("nova.objects.aggregate.AggregateList.get_by_host")
+    def test_aggregate_metadata_for_host(self, get_by_host):
+        aggregates = _AGGREGATE_FIXTURES + [objects.Aggregate(
+            id=3, name='baz', hosts=['fake-host'], metadata={'k3': '5'})]
+        host_state = self._get_host_state(aggregates)
+
+        metadata = utils.aggregate_metadata_for_host(mock.sentinel.ctx,
+                                                     host_state)
+
+        self.assertFalse(get_by_host.called)
+        self.assertEqual({'k1': set(['1', '3']), 'k2': set(['2', '4']),
+                          'k3': set(['5'])}, metadata)
+        # Only the aggregates having the key are merged.
+        metadata = utils.aggregate_metadata_for_host(mock.sentinel.ctx,
+                                                     host_state, key='k3')
+        self.assertEqual({'k3': set(['5'])}, metadata)
+
+    @mock.patch.object(utils, 'aggregate_metadata_get_by_host')
+    def test_aggregate_metadata_for_host_not_indexed(self, metadata_get):
+        host_state = self._get_host_state(None)
+
+        metadata = utils.aggregate_metadata_for_host(mock.sentinel.ctx,
+                                                     host_state, key='k1')
+
+        metadata_get.assert_called_once_with(mock.sentinel.ctx, 'fake-host',
+                                             key='k1')
+        self.assertEqual(metadata_get.return_value, metadata)
@@ -32,6 +32,21 @@ class HostFiltersTestCase(test.NoDBTestCase):
         self.assertIn(all_hosts_filter.AllHostsFilter, classes)
         self.assertIn(compute_filter.ComputeFilter, classes)
 
+    def test_process_safe_filters(self):
+        filter_handler = filters.HostFilterHandler()
+        classes = filter_handler.get_matching_classes(
+                ['nova.scheduler.filters.all_filters'])
+        safe = set(cls.__name__ for cls in classes if cls.process_safe)
+        self.assertIn('RamFilter', safe)
+        self.assertIn('PciPassthroughFilter', safe)
+        # Filters using other services, the database or changing the
+        # request can't run in worker processes.
+        for name in ('ComputeFilter', 'AggregateRamFilter',
+                     'AvailabilityZoneFilter', 'SameHostFilter',
+                     'TypeAffinityFilter', 'TrustedFilter',
+                     'NUMATopologyFilter'):
+            self.assertNotIn(name, safe)
+
     def test_all_host_filter(self):
         filt_cls = all_hosts_filter.AllHostsFilter()
         host = fakes.FakeHostState('host1', 'node1', {})
@@ -16,9 +16,13 @@
 Tests For HostManager
 """
 
+import datetime
+
+import iso8601
 import mock
 from oslo_config import cfg
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 import six
 
 from nova.compute import task_states
@@ -32,6 +36,7 @@ from nova import test
 from nova.tests.unit import matchers
 from nova.tests.unit.scheduler import fakes
 from nova import utils
+from nova.virt import hardware
 
 CONF = cfg.CONF
 CONF.import_opt('compute_topic', 'nova.compute.rpcapi')
@@ -52,6 +57,10 @@ class HostManagerTestCase(test.NoDBTestCase):
 
     def setUp(self):
         super(HostManagerTestCase, self).setUp()
+        patcher = mock.patch.object(objects.AggregateList, 'get_all',
+                                    return_value=[])
+        self.mock_get_aggregates = patcher.start()
+        self.addCleanup(patcher.stop)
         self.flags(scheduler_available_filters=['%s.%s' % (__name__, cls) for
                                                 cls in ['FakeFilterClass1',
                                                         'FakeFilterClass2']])
@@ -109,6 +118,131 @@ class HostManagerTestCase(test.NoDBTestCase):
                 fake_properties)
         self._verify_result(info, result)
 
+    @mock.patch('nova.filters.BaseFilterHandler.get_filtered_objects')
+    def test_get_filtered_hosts_vectorized(self, mock_get_filtered):
+        self.flags(scheduler_vectorized_filters=True)
+        self.host_manager = host_manager.HostManager()
+        self.host_manager.get_filtered_hosts(self.fake_hosts, {})
+        mock_get_filtered.assert_called_once_with(
+            self.host_manager.default_filters, self.fake_hosts, {}, 0,
+            vectorized=True, reorder=False)
+
+    def test_get_filtered_hosts_adaptive_order(self):
+        self.flags(scheduler_adaptive_filter_order=True)
+        self.host_manager = host_manager.HostManager()
+        self._mock_get_filtered_hosts({'got_objs': [], 'got_fprops': []})
+        with mock.patch.object(self.host_manager.filter_handler,
+                               'order_filters',
+                               side_effect=lambda f: f) as mock_order:
+            result = self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                          {})
+        mock_order.assert_called_once_with(self.host_manager.default_filters)
+        self.assertEqual(set(self.fake_hosts), set(result))
+        stats = self.host_manager.get_filter_stats()
+        self.assertEqual(len(self.fake_hosts),
+                         stats['FakeFilterClass1']['objects_out'])
+
+    def _stub_filter_with_limits(self):
+        def fake_filter_one(_self, obj, filter_props):
+            obj.limits['node'] = obj.nodename
+            return obj.host != 'fake_host2'
+
+        self.stubs.Set(FakeFilterClass1, '_filter_one', fake_filter_one)
+        self.stubs.Set(FakeFilterClass1, 'process_safe', True)
+        return [host for host in self.fake_hosts
+                if host.host != 'fake_host2']
+
+    def test_get_filtered_hosts_sharded(self):
+        self.flags(scheduler_filter_shards=3,
+                   scheduler_filter_shard_min_hosts=2)
+        expected = self._stub_filter_with_limits()
+
+        with mock.patch.object(host_manager.tpool, 'execute',
+                               side_effect=lambda f: f()) as mock_execute:
+            result = self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                          {})
+
+        self.assertEqual(expected, result)
+        # The results of the 2 workers are waited for off the hub
+        self.assertEqual(4, mock_execute.call_count)
+        for host in result:
+            self.assertEqual({'node': host.nodename}, host.limits)
+        stats = self.host_manager.get_filter_stats()['FakeFilterClass1']
+        self.assertEqual(1, stats['runs'])
+        self.assertEqual(len(self.fake_hosts), stats['objects_in'])
+        self.assertEqual(len(expected), stats['objects_out'])
+
+    @mock.patch.object(host_manager.multiprocessing, 'Process')
+    def test_get_filtered_hosts_sharded_min_hosts(self, mock_process):
+        self.flags(scheduler_filter_shards=3,
+                   scheduler_filter_shard_min_hosts=5)
+        expected = self._stub_filter_with_limits()
+
+        result = self.host_manager.get_filtered_hosts(self.fake_hosts, {})
+
+        self.assertEqual(expected, result)
+        self.assertFalse(mock_process.called)
+
+    @mock.patch.object(host_manager.multiprocessing, 'Process')
+    def test_get_filtered_hosts_sharded_unsafe_filter(self, mock_process):
+        self.flags(scheduler_filter_shards=3,
+                   scheduler_filter_shard_min_hosts=2)
+        expected = self._stub_filter_with_limits()
+        self.stubs.Set(FakeFilterClass1, 'process_safe', False)
+
+        result = self.host_manager.get_filtered_hosts(self.fake_hosts, {})
+
+        self.assertEqual(expected, result)
+        self.assertFalse(mock_process.called)
+
+    @mock.patch.object(host_manager.LOG, 'warning')
+    def test_get_filtered_hosts_sharded_worker_failed(self, mock_warning):
+        self.flags(scheduler_filter_shards=2,
+                   scheduler_filter_shard_min_hosts=1)
+        expected = self._stub_filter_with_limits()
+
+        def fake_run_filter_worker(_self, writer, *args):
+            writer.close()
+
+        self.stubs.Set(host_manager.HostManager, '_run_filter_worker',
+                       fake_run_filter_worker)
+        result = self.host_manager.get_filtered_hosts(self.fake_hosts, {})
+
+        self.assertEqual(expected, result)
+        self.assertEqual(1, mock_warning.call_count)
+
+    def test_get_filtered_hosts_sharded_stop_filtering(self):
+        self.flags(scheduler_filter_shards=2,
+                   scheduler_filter_shard_min_hosts=1)
+
+        def fake_filter_all(_self, filter_obj_list, filter_properties):
+            return None
+
+        self.stubs.Set(FakeFilterClass1, 'filter_all', fake_filter_all)
+        self.stubs.Set(FakeFilterClass1, 'process_safe', True)
+        self.assertIsNone(self.host_manager.get_filtered_hosts(
+            self.fake_hosts, {}))
+
+    def test_get_weighed_hosts_vectorized(self):
+        self.flags(scheduler_vectorized_weighers=True)
+        self.host_manager = host_manager.HostManager()
+        with mock.patch.object(self.host_manager.weight_handler,
+                               'get_weighed_objects') as mock_get_weighed:
+            self.host_manager.get_weighed_hosts(self.fake_hosts, {}, limit=2)
+        mock_get_weighed.assert_called_once_with(
+            self.host_manager.weighers, self.fake_hosts, {}, limit=2,
+            vectorized=True)
+
+    @mock.patch.object(host_manager.LOG, 'warning')
+    @mock.patch.object(host_manager.base_filters, 'numpy', None)
+    def test_vectorized_filters_without_numpy(self, mock_warning):
+        self.flags(scheduler_vectorized_filters=True,
+                   scheduler_vectorized_weighers=True)
+        hm = host_manager.HostManager()
+        self.assertFalse(hm.vectorized_filters)
+        self.assertFalse(hm.vectorized_weighers)
+        self.assertEqual(2, mock_warning.call_count)
+
     @mock.patch.object(FakeFilterClass2, '_filter_one', return_value=True)
     def test_get_filtered_hosts_with_specified_filters(self, mock_filter_one):
         fake_properties = {'moo': 1, 'cow': 2}
@@ -318,6 +452,10 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
 
     def setUp(self):
         super(HostManagerChangedNodesTestCase, self).setUp()
+        patcher = mock.patch.object(objects.AggregateList, 'get_all',
+                                    return_value=[])
+        self.mock_get_aggregates = patcher.start()
+        self.addCleanup(patcher.stop)
         self.host_manager = host_manager.HostManager()
         self.fake_hosts = [
               host_manager.HostState('host1', 'node1'),
@@ -340,6 +478,112 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         host_states_map = self.host_manager.host_state_map
         self.assertEqual(len(host_states_map), 4)
 
+    def test_get_all_host_states_indexes_aggregates(self):
+        context = 'fake_context'
+        aggregate = objects.Aggregate(id=1, name='agg1',
+                                      hosts=['host1', 'host2'],
+                                      metadata={'availability_zone': 'az1'})
+        self.mock_get_aggregates.return_value = [aggregate]
+
+        self.mox.StubOutWithMock(objects.ServiceList, 'get_by_topic')
+        self.mox.StubOutWithMock(objects.ComputeNodeList, 'get_all')
+        objects.ServiceList.get_by_topic(
+            context, CONF.compute_topic).AndReturn(fakes.SERVICES)
+        objects.ComputeNodeList.get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        self.mock_get_aggregates.assert_called_once_with(context)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual([aggregate],
+                         host_states_map[('host1', 'node1')].aggregates)
+        self.assertEqual([aggregate],
+                         host_states_map[('host2', 'node2')].aggregates)
+        self.assertEqual([], host_states_map[('host3', 'node3')].aggregates)
+
+    def test_get_all_host_states_aggregates_not_indexed(self):
+        self.flags(scheduler_index_aggregates=False)
+        context = 'fake_context'
+
+        self.mox.StubOutWithMock(objects.ServiceList, 'get_by_topic')
+        self.mox.StubOutWithMock(objects.ComputeNodeList, 'get_all')
+        objects.ServiceList.get_by_topic(
+            context, CONF.compute_topic).AndReturn(fakes.SERVICES)
+        objects.ComputeNodeList.get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        self.assertFalse(self.mock_get_aggregates.called)
+        host_states_map = self.host_manager.host_state_map
+        self.assertIsNone(host_states_map[('host1', 'node1')].aggregates)
+
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    def test_get_all_host_states_tracks_instances(self, mock_get_instances):
+        self.flags(scheduler_tracks_instance_changes=True)
+        context = 'fake_context'
+        mock_get_instances.return_value = [
+            objects.Instance(uuid='uuid1', host='host1'),
+            objects.Instance(uuid='uuid2', host='host1'),
+            objects.Instance(uuid='uuid3', host=None)]
+
+        self.mox.StubOutWithMock(objects.ServiceList, 'get_by_topic')
+        self.mox.StubOutWithMock(objects.ComputeNodeList, 'get_all')
+        objects.ServiceList.get_by_topic(
+            context, CONF.compute_topic).AndReturn(fakes.SERVICES)
+        objects.ComputeNodeList.get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        mock_get_instances.assert_called_once_with(
+            context, {'deleted': False}, expected_attrs=[])
+        host1 = self.host_manager.host_state_map[('host1', 'node1')]
+        host2 = self.host_manager.host_state_map[('host2', 'node2')]
+        self.assertEqual(set(['uuid1', 'uuid2']), host1.instances)
+        self.assertEqual(set(), host2.instances)
+
+        # The updates sent by the compute nodes are seen by the host states
+        self.host_manager.update_instance_info(context, 'host2', ['uuid1'])
+        self.assertEqual(set(['uuid2']), host1.instances)
+        self.assertEqual(set(['uuid1']), host2.instances)
+        self.host_manager.delete_instance_info(context, 'host1', 'uuid2')
+        self.assertEqual(set(), host1.instances)
+        self.assertEqual({'uuid1': 'host2'},
+                         self.host_manager.instance_host_map)
+
+    @mock.patch('nova.virt.hardware.get_host_numa_usage_from_instance')
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    def test_consume_from_instance_tracks_instance(self, mock_get_instances,
+                                                   mock_numa_usage):
+        self.flags(scheduler_tracks_instance_changes=True)
+        context = 'fake_context'
+        mock_get_instances.return_value = []
+        instance = dict(root_gb=0, ephemeral_gb=0, memory_mb=0, vcpus=0,
+                        project_id='12345', vm_state=vm_states.BUILDING,
+                        task_state=task_states.SCHEDULING, os_type='Linux',
+                        uuid='fake-uuid', numa_topology=None)
+
+        self.mox.StubOutWithMock(objects.ServiceList, 'get_by_topic')
+        self.mox.StubOutWithMock(objects.ComputeNodeList, 'get_all')
+        objects.ServiceList.get_by_topic(
+            context, CONF.compute_topic).AndReturn(fakes.SERVICES)
+        objects.ComputeNodeList.get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        host1 = self.host_manager.host_state_map[('host1', 'node1')]
+        host2 = self.host_manager.host_state_map[('host2', 'node2')]
+        self.host_manager.consume_from_instance(context, host1, instance)
+        self.assertEqual(set(['fake-uuid']), host1.instances)
+        self.assertEqual({'fake-uuid': 'host1'},
+                         self.host_manager.instance_host_map)
+
+        # The instance is rescheduled to another host
+        self.host_manager.consume_from_instance(context, host2, instance)
+        self.assertEqual(set(), host1.instances)
+        self.assertEqual(set(['fake-uuid']), host2.instances)
+        self.assertEqual({'fake-uuid': 'host2'},
+                         self.host_manager.instance_host_map)
+
     def test_get_all_host_states_after_delete_one(self):
         context = 'fake_context'
 
@@ -383,6 +627,304 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(len(host_states_map), 0)
 
 
+class HostManagerIncrementalRefreshTestCase(test.NoDBTestCase):
+    """Test case for HostManager with incremental host refresh enabled."""
+
+    def setUp(self):
+        super(HostManagerIncrementalRefreshTestCase, self).setUp()
+        patcher = mock.patch.object(objects.AggregateList, 'get_all',
+                                    return_value=[])
+        self.mock_get_aggregates = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.flags(scheduler_incremental_host_refresh=True)
+        self.host_manager = host_manager.HostManager()
+        self.created_at = datetime.datetime(2015, 1, 1,
+                                            tzinfo=iso8601.iso8601.Utc())
+        self.compute_nodes = [self._compute_node(i) for i in xrange(1, 5)]
+
+    def _compute_node(self, i, **updates):
+        values = dict(
+            id=i, local_gb=1024, memory_mb=1024, vcpus=1,
+            disk_available_least=None, free_ram_mb=512, vcpus_used=1,
+            free_disk_gb=512, local_gb_used=0, host='host%s' % i,
+            hypervisor_hostname='node%s' % i, host_ip='127.0.0.1',
+            hypervisor_version=0, numa_topology=None,
+            hypervisor_type='foo', supported_hv_specs=[],
+            pci_device_pools=None, cpu_info=None, stats=None, metrics=None,
+            created_at=self.created_at, updated_at=self.created_at,
+            deleted_at=None, deleted=False)
+        values.update(updates)
+        return objects.ComputeNode(**values)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_applies_changes(self, mock_services,
+                                                 mock_get_all,
+                                                 mock_get_changed):
+        mock_services.return_value = fakes.SERVICES
+        mock_get_all.return_value = self.compute_nodes
+        later = self.created_at + datetime.timedelta(minutes=1)
+        mock_get_changed.return_value = [
+            self._compute_node(2, free_ram_mb=256, updated_at=later),
+            self._compute_node(4, deleted=True, deleted_at=later)]
+
+        self.host_manager.get_all_host_states('fake_context')
+        self.assertEqual(self.created_at,
+                         self.host_manager.compute_nodes_synced_at)
+        host_states = list(
+            self.host_manager.get_all_host_states('fake_context'))
+
+        self.assertEqual(1, mock_get_all.call_count)
+        mock_get_changed.assert_called_once_with(
+            'fake_context', self.created_at - datetime.timedelta(seconds=10))
+        self.assertEqual(later, self.host_manager.compute_nodes_synced_at)
+        self.assertEqual(3, len(host_states))
+        host_states_map = self.host_manager.host_state_map
+        self.assertNotIn(('host4', 'node4'), host_states_map)
+        self.assertEqual(256, host_states_map[('host2', 'node2')].free_ram_mb)
+        self.assertEqual(512, host_states_map[('host1', 'node1')].free_ram_mb)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_late_change(self, mock_services,
+                                             mock_get_all, mock_get_changed):
+        # A change committed late, or by a node with a clock behind, is
+        # stored with a timestamp older than the changes already seen.
+        self.flags(scheduler_host_refresh_margin=30)
+        mock_services.return_value = fakes.SERVICES
+        mock_get_all.return_value = self.compute_nodes
+        later = self.created_at + datetime.timedelta(minutes=1)
+        late = later - datetime.timedelta(seconds=20)
+        mock_get_changed.side_effect = [
+            [self._compute_node(2, free_ram_mb=256, updated_at=later)],
+            [self._compute_node(2, free_ram_mb=256, updated_at=later),
+             self._compute_node(3, free_ram_mb=128, updated_at=late)]]
+
+        self.host_manager.get_all_host_states('fake_context')
+        self.host_manager.get_all_host_states('fake_context')
+        self.host_manager.get_all_host_states('fake_context')
+
+        margin = datetime.timedelta(seconds=30)
+        self.assertEqual(
+            [mock.call('fake_context', self.created_at - margin),
+             mock.call('fake_context', later - margin)],
+            mock_get_changed.call_args_list)
+        # The watermark never goes back.
+        self.assertEqual(later, self.host_manager.compute_nodes_synced_at)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(128, host_states_map[('host3', 'node3')].free_ram_mb)
+
+    @mock.patch.object(host_manager.HostState, 'update_from_compute_node')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_only_updates_changed(self, mock_services,
+                                                      mock_get_all,
+                                                      mock_get_changed,
+                                                      mock_update):
+        mock_services.return_value = fakes.SERVICES
+        mock_get_all.return_value = self.compute_nodes
+        changed = self._compute_node(
+            3, updated_at=self.created_at + datetime.timedelta(minutes=1))
+        mock_get_changed.return_value = [changed]
+
+        self.host_manager.get_all_host_states('fake_context')
+        mock_update.reset_mock()
+        self.host_manager.get_all_host_states('fake_context')
+
+        mock_update.assert_called_once_with(changed)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_consumption_kept(self, mock_services,
+                                                  mock_get_all,
+                                                  mock_get_changed):
+        mock_services.return_value = fakes.SERVICES
+        mock_get_all.return_value = self.compute_nodes
+        mock_get_changed.return_value = []
+
+        self.host_manager.get_all_host_states('fake_context')
+        host_state = self.host_manager.host_state_map[('host1', 'node1')]
+        host_state.free_ram_mb -= 128
+        self.host_manager.get_all_host_states('fake_context')
+
+        self.assertEqual(384, host_state.free_ram_mb)
+        self.assertEqual(self.created_at,
+                         self.host_manager.compute_nodes_synced_at)
+
+    @mock.patch.object(timeutils, 'is_older_than', return_value=True)
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_full_refresh(self, mock_services,
+                                              mock_get_all, mock_get_changed,
+                                              mock_older):
+        mock_services.return_value = fakes.SERVICES
+        mock_get_all.return_value = self.compute_nodes
+
+        self.host_manager.get_all_host_states('fake_context')
+        self.host_manager.get_all_host_states('fake_context')
+
+        self.assertEqual(2, mock_get_all.call_count)
+        self.assertFalse(mock_get_changed.called)
+
+    @mock.patch.object(objects.ComputeNodeList, 'get_all_changed_since')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    def test_get_all_host_states_disabled(self, mock_services, mock_get_all,
+                                          mock_get_changed):
+        self.flags(scheduler_incremental_host_refresh=False)
+        mock_services.return_value = fakes.SERVICES
+        mock_get_all.return_value = self.compute_nodes
+
+        self.host_manager.get_all_host_states('fake_context')
+        self.host_manager.get_all_host_states('fake_context')
+
+        self.assertEqual(2, mock_get_all.call_count)
+        self.assertFalse(mock_get_changed.called)
+
+
+class HostManagerFilterCacheTestCase(test.NoDBTestCase):
+    """Test case for the filter results cache of the HostManager."""
+
+    def setUp(self):
+        super(HostManagerFilterCacheTestCase, self).setUp()
+        self.flags(scheduler_available_filters=['%s.%s' % (__name__, cls) for
+                                                cls in ['FakeFilterClass1',
+                                                        'FakeFilterClass2']])
+        self.flags(scheduler_default_filters=['FakeFilterClass1',
+                                              'FakeFilterClass2'],
+                   scheduler_filter_cache_ttl=10)
+        self.host_manager = host_manager.HostManager()
+        self.fake_hosts = [host_manager.HostState('fake_host%s' % x,
+                'fake-node') for x in xrange(1, 5)]
+        self.filtered = []
+
+        def fake_filter_one(_self, obj, filter_props):
+            self.filtered.append(obj)
+            obj.limits['memory_mb'] = 1024
+            return obj.host != 'fake_host1'
+
+        self.stubs.Set(FakeFilterClass1, '_filter_one', fake_filter_one)
+        self.stubs.Set(FakeFilterClass2, '_filter_one',
+                       lambda _self, obj, filter_props: True)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+    def _get_request(self, memory_mb=512, uuid='fake-uuid'):
+        return {'context': 'fake-context',
+                'instance_type': {'memory_mb': memory_mb},
+                'request_spec': {'instance_uuids': [uuid],
+                                 'instance_properties': {
+                                     'uuid': uuid,
+                                     'project_id': 'fake-project'}}}
+
+    def test_identical_requests(self):
+        result = self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                      self._get_request())
+        self.assertEqual(self.fake_hosts[1:], result)
+        self.assertEqual(self.fake_hosts, self.filtered)
+
+        self.filtered = []
+        for host in self.fake_hosts:
+            host.limits = {}
+        result = self.host_manager.get_filtered_hosts(
+            self.fake_hosts, self._get_request(uuid='other-uuid'))
+        self.assertEqual(self.fake_hosts[1:], result)
+        self.assertEqual([], self.filtered)
+        for host in result:
+            self.assertEqual({'memory_mb': 1024}, host.limits)
+
+    def test_changed_hosts_filtered_again(self):
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                             self._get_request())
+        self.filtered = []
+        self.fake_hosts[2].state_generation += 1
+
+        result = self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                      self._get_request())
+        self.assertEqual(self.fake_hosts[1:], result)
+        self.assertEqual([self.fake_hosts[2]], self.filtered)
+
+    def test_different_requests(self):
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                             self._get_request())
+        self.filtered = []
+        self.host_manager.get_filtered_hosts(
+            self.fake_hosts, self._get_request(memory_mb=1024))
+        self.assertEqual(self.fake_hosts, self.filtered)
+        self.filtered = []
+        self.host_manager.get_filtered_hosts(
+            self.fake_hosts, self._get_request(), index=1)
+        self.assertEqual(self.fake_hosts, self.filtered)
+
+    def test_uncached_filters_always_run(self):
+        self.stubs.Set(FakeFilterClass2, 'cache_results', False)
+        filtered = []
+
+        def fake_filter_one(_self, obj, filter_props):
+            filtered.append(obj)
+            return obj.host != 'fake_host2'
+
+        self.stubs.Set(FakeFilterClass2, '_filter_one', fake_filter_one)
+        for i in xrange(2):
+            result = self.host_manager.get_filtered_hosts(
+                self.fake_hosts, self._get_request())
+            self.assertEqual(self.fake_hosts[2:], result)
+        self.assertEqual(self.fake_hosts[1:] * 2, filtered)
+        self.assertEqual(self.fake_hosts, self.filtered)
+
+    def test_expired_results(self):
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                             self._get_request())
+        self.filtered = []
+        timeutils.advance_time_seconds(11)
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                             self._get_request())
+        self.assertEqual(self.fake_hosts, self.filtered)
+
+    def test_cache_size(self):
+        self.flags(scheduler_filter_cache_size=2)
+        self.host_manager = host_manager.HostManager()
+        for memory_mb in (1, 2, 1, 3):
+            self.host_manager.get_filtered_hosts(
+                self.fake_hosts, self._get_request(memory_mb=memory_mb))
+        self.assertEqual(2, len(self.host_manager.filter_cache))
+        self.filtered = []
+        self.host_manager.get_filtered_hosts(
+            self.fake_hosts, self._get_request(memory_mb=1))
+        self.assertEqual([], self.filtered)
+        self.host_manager.get_filtered_hosts(
+            self.fake_hosts, self._get_request(memory_mb=2))
+        self.assertEqual(self.fake_hosts, self.filtered)
+
+    def test_unserializable_request(self):
+        request = self._get_request()
+        request['scheduler_hints'] = {'query': object()}
+        with mock.patch.object(jsonutils, 'to_primitive',
+                               side_effect=TypeError):
+            self.host_manager.get_filtered_hosts(self.fake_hosts, request)
+        self.assertEqual(self.fake_hosts, self.filtered)
+        self.assertEqual(0, len(self.host_manager.filter_cache))
+
+    def test_aggregates_change_clears_cache(self):
+        aggregate = objects.Aggregate(id=1, name='agg1', hosts=['host1'],
+                                      metadata={})
+        with mock.patch.object(objects.AggregateList, 'get_all',
+                               return_value=[aggregate]):
+            self.host_manager._update_aggregates('fake-context')
+            self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                 self._get_request())
+            self.host_manager._update_aggregates('fake-context')
+            self.assertEqual(1, len(self.host_manager.filter_cache))
+            aggregate.metadata = {'availability_zone': 'az1'}
+            self.host_manager._update_aggregates('fake-context')
+        self.assertEqual(0, len(self.host_manager.filter_cache))
+
+
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
 
@@ -522,6 +1064,135 @@ class HostStateTestCase(test.NoDBTestCase):
         self.assertEqual(((host, instance),), numa_usage_mock.call_args)
         self.assertEqual('fake-consumed-twice', host.numa_topology)
 
+    def test_numa_capacity(self):
+        host = host_manager.HostState("fakehost", "fakenode")
+        self.assertIsNone(host.numa_capacity)
+
+        host.numa_topology = fakes.NUMA_TOPOLOGY._to_json()
+        capacity = host.numa_capacity
+        self.assertEqual([2, 2], [cell.free_cpus for cell in capacity])
+        self.assertEqual([512, 512], [cell.free_memory for cell in capacity])
+
+        # Refreshing the host with an unchanged topology keeps the capacity
+        with mock.patch.object(hardware,
+                               'numa_capacity_from_host_topology') as mock_c:
+            host.update_from_compute_node(fakes.COMPUTE_NODES[2].obj_clone())
+            self.assertIs(capacity, host.numa_capacity)
+            self.assertFalse(mock_c.called)
+
+        instance = dict(root_gb=0, ephemeral_gb=0, memory_mb=512, vcpus=1,
+                        project_id='12345', vm_state=vm_states.BUILDING,
+                        task_state=task_states.SCHEDULING, os_type='Linux',
+                        uuid='fake-uuid', numa_topology=(
+                            objects.InstanceNUMATopology(cells=[
+                                objects.InstanceNUMACell(
+                                    id=1, cpuset=set([0]), memory=512)])))
+        host.consume_from_instance(instance)
+        self.assertEqual([512, 0],
+                         [cell.free_memory for cell in host.numa_capacity])
+
+    def test_state_generation(self):
+        compute = fakes.COMPUTE_NODES[0]
+        host = host_manager.HostState("fakehost", "fakenode", compute=compute)
+        generation = host.state_generation
+
+        host.update_from_compute_node(compute.obj_clone())
+        self.assertEqual(generation, host.state_generation)
+        host.update_service({'disabled': False})
+        self.assertNotEqual(generation, host.state_generation)
+        generation = host.state_generation
+        host.update_service({'disabled': False})
+        self.assertEqual(generation, host.state_generation)
+
+        instance = dict(root_gb=0, ephemeral_gb=0, memory_mb=0, vcpus=0,
+                        project_id='12345', vm_state=vm_states.BUILDING,
+                        task_state=task_states.SCHEDULING, os_type='Linux',
+                        uuid='fake-uuid', numa_topology=None)
+        host.consume_from_instance(instance)
+        self.assertNotEqual(generation, host.state_generation)
+        generation = host.state_generation
+
+        # The local consumption is replaced by the compute node record.
+        host.updated = None
+        host.update_from_compute_node(compute.obj_clone())
+        self.assertNotEqual(generation, host.state_generation)
+
+    def test_state_generation_ignores_heartbeat(self):
+        host = host_manager.HostState("fakehost", "fakenode")
+        now = timeutils.utcnow()
+        host.update_service({'disabled': False, 'updated_at': now,
+                             'report_count': 1})
+        generation = host.state_generation
+
+        host.update_service({'disabled': False,
+                             'updated_at': now + datetime.timedelta(10),
+                             'report_count': 2})
+        self.assertEqual(generation, host.state_generation)
+        self.assertEqual(2, host.service['report_count'])
+
+    def test_state_generation_not_reused(self):
+        compute = fakes.COMPUTE_NODES[0]
+        host = host_manager.HostState("fakehost", "fakenode", compute=compute)
+        host.update_service({'disabled': False})
+
+        # A host state rebuilt for the same node after it went away
+        rebuilt = host_manager.HostState("fakehost", "fakenode",
+                                         compute=compute)
+        rebuilt.update_service({'disabled': False})
+
+        self.assertNotEqual(host.state_generation, rebuilt.state_generation)
+
+    @mock.patch.object(objects.ComputeNode, 'claim_resources')
+    def test_claim_from_instance(self, mock_claim):
+        host = host_manager.HostState("fakehost", "fakenode")
+        host.compute_id = 1
+        host.generation = 6
+        mock_claim.return_value = objects.ComputeNode(id=1, generation=7)
+        instance = dict(root_gb=5, ephemeral_gb=1, memory_mb=512, vcpus=1)
+
+        self.assertTrue(host.claim_from_instance('fake-context', instance))
+
+        mock_claim.assert_called_once_with('fake-context', 1, 6,
+                                           memory_mb=512, vcpus=1,
+                                           local_gb=6)
+        self.assertEqual(7, host.generation)
+
+    @mock.patch.object(objects.ComputeNode, 'get_by_id')
+    @mock.patch.object(objects.ComputeNode, 'claim_resources')
+    def test_claim_from_instance_conflict(self, mock_claim, mock_get):
+        host = host_manager.HostState("fakehost", "fakenode")
+        host.compute_id = 1
+        host.generation = 6
+        host.free_ram_mb = 4096
+        host.updated = timeutils.utcnow()
+        mock_claim.side_effect = exception.ComputeNodeGenerationConflict(
+            compute_id=1, generation=6)
+        compute = objects.ComputeNode(
+            id=1, generation=8, memory_mb=4096, free_ram_mb=512,
+            free_disk_gb=10, local_gb=10, local_gb_used=0,
+            disk_available_least=None, vcpus=4, vcpus_used=4,
+            updated_at=None, numa_topology=None, pci_device_pools=None,
+            host_ip='127.0.0.1', hypervisor_type='htype',
+            hypervisor_version=1, hypervisor_hostname='fakenode',
+            cpu_info='cpu_info', supported_hv_specs=[], stats=None,
+            metrics=None)
+        mock_get.return_value = compute
+        instance = dict(root_gb=5, ephemeral_gb=1, memory_mb=512, vcpus=1)
+
+        self.assertFalse(host.claim_from_instance('fake-context', instance))
+
+        mock_get.assert_called_once_with('fake-context', 1)
+        self.assertEqual(8, host.generation)
+        self.assertEqual(512, host.free_ram_mb)
+
+    @mock.patch.object(objects.ComputeNode, 'claim_resources')
+    def test_claim_from_instance_without_generation(self, mock_claim):
+        host = host_manager.HostState("fakehost", "fakenode")
+        instance = dict(root_gb=5, ephemeral_gb=1, memory_mb=512, vcpus=1)
+
+        self.assertTrue(host.claim_from_instance('fake-context', instance))
+        self.assertFalse(mock_claim.called)
+
     def test_resources_consumption_from_compute_node(self):
         metrics = [
             dict(name='res1',
@@ -48,6 +48,10 @@ class IronicHostManagerTestCase(test.NoDBTestCase):
 
     def setUp(self):
         super(IronicHostManagerTestCase, self).setUp()
+        patcher = mock.patch.object(objects.AggregateList, 'get_all',
+                                    return_value=[])
+        self.mock_get_aggregates = patcher.start()
+        self.addCleanup(patcher.stop)
         self.host_manager = ironic_host_manager.IronicHostManager()
 
     def test_manager_public_api_signatures(self):
@@ -99,6 +103,10 @@ class IronicHostManagerChangedNodesTestCase(test.NoDBTestCase):
 
     def setUp(self):
         super(IronicHostManagerChangedNodesTestCase, self).setUp()
+        patcher = mock.patch.object(objects.AggregateList, 'get_all',
+                                    return_value=[])
+        self.mock_get_aggregates = patcher.start()
+        self.addCleanup(patcher.stop)
         self.host_manager = ironic_host_manager.IronicHostManager()
         ironic_driver = "nova.virt.ironic.driver.IronicDriver"
         supported_instances = [
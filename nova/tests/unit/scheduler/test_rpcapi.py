@@ -68,3 +68,17 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 request_spec='fake_request_spec',
                 filter_properties='fake_prop',
                 version='4.0')
+
+    def test_update_instance_info(self):
+        self._test_scheduler_api('update_instance_info', rpc_method='cast',
+                host_name='fake_host',
+                instance_uuids=['fake_uuid'],
+                fanout=True,
+                version='4.1')
+
+    def test_delete_instance_info(self):
+        self._test_scheduler_api('delete_instance_info', rpc_method='cast',
+                host_name='fake_host',
+                instance_uuid='fake_uuid',
+                fanout=True,
+                version='4.1')
@@ -56,6 +56,22 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
             self.manager.select_destinations(None, None, {})
             select_destinations.assert_called_once_with(None, None, {})
 
+    def test_update_instance_info(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'update_instance_info') as update:
+            self.manager.update_instance_info(self.context, 'fake_host',
+                                              ['fake_uuid'])
+            update.assert_called_once_with(self.context, 'fake_host',
+                                           ['fake_uuid'])
+
+    def test_delete_instance_info(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'delete_instance_info') as delete:
+            self.manager.delete_instance_info(self.context, 'fake_host',
+                                              'fake_uuid')
+            delete.assert_called_once_with(self.context, 'fake_host',
+                                           'fake_uuid')
+
 
 class SchedulerV3PassthroughTestCase(test.TestCase):
     def setUp(self):
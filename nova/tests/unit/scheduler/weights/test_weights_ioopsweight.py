@@ -13,6 +13,9 @@
 Tests For Scheduler IoOpsWeigher weights
 """
 
+import testtools
+
+from nova import filters
 from nova.scheduler import weights
 from nova.scheduler.weights import io_ops
 from nova import test
@@ -66,3 +69,13 @@ class IoOpsWeigherTestCase(test.NoDBTestCase):
         self._do_test(io_ops_weight_multiplier=2.0,
                       expected_weight=2.0,
                       expected_host='host4')
+
+
+@testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+class IoOpsWeigherVectorizedTestCase(IoOpsWeigherTestCase):
+    def _get_weighed_host(self, hosts, io_ops_weight_multiplier):
+        if io_ops_weight_multiplier is not None:
+            self.flags(io_ops_weight_multiplier=io_ops_weight_multiplier)
+        return self.weight_handler.get_weighed_objects(self.weighers,
+                                                       hosts, {},
+                                                       vectorized=True)[0]
@@ -13,7 +13,10 @@
 Tests For Scheduler metrics weights.
 """
 
+import testtools
+
 from nova import exception
+from nova import filters
 from nova.scheduler import host_manager
 from nova.scheduler import weights
 from nova.scheduler.weights import metrics
@@ -154,3 +157,14 @@ class MetricsWeigherTestCase(test.NoDBTestCase):
         self.flags(required=False, group='metrics')
         setting = ['foo=0.0001', 'zot=-1']
         self._do_test(setting, 1.0, 'host5')
+
+
+@testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+class MetricsWeigherVectorizedTestCase(MetricsWeigherTestCase):
+    def _get_weighed_host(self, hosts, setting, weight_properties=None):
+        if not weight_properties:
+            weight_properties = {}
+        self.flags(weight_setting=setting, group='metrics')
+        self.weighers[0]._parse_setting()
+        return self.weight_handler.get_weighed_objects(self.weighers,
+                hosts, weight_properties, vectorized=True)[0]
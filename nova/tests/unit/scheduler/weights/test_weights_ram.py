@@ -16,6 +16,9 @@
 Tests For Scheduler RAM weights.
 """
 
+import testtools
+
+from nova import filters
 from nova.scheduler import weights
 from nova.scheduler.weights import ram
 from nova import test
@@ -109,3 +112,12 @@ class RamWeigherTestCase(test.NoDBTestCase):
         weighed_host = weights[-1]
         self.assertEqual(0, weighed_host.weight)
         self.assertEqual('negative', weighed_host.obj.host)
+
+
+@testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+class RamWeigherVectorizedTestCase(RamWeigherTestCase):
+    def _get_weighed_host(self, hosts, weight_properties=None):
+        if weight_properties is None:
+            weight_properties = {}
+        return self.weight_handler.get_weighed_objects(self.weighers,
+                hosts, weight_properties, vectorized=True)[0]
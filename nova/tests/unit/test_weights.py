@@ -16,6 +16,9 @@
 Tests For weights.
 """
 
+import testtools
+
+from nova import filters
 from nova import test
 from nova import weights
 
@@ -51,3 +54,67 @@ class TestWeigher(test.NoDBTestCase):
         for seq, result, minval, maxval in map_:
             ret = weights.normalize(seq, minval=minval, maxval=maxval)
             self.assertEqual(tuple(ret), result)
+
+
+class FakeObj(object):
+    def __init__(self, value):
+        self.value = value
+
+
+class ValueWeigher(weights.BaseWeigher):
+    def _weigh_object(self, obj, weight_properties):
+        return obj.value
+
+
+class VectorizedValueWeigher(ValueWeigher):
+    vectorized = True
+
+    def _weigh_batch(self, columns, weight_properties):
+        return columns['value']
+
+
+class TestWeightHandler(test.NoDBTestCase):
+    def setUp(self):
+        super(TestWeightHandler, self).setUp()
+        self.stubs.Set(weights.BaseWeightHandler, '__init__',
+                       lambda *args, **kwargs: None)
+        self.handler = weights.BaseWeightHandler()
+        self.objs = [FakeObj(value) for value in (3, 1, 4, 1, 5, 9, 2, 6)]
+
+    def _get_weighed_values(self, weighers, **kwargs):
+        weighed_objs = self.handler.get_weighed_objects(weighers, self.objs,
+                                                        {}, **kwargs)
+        return [(weighed.obj, weighed.weight) for weighed in weighed_objs]
+
+    def test_get_weighed_objects_limit(self):
+        all_objs = self._get_weighed_values([ValueWeigher()])
+        self.assertEqual(len(self.objs), len(all_objs))
+        self.assertEqual(all_objs[:3],
+                         self._get_weighed_values([ValueWeigher()], limit=3))
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_get_weighed_objects_vectorized(self):
+        expected = self._get_weighed_values([ValueWeigher(), ValueWeigher()])
+        self.assertEqual(expected, self._get_weighed_values(
+            [VectorizedValueWeigher(), ValueWeigher()], vectorized=True))
+        self.assertEqual(expected[:3], self._get_weighed_values(
+            [VectorizedValueWeigher(), ValueWeigher()], limit=3,
+            vectorized=True))
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_get_weighed_objects_vectorized_ties(self):
+        weighed_objs = self._get_weighed_values([VectorizedValueWeigher()],
+                                                vectorized=True)
+        # Both objects weighing 1 come last, in their original order.
+        self.assertEqual([self.objs[1], self.objs[3]],
+                         [obj for obj, weight in weighed_objs[-2:]])
+
+    @testtools.skipIf(filters.numpy is None, 'NumPy is not available')
+    def test_normalize_array(self):
+        for seq, result, minval, maxval in (
+                ((0.0, 0.0), (0.0, 0.0), None, None),
+                ((20.0, 50.0), (0.0, 1.0), None, None),
+                ((20.0, 50.0), (0.2, 0.5), 0.0, 100.0)):
+            ret = weights.normalize_array(filters.numpy.array(seq),
+                                          minval=minval, maxval=maxval)
+            self.assertEqual(result, tuple(ret))
@@ -12,6 +12,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
+import itertools
 import uuid
 
 import mock
@@ -215,6 +217,17 @@ class CpuSetTestCase(test.NoDBTestCase):
         spec = hw.format_cpu_spec(cpus, allow_ranges=False)
         self.assertEqual("10,11,13,14,15,16,19,20,40,42,48", spec)
 
+    def test_cpuset_to_mask(self):
+        self.assertEqual(0, hw.cpuset_to_mask(set()))
+        self.assertEqual(0b1011, hw.cpuset_to_mask(set([0, 1, 3])))
+        self.assertEqual(1 << 70, hw.cpuset_to_mask([70]))
+
+    def test_mask_to_cpuset(self):
+        self.assertEqual(set(), hw.mask_to_cpuset(0))
+        self.assertEqual(set([0, 1, 3]), hw.mask_to_cpuset(0b1011))
+        cpus = set([2, 5, 63, 64, 127])
+        self.assertEqual(cpus, hw.mask_to_cpuset(hw.cpuset_to_mask(cpus)))
+
 
 class VCPUTopologyTest(test.NoDBTestCase):
 
@@ -796,6 +809,80 @@ class VCPUTopologyTest(test.NoDBTestCase):
             self.assertEqual(topo_test["expect"][1], topology.cores)
             self.assertEqual(topo_test["expect"][2], topology.threads)
 
+    def test_get_divisors(self):
+        self.assertEqual([1], hw._get_divisors(1))
+        self.assertEqual([1, 2, 4, 8, 16], hw._get_divisors(16))
+        self.assertEqual([1, 2, 3, 4, 6, 12], hw._get_divisors(12))
+        self.assertEqual([1, 13], hw._get_divisors(13))
+
+    def test_possible_topologies_same_as_enumeration(self):
+        def _enumerate(vcpus, maxsockets, maxcores, maxthreads):
+            return sorted(
+                [[s, c, t] for s in range(1, min(vcpus, maxsockets) + 1)
+                           for c in range(1, min(vcpus, maxcores) + 1)
+                           for t in range(1, min(vcpus, maxthreads) + 1)
+                 if s * c * t == vcpus],
+                reverse=True, key=lambda x: (x[0] * x[1], x[0], x[2]))
+
+        for vcpus in (1, 6, 12, 17, 64, 240):
+            for limits in ((65536, 65536, 65536), (8, 16, 2), (4, 65536, 1)):
+                maximum = objects.VirtCPUTopology(sockets=limits[0],
+                                                  cores=limits[1],
+                                                  threads=limits[2])
+                expected = _enumerate(vcpus, *limits)
+                if not expected:
+                    self.assertRaises(
+                        exception.ImageVCPULimitsRangeImpossible,
+                        hw._get_possible_cpu_topologies,
+                        vcpus, maximum, True, None)
+                    continue
+                actual = [[t.sockets, t.cores, t.threads]
+                          for t in hw._get_possible_cpu_topologies(
+                              vcpus, maximum, True, None)]
+                self.assertEqual(expected, actual)
+
+    @mock.patch.object(hw, '_cpu_topologies_cache',
+                       new_callable=collections.OrderedDict)
+    def test_desirable_topologies_cached(self, mock_cache):
+        flavor = objects.Flavor(vcpus=8, memory_mb=2048, extra_specs={})
+        image_meta = {"properties": {"hw_cpu_sockets": "2"}}
+        with mock.patch.object(hw, '_get_possible_cpu_topologies',
+                               wraps=hw._get_possible_cpu_topologies
+                               ) as mock_possible:
+            first = hw._get_desirable_cpu_topologies(flavor, image_meta)
+            second = hw._get_desirable_cpu_topologies(flavor, image_meta)
+            hw._get_desirable_cpu_topologies(flavor, image_meta,
+                                             allow_threads=False)
+        self.assertEqual(2, mock_possible.call_count)
+        self.assertEqual(2, len(mock_cache))
+        self.assertEqual(2, first[0].sockets)
+        self.assertEqual([(t.sockets, t.cores, t.threads) for t in first],
+                         [(t.sockets, t.cores, t.threads) for t in second])
+        self.assertIsNot(first[0], second[0])
+
+    @mock.patch.object(hw, 'MAX_CACHED_CPU_TOPOLOGIES', 2)
+    @mock.patch.object(hw, '_cpu_topologies_cache',
+                       new_callable=collections.OrderedDict)
+    def test_desirable_topologies_cache_lru(self, mock_cache):
+        image_meta = {"properties": {}}
+        for vcpus in (1, 2, 1, 3):
+            hw._get_desirable_cpu_topologies(
+                objects.Flavor(vcpus=vcpus, memory_mb=2048, extra_specs={}),
+                image_meta)
+        self.assertEqual([1, 3], [key[0] for key in mock_cache])
+
+    @mock.patch.object(hw, '_cpu_topologies_cache',
+                       new_callable=collections.OrderedDict)
+    def test_desirable_topologies_impossible_not_cached(self, mock_cache):
+        flavor = objects.Flavor(vcpus=7, memory_mb=2048,
+                                extra_specs={"hw:cpu_max_sockets": "2",
+                                             "hw:cpu_max_cores": "2",
+                                             "hw:cpu_max_threads": "1"})
+        self.assertRaises(exception.ImageVCPULimitsRangeImpossible,
+                          hw._get_desirable_cpu_topologies,
+                          flavor, {"properties": {}})
+        self.assertEqual(0, len(mock_cache))
+
 
 class NUMATopologyTest(test.NoDBTestCase):
 
@@ -1474,6 +1561,199 @@ class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
                                                         pci_stats=pci_stats)
             self.assertIsNone(fitted_instance1)
 
+    def _get_big_host(self, usages):
+        return objects.NUMATopology(
+                cells=[objects.NUMACell(id=i, cpuset=set([2 * i, 2 * i + 1]),
+                                        memory=2048, cpu_usage=usage,
+                                        memory_usage=usage * 512,
+                                        mempages=[], siblings=[],
+                                        pinned_cpus=set([]))
+                       for i, usage in enumerate(usages)])
+
+    def _get_instance(self, memories):
+        return objects.InstanceNUMATopology(
+                cells=[objects.InstanceNUMACell(id=i, cpuset=set([i]),
+                                                memory=memory)
+                       for i, memory in enumerate(memories)])
+
+    def _fit_with_permutations(self, host, instance):
+        # The exhaustive search the pruned one replaced.
+        for perm in itertools.permutations(host.cells, len(instance)):
+            cells = []
+            for host_cell, instance_cell in zip(perm, instance.cells):
+                got_cell = hw._numa_fit_instance_cell(host_cell,
+                                                      instance_cell)
+                if got_cell is None:
+                    break
+                cells.append(got_cell.id)
+            if len(cells) == len(perm):
+                return cells
+
+    def test_get_fitting_same_as_permutations(self):
+        usages = [4, 0, 2, 1, 3, 0]
+        host = self._get_big_host(usages)
+        for memories in ([1024], [2048, 512], [1536, 1024, 512],
+                         [512, 2048, 1536, 512], [2048] * 4):
+            expected = self._fit_with_permutations(
+                host, self._get_instance(memories))
+            fitted = hw.numa_fit_instance_to_host(
+                host, self._get_instance(memories))
+            if expected is None:
+                self.assertIsNone(fitted)
+            else:
+                self.assertEqual(expected,
+                                 [cell.id for cell in fitted.cells])
+
+    def test_get_fitting_checks_each_pair_once(self):
+        host = self._get_big_host([0] * 8)
+        # The last instance cell fits nowhere, which has every permutation
+        # of the host cells tried.
+        instance = self._get_instance([512, 512, 512, 4096])
+        with mock.patch.object(hw, '_numa_fit_instance_cell',
+                               wraps=hw._numa_fit_instance_cell) as mock_fit:
+            self.assertIsNone(hw.numa_fit_instance_to_host(host, instance))
+        self.assertEqual(4 * 8, mock_fit.call_count)
+
+    def test_get_fitting_checks_pci_once_per_cells(self):
+        host = self._get_big_host([0] * 4)
+        instance = self._get_instance([512, 512])
+        pci_stats = stats.PciDeviceStats()
+        with mock.patch.object(pci_stats, 'support_requests',
+                               return_value=False) as mock_support:
+            self.assertIsNone(hw.numa_fit_instance_to_host(
+                host, instance, pci_requests=['fake-request'],
+                pci_stats=pci_stats))
+        # 12 permutations of 2 cells out of 4, but only 6 sets of cells.
+        self.assertEqual(6, mock_support.call_count)
+
+    def test_get_fitting_pci_without_stats(self):
+        self.assertIsNone(hw.numa_fit_instance_to_host(
+            self.host, self.instance3, pci_requests=['fake-request']))
+
+    def test_get_fitting_restores_cells_on_failure(self):
+        self.instance2.cells[0].pagesize = hw.MEMPAGES_ANY
+        self.assertIsNone(hw.numa_fit_instance_to_host(self.host,
+                                                       self.instance2))
+        self.assertEqual(hw.MEMPAGES_ANY, self.instance2.cells[0].pagesize)
+
+    def test_get_fitting_pack_policy(self):
+        self.flags(numa_cell_fit_policy='pack')
+        host = self._get_big_host([0, 2, 1])
+        fitted = hw.numa_fit_instance_to_host(host,
+                                              self._get_instance([512, 512]))
+        self.assertEqual([1, 2], [cell.id for cell in fitted.cells])
+
+    def test_get_fitting_spread_policy(self):
+        self.flags(numa_cell_fit_policy='spread')
+        host = self._get_big_host([1, 2, 0])
+        fitted = hw.numa_fit_instance_to_host(host,
+                                              self._get_instance([512, 512]))
+        self.assertEqual([2, 0], [cell.id for cell in fitted.cells])
+
+
+class NUMACapacityTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(NUMACapacityTestCase, self).setUp()
+        self.host = objects.NUMATopology(
+                cells=[
+                    objects.NUMACell(id=0, cpuset=set([0, 1, 2, 3]),
+                                     memory=2048, cpu_usage=2,
+                                     memory_usage=1024, siblings=[],
+                                     pinned_cpus=set([0]),
+                                     mempages=[
+                                         objects.NUMAPagesTopology(
+                                             size_kb=4, total=262144,
+                                             used=0),
+                                         objects.NUMAPagesTopology(
+                                             size_kb=2048, total=512,
+                                             used=256)]),
+                    objects.NUMACell(id=1, cpuset=set([4, 5]), memory=1024,
+                                     cpu_usage=0, memory_usage=0,
+                                     siblings=[], pinned_cpus=set([]),
+                                     mempages=[
+                                         objects.NUMAPagesTopology(
+                                             size_kb=4, total=262144,
+                                             used=0)])])
+        self.capacities = hw.numa_capacity_from_host_topology(self.host)
+
+    def _get_instance(self, *cells):
+        return objects.InstanceNUMATopology(
+                cells=[objects.InstanceNUMACell(id=i, **cell)
+                       for i, cell in enumerate(cells)])
+
+    def test_capacity_from_host_topology(self):
+        self.assertEqual(
+            [hw.NUMACellCapacity(cpus=4, memory=2048, cpu_usage=2,
+                                 memory_usage=1024, free_cpus=3,
+                                 free_memory=1024,
+                                 free_pages=((2048, 524288), (4, 1048576))),
+             hw.NUMACellCapacity(cpus=2, memory=1024, cpu_usage=0,
+                                 memory_usage=0, free_cpus=2,
+                                 free_memory=1024,
+                                 free_pages=((4, 1048576),))],
+            self.capacities)
+
+    def test_may_fit(self):
+        instance = self._get_instance(
+            dict(cpuset=set([0, 1]), memory=1024),
+            dict(cpuset=set([2, 3]), memory=1024))
+        self.assertTrue(hw.numa_capacity_may_fit(self.capacities, instance))
+
+    def test_may_fit_no_host_topology(self):
+        instance = self._get_instance(dict(cpuset=set([0]), memory=512))
+        self.assertFalse(hw.numa_capacity_may_fit(None, instance))
+
+    def test_may_fit_too_many_cells(self):
+        cell = dict(cpuset=set([0]), memory=512)
+        instance = self._get_instance(cell, cell, cell)
+        self.assertFalse(hw.numa_capacity_may_fit(self.capacities, instance))
+
+    def test_may_fit_cells_fit_the_same_host_cell(self):
+        cell = dict(cpuset=set([0, 1, 2]), memory=512)
+        instance = self._get_instance(cell, cell)
+        self.assertFalse(hw.numa_capacity_may_fit(self.capacities, instance))
+
+    def test_may_fit_limits(self):
+        instance = self._get_instance(dict(cpuset=set([0, 1]), memory=1024))
+        self.assertTrue(hw.numa_capacity_may_fit(
+            self.capacities, instance, cpu_ratio=1.0, ram_ratio=1.0))
+        instance = self._get_instance(dict(cpuset=set([0, 1, 2]),
+                                           memory=1024))
+        self.assertFalse(hw.numa_capacity_may_fit(
+            self.capacities, instance, cpu_ratio=1.0, ram_ratio=1.0))
+
+    def test_may_fit_pinning(self):
+        instance = self._get_instance(dict(cpuset=set([0, 1, 2]),
+                                           memory=1024, cpu_pinning={}))
+        self.assertTrue(hw.numa_capacity_may_fit(self.capacities, instance))
+        instance = self._get_instance(dict(cpuset=set([0, 1, 2, 3]),
+                                           memory=1024, cpu_pinning={}))
+        self.assertFalse(hw.numa_capacity_may_fit(self.capacities, instance))
+
+    def test_may_fit_pagesize(self):
+        for pagesize, memory, fits in ((hw.MEMPAGES_LARGE, 512, True),
+                                       (hw.MEMPAGES_LARGE, 1024, False),
+                                       (hw.MEMPAGES_SMALL, 1024, True),
+                                       (hw.MEMPAGES_ANY, 1024, True),
+                                       (2048, 512, True),
+                                       (2048, 1024, False),
+                                       (1048576, 1024, False)):
+            instance = self._get_instance(dict(cpuset=set([0]),
+                                               memory=memory,
+                                               pagesize=pagesize))
+            self.assertEqual(fits, hw.numa_capacity_may_fit(
+                self.capacities, instance), (pagesize, memory))
+
+    def test_may_fit_when_fit_succeeds(self):
+        for cpus, memory in itertools.product((1, 2, 3, 4), (512, 1024)):
+            for num_cells in (1, 2):
+                instance = self._get_instance(
+                    *[dict(cpuset=set(range(cpus)), memory=memory)
+                      for i in range(num_cells)])
+                if hw.numa_fit_instance_to_host(self.host, instance):
+                    self.assertTrue(hw.numa_capacity_may_fit(
+                        self.capacities, instance), (cpus, memory))
+
 
 class NumberOfSerialPortsTest(test.NoDBTestCase):
     def test_flavor(self):
@@ -1689,6 +1969,59 @@ class VirtMemoryPagesTestCase(test.NoDBTestCase):
         self.assertEqual(512, topo[0].total)
         self.assertEqual(256, topo[0].used)
 
+    def _get_pages_host_cell(self):
+        return objects.NUMACell(
+            id=0, cpuset=set([0, 1]), memory=2048,
+            cpu_usage=0, memory_usage=0,
+            mempages=[objects.NUMAPagesTopology(size_kb=4, total=262144,
+                                                used=0),
+                      objects.NUMAPagesTopology(size_kb=2048, total=512,
+                                                used=0)],
+            siblings=[], pinned_cpus=set([]))
+
+    def test_numa_pages_usage(self):
+        hostcell = self._get_pages_host_cell()
+        usage = hw.NUMAPagesUsage.from_cell(hostcell)
+        instcell = objects.InstanceNUMACell(
+            id=0, cpuset=set([0]), memory=512, pagesize=2048)
+
+        usage.add(instcell)
+        usage.add(instcell)
+        self.assertEqual(512, usage.used(2048))
+        usage.remove(instcell)
+        self.assertEqual(256, usage.used(2048))
+        self.assertEqual(0, usage.used(4))
+
+        mempages = usage.to_mempages()
+        self.assertEqual([4, 2048], [pages.size_kb for pages in mempages])
+        self.assertIs(hostcell.mempages[0], mempages[0])
+        self.assertEqual(256, mempages[1].used)
+        self.assertEqual(0, hostcell.mempages[1].used)
+
+    def test_numa_pages_usage_ignores_other_sizes(self):
+        usage = hw.NUMAPagesUsage.from_cell(self._get_pages_host_cell())
+        for pagesize in (None, hw.MEMPAGES_ANY, 1048576):
+            usage.add(objects.InstanceNUMACell(
+                id=0, cpuset=set([0]), memory=1024, pagesize=pagesize))
+        usage.remove(objects.InstanceNUMACell(
+            id=0, cpuset=set([0]), memory=1024, pagesize=2048))
+        self.assertEqual(0, usage.used(4))
+        self.assertEqual(0, usage.used(2048))
+
+    def test_host_usage_from_instances_pages_cumulative(self):
+        host = objects.NUMATopology(cells=[self._get_pages_host_cell()])
+        instances = [
+            objects.InstanceNUMATopology(cells=[objects.InstanceNUMACell(
+                id=0, cpuset=set([0]), memory=512, pagesize=2048)]),
+            objects.InstanceNUMATopology(cells=[objects.InstanceNUMACell(
+                id=0, cpuset=set([1]), memory=256, pagesize=2048)])]
+
+        usage = hw.numa_usage_from_instances(host, instances)
+        self.assertEqual(384, usage.cells[0].mempages[1].used)
+
+        usage = hw.numa_usage_from_instances(usage, instances[:1], free=True)
+        self.assertEqual(128, usage.cells[0].mempages[1].used)
+
     def _test_get_requested_mempages_pagesize(self, spec=None, props=None):
         flavor = objects.Flavor(vcpus=16, memory_mb=2048,
                                 extra_specs=spec or {})
@@ -2143,3 +2476,18 @@ class CPUPinningTestCase(test.NoDBTestCase, _CPUPinningTestCaseBase):
         self.assertRaises(exception.CPUPinningInvalid,
                 hw.numa_usage_from_instances, host_pin,
                 [inst_pin_1, inst_pin_2])
+
+    def test_host_usage_from_instances_free_fail(self):
+        host_pin = objects.NUMATopology(
+                cells=[objects.NUMACell(id=0, cpuset=set([0, 1, 2, 3]),
+                                        memory=4096, cpu_usage=2,
+                                        memory_usage=2048, siblings=[],
+                                        mempages=[], pinned_cpus=set([0]))])
+        inst_pin = objects.InstanceNUMATopology(
+                cells=[objects.InstanceNUMACell(
+                    cpuset=set([0, 1]), memory=2048, id=0,
+                    cpu_pinning={0: 0, 1: 3})])
+
+        self.assertRaises(exception.CPUPinningInvalid,
+                hw.numa_usage_from_instances, host_pin, [inst_pin],
+                free=True)
@@ -30,6 +30,13 @@ virt_cpu_opts = [
     cfg.StrOpt('vcpu_pin_set',
                 help='Defines which pcpus that instance vcpus can use. '
                'For example, "4-12,^8,15"'),
+    cfg.StrOpt('numa_cell_fit_policy',
+               default='first',
+               choices=('first', 'pack', 'spread'),
+               help='Order in which the NUMA cells of a host are tried when '
+                    'fitting the cells of an instance onto them. "first" '
+                    'tries them in order, "pack" tries the busiest cells '
+                    'first and "spread" the least busy cells first.'),
 ]
 
 CONF = cfg.CONF
@@ -37,6 +44,11 @@ CONF.register_opts(virt_cpu_opts)
 
 LOG = logging.getLogger(__name__)
 
+# Number of vCPU counts and constraints whose sorted topologies are cached
+MAX_CACHED_CPU_TOPOLOGIES = 256
+
+_cpu_topologies_cache = collections.OrderedDict()
+
 MEMPAGES_SMALL = -1
 MEMPAGES_LARGE = -2
 MEMPAGES_ANY = -3
@@ -149,6 +161,30 @@ def format_cpu_spec(cpuset, allow_ranges=True):
         return ",".join(str(id) for id in sorted(cpuset))
 
 
+def cpuset_to_mask(cpuset):
+    """Convert a set of CPU ids to an integer bitmask
+
+    :param cpuset: iterable of CPU ids
+
+    :returns: an integer with the bit of each CPU id set
+    """
+    mask = 0
+    for cpu in cpuset:
+        mask |= 1 << cpu
+    return mask
+
+
+def mask_to_cpuset(mask):
+    """Convert an integer bitmask to a set of CPU ids
+
+    :param mask: integer with the bit of each CPU id set
+
+    :returns: a set of CPU ids
+    """
+    bits = bin(mask)[:1:-1]
+    return set(cpu for cpu, bit in enumerate(bits) if bit == '1')
+
+
 def get_number_of_serial_ports(flavor, image_meta):
     """Get the number of serial consoles from the flavor or image
 
@@ -401,6 +437,20 @@ def _get_cpu_topology_constraints(flavor, image_meta):
                                     threads=maxthreads))
 
 
+def _get_divisors(number):
+    """Return the sorted list of the divisors of a positive number."""
+    divisors = []
+    large_divisors = []
+    divisor = 1
+    while divisor * divisor <= number:
+        if number % divisor == 0:
+            divisors.append(divisor)
+            if divisor * divisor != number:
+                large_divisors.append(number // divisor)
+        divisor += 1
+    return divisors + large_divisors[::-1]
+
+
 def _get_possible_cpu_topologies(vcpus, maxtopology,
                                  allow_threads, specified_threads):
     """Get a list of possible topologies for a vCPU count
@@ -439,30 +489,26 @@ def _get_possible_cpu_topologies(vcpus, maxtopology,
               {"vcpus": vcpus, "maxsockets": maxsockets,
                "maxcores": maxcores, "maxthreads": maxthreads})
 
-    def _get_topology_for_vcpus(vcpus, sockets, cores, threads):
-        if threads * cores * sockets == vcpus:
-            return objects.VirtCPUTopology(sockets=sockets,
-                                           cores=cores,
-                                           threads=threads)
-
     # Figure out all possible topologies that match
     # the required vcpus count and satisfy the declared
-    # limits. If the total vCPU count were very high
-    # it might be more efficient to factorize the vcpu
-    # count and then only iterate over its factors, but
-    # that's overkill right now
+    # limits, only iterating over the factors of the
+    # vcpu count
     possible = []
-    for s in range(1, maxsockets + 1):
-        for c in range(1, maxcores + 1):
+    for s in _get_divisors(vcpus):
+        if s > maxsockets:
+            break
+        for c in _get_divisors(vcpus // s):
+            if c > maxcores:
+                break
+            t = vcpus // (s * c)
             if specified_threads:
-                o = _get_topology_for_vcpus(vcpus, s, c, specified_threads)
-                if o is not None:
-                    possible.append(o)
-            else:
-                for t in range(1, maxthreads + 1):
-                    o = _get_topology_for_vcpus(vcpus, s, c, t)
-                    if o is not None:
-                        possible.append(o)
+                if t != specified_threads:
+                    continue
+            elif t > maxthreads:
+                continue
+            possible.append(objects.VirtCPUTopology(sockets=s,
+                                                    cores=c,
+                                                    threads=t))
 
     # We want to
     #  - Minimize threads (ie larger sockets * cores is best)
@@ -567,13 +613,41 @@ def _get_desirable_cpu_topologies(flavor, image_meta, allow_threads=True,
                                             min_requested_threads)
             specified_threads = max(1, min_requested_threads)
 
-    possible = _get_possible_cpu_topologies(flavor.vcpus,
-                                            maximum,
-                                            allow_threads,
-                                            specified_threads)
-    desired = _sort_possible_cpu_topologies(possible, preferred)
+    return _get_sorted_cpu_topologies(flavor.vcpus, maximum, preferred,
+                                      allow_threads, specified_threads)
 
-    return desired
+
+def _get_sorted_cpu_topologies(vcpus, maxtopology, wanttopology,
+                               allow_threads, specified_threads):
+    """Get the possible topologies for a vCPU count, in order of preference
+
+    The sorted topologies are cached for the most recently used arguments,
+    and new nova.objects.VirtCPUTopology instances are returned on every
+    call.
+
+    :returns: sorted list of nova.objects.VirtCPUTopology instances
+    """
+    key = (vcpus,
+           maxtopology.sockets, maxtopology.cores, maxtopology.threads,
+           wanttopology.sockets, wanttopology.cores, wanttopology.threads,
+           bool(allow_threads), specified_threads)
+    desired = _cpu_topologies_cache.pop(key, None)
+    if desired is None:
+        possible = _get_possible_cpu_topologies(vcpus,
+                                                maxtopology,
+                                                allow_threads,
+                                                specified_threads)
+        desired = tuple(
+            (topology.sockets, topology.cores, topology.threads)
+            for topology in _sort_possible_cpu_topologies(possible,
+                                                          wanttopology))
+        if len(_cpu_topologies_cache) >= MAX_CACHED_CPU_TOPOLOGIES:
+            # Evict the least recently used topologies
+            _cpu_topologies_cache.popitem(last=False)
+    _cpu_topologies_cache[key] = desired
+    return [objects.VirtCPUTopology(sockets=sockets, cores=cores,
+                                    threads=threads)
+            for sockets, cores, threads in desired]
 
 
 def get_best_cpu_topology(flavor, image_meta, allow_threads=True,
@@ -1125,6 +1199,50 @@ class VirtNUMALimitTopology(VirtNUMATopology):
     cell_class = VirtNUMATopologyCellLimit
 
 
+def _numa_host_cells_order(host_cells):
+    """Return the indices of the host cells in the order they are tried
+
+    :param host_cells: list of objects.NUMACell of the host
+
+    The order depends on the numa_cell_fit_policy option: host cells are
+    either tried in their natural order, busiest first when packing or
+    least busy first when spreading. Ties keep the natural order.
+    """
+    indices = list(range(len(host_cells)))
+    policy = CONF.numa_cell_fit_policy
+    if policy == 'first':
+        return indices
+
+    def _free_resources(index):
+        host_cell = host_cells[index]
+        return (host_cell.avail_memory,
+                len(host_cell.cpuset) - host_cell.cpu_usage)
+
+    return sorted(indices, key=_free_resources,
+                  reverse=(policy == 'spread'))
+
+
+def _numa_get_cell_fit_state(instance_cell):
+    # _numa_fit_instance_cell() sets these on the instance cell it fits, so
+    # they are saved to try the cell against another host cell afresh.
+    cpu_pinning = instance_cell.cpu_pinning
+    if cpu_pinning is not None:
+        cpu_pinning = dict(cpu_pinning)
+    return instance_cell.pagesize, instance_cell.cpu_topology, cpu_pinning
+
+
+def _numa_set_cell_fit_state(instance_cell, state):
+    pagesize, cpu_topology, cpu_pinning = state
+    if instance_cell.pagesize != pagesize:
+        instance_cell.pagesize = pagesize
+    if instance_cell.cpu_topology is not cpu_topology:
+        instance_cell.cpu_topology = cpu_topology
+    if instance_cell.cpu_pinning != cpu_pinning:
+        if cpu_pinning is not None:
+            cpu_pinning = dict(cpu_pinning)
+        instance_cell.cpu_pinning = cpu_pinning
+
+
 def numa_fit_instance_to_host(
         host_topology, instance_topology, limits_topology=None,
         pci_requests=None, pci_stats=None):
@@ -1137,56 +1255,238 @@ def numa_fit_instance_to_host(
     :param pci_stats: pci_stats for the host
 
     Given a host and instance topology and optionally limits - this method
-    will attempt to fit instance cells onto all permutations of host cells
-    by calling the _numa_fit_instance_cell method, and return a new
-    InstanceNUMATopology with it's cell ids set to host cell id's of
-    the first successful permutation, or None.
+    will attempt to fit instance cells onto distinct host cells by calling
+    the _numa_fit_instance_cell method, and return a new InstanceNUMATopology
+    with it's cell ids set to host cell id's of the first successful
+    assignment, or None.
+
+    Assignments are searched depth first, instance cell by instance cell,
+    trying the host cells in the order given by _numa_host_cells_order(),
+    which by default is the order of the permutations of the host cells.
+    Whether an instance cell fits a host cell does not depend on the other
+    cells, so it is only computed once for each pair, and an assignment is
+    abandoned as soon as one of its cells doesn't fit. The PCI requests only
+    depend on the set of host cells used, and are checked once per set.
     """
     if (not (host_topology and instance_topology) or
         len(host_topology) < len(instance_topology)):
         return
+    if pci_requests and pci_stats is None:
+        return
+
+    host_cells = host_topology.cells
+    if limits_topology is None:
+        limit_cells = [None] * len(host_cells)
     else:
-        if limits_topology is None:
-            limits_topology_cells = itertools.repeat(
-                None, len(host_topology))
-        else:
-            limits_topology_cells = limits_topology.cells
-        # TODO(ndipanov): We may want to sort permutations differently
-        # depending on whether we want packing/spreading over NUMA nodes
-        for host_cell_perm in itertools.permutations(
-                zip(host_topology.cells, limits_topology_cells),
-                len(instance_topology)
-        ):
-            cells = []
-            for (host_cell, limit_cell), instance_cell in zip(
-                    host_cell_perm, instance_topology.cells):
-                got_cell = _numa_fit_instance_cell(
-                    host_cell, instance_cell, limit_cell)
-                if got_cell is None:
-                    break
-                cells.append(got_cell)
-            if len(cells) == len(host_cell_perm):
-                if not pci_requests:
-                    return objects.InstanceNUMATopology(cells=cells)
-                elif ((pci_stats is not None) and
-                    pci_stats.support_requests(pci_requests,
-                                                     cells)):
-                    return objects.InstanceNUMATopology(cells=cells)
+        limit_cells = limits_topology.cells
+    instance_cells = instance_topology.cells
+    states = [_numa_get_cell_fit_state(instance_cell)
+              for instance_cell in instance_cells]
+    host_order = _numa_host_cells_order(host_cells)
+
+    def _fit(host_index, instance_index):
+        instance_cell = instance_cells[instance_index]
+        _numa_set_cell_fit_state(instance_cell, states[instance_index])
+        return _numa_fit_instance_cell(host_cells[host_index], instance_cell,
+                                       limit_cells[host_index])
+
+    fits = {}
+
+    def _fits(host_index, instance_index):
+        key = (host_index, instance_index)
+        if key not in fits:
+            fits[key] = _fit(host_index, instance_index) is not None
+        return fits[key]
+
+    pci_fits = {}
+
+    def _pci_fits(assignment):
+        key = frozenset(assignment)
+        if key not in pci_fits:
+            # Only the ids of the cells matter to the PCI stats, which are
+            # the same for the host cells and the instance cells fitted on
+            # them.
+            pci_fits[key] = pci_stats.support_requests(
+                pci_requests, [host_cells[i] for i in assignment])
+        return pci_fits[key]
+
+    def _search(assignment):
+        instance_index = len(assignment)
+        if instance_index == len(instance_cells):
+            return not pci_requests or _pci_fits(assignment)
+        for host_index in host_order:
+            if host_index in assignment:
+                continue
+            if not _fits(host_index, instance_index):
+                continue
+            assignment.append(host_index)
+            if _search(assignment):
+                return True
+            assignment.pop()
+        return False
+
+    assignment = []
+    if not _search(assignment):
+        for instance_cell, state in zip(instance_cells, states):
+            _numa_set_cell_fit_state(instance_cell, state)
+        return
+
+    cells = [_fit(host_index, instance_index)
+             for instance_index, host_index in enumerate(assignment)]
+    return objects.InstanceNUMATopology(cells=cells)
+
+
+# Summary of the capacity of a host NUMA cell, in CPUs, MB of memory and
+# (page size, free KB) pairs sorted by decreasing page size.
+NUMACellCapacity = collections.namedtuple(
+    'NUMACellCapacity', ['cpus', 'memory', 'cpu_usage', 'memory_usage',
+                         'free_cpus', 'free_memory', 'free_pages'])
+
+
+def numa_capacity_from_host_topology(host_topology):
+    """Summarize the capacity of the cells of a host NUMA topology
+
+    :param host_topology: objects.NUMATopology of the host
+
+    :returns: a list of NUMACellCapacity, one for each host cell
+    """
+    return [NUMACellCapacity(
+                cpus=len(cell.cpuset), memory=cell.memory,
+                cpu_usage=cell.cpu_usage, memory_usage=cell.memory_usage,
+                free_cpus=cell.avail_cpus, free_memory=cell.avail_memory,
+                free_pages=tuple(sorted(
+                    ((pages.size_kb, pages.free_kb)
+                     for pages in cell.mempages), reverse=True)))
+            for cell in host_topology.cells]
+
+
+def _numa_cell_capacity_fits(capacity, instance_cell, cpu_ratio, ram_ratio):
+    """Whether an instance cell may fit a host cell given its capacity
+
+    Mirrors the checks of _numa_fit_instance_cell(), except for the
+    packing of pinned CPUs onto the host siblings.
+    """
+    cpus = len(instance_cell.cpuset)
+    if instance_cell.memory > capacity.memory or cpus > capacity.cpus:
+        return False
+
+    if instance_cell.cpu_pinning_requested:
+        if (capacity.free_cpus < cpus or
+                capacity.free_memory < instance_cell.memory):
+            return False
+    elif ram_ratio is not None and cpu_ratio is not None:
+        if (capacity.memory_usage + instance_cell.memory >
+                int(capacity.memory * ram_ratio) or
+                capacity.cpu_usage + cpus > capacity.cpus * cpu_ratio):
+            return False
+
+    if instance_cell.pagesize:
+        pages = capacity.free_pages
+        if instance_cell.pagesize == MEMPAGES_SMALL:
+            pages = pages[-1:]
+        elif instance_cell.pagesize == MEMPAGES_LARGE:
+            pages = pages[:-1]
+        elif instance_cell.pagesize != MEMPAGES_ANY:
+            pages = [(size_kb, free_kb) for size_kb, free_kb in pages
+                     if size_kb == instance_cell.pagesize]
+        memory_kb = instance_cell.memory * units.Ki
+        return any(memory_kb <= free_kb and memory_kb % size_kb == 0
+                   for size_kb, free_kb in pages)
+    return True
+
+
+def numa_capacity_may_fit(capacities, instance_topology, cpu_ratio=None,
+                          ram_ratio=None):
+    """Quickly tell whether an instance topology may fit a host
+
+    :param capacities: list of NUMACellCapacity of the host cells, as
+                       returned by numa_capacity_from_host_topology()
+    :param instance_topology: objects.InstanceNUMATopology to be fitted
+    :param cpu_ratio: CPU allocation ratio the host cells are limited to,
+                      if any
+    :param ram_ratio: RAM allocation ratio the host cells are limited to,
+                      if any
+
+    This is a necessary condition for numa_fit_instance_to_host() to
+    succeed with the same limits: every instance cell must fit at least
+    one host cell, and there must be as many such host cells as instance
+    cells. It only costs a few comparisons per pair of cells, so hosts
+    which obviously can't fit the instance are rejected before running the
+    full fit.
+    """
+    if not capacities or len(capacities) < len(instance_topology):
+        return False
+    usable = set()
+    for instance_cell in instance_topology.cells:
+        fitting = [index for index, capacity in enumerate(capacities)
+                   if _numa_cell_capacity_fits(capacity, instance_cell,
+                                               cpu_ratio, ram_ratio)]
+        if not fitting:
+            return False
+        usable.update(fitting)
+    return len(usable) >= len(instance_topology)
+
+
+class NUMAPagesUsage(object):
+    """Usage of the memory pages of a host NUMA cell, indexed by page size
+
+    Accounting for the pages of an instance cell is done in constant time,
+    and the usage is turned back into the list of
+    nova.objects.NUMAPagesTopology instances stored in the host cell, and
+    serialized along with it into the compute node, once all the instance
+    cells are accounted for.
+    """
+
+    def __init__(self, mempages):
+        self._mempages = list(mempages)
+        self._used = {pages.size_kb: pages.used for pages in self._mempages}
+
+    @classmethod
+    def from_cell(cls, hostcell):
+        return cls(hostcell.mempages)
+
+    def used(self, size_kb):
+        """Return the number of used pages of the given size."""
+        return self._used[size_kb]
+
+    def add(self, instancecell, sign=1):
+        """Account for the pages used by an instance cell.
+
+        The pages are released instead if sign is -1. Instance cells which
+        don't use a page size of the host cell are ignored.
+        """
+        pagesize = instancecell.pagesize
+        if pagesize is None or pagesize <= 0 or pagesize not in self._used:
+            return
+        self._used[pagesize] = max(
+            0, self._used[pagesize] +
+            instancecell.memory * units.Ki / pagesize * sign)
+
+    def remove(self, instancecell):
+        """Release the pages used by an instance cell."""
+        self.add(instancecell, sign=-1)
+
+    def to_mempages(self):
+        """Return the list of nova.objects.NUMAPagesTopology instances.
+
+        The instances of the page sizes whose usage didn't change are
+        reused as they are.
+        """
+        mempages = []
+        for pages in self._mempages:
+            used = self._used[pages.size_kb]
+            if used != pages.used:
+                pages = objects.NUMAPagesTopology(size_kb=pages.size_kb,
+                                                  total=pages.total,
+                                                  used=used)
+            mempages.append(pages)
+        return mempages
 
 
 def _numa_pagesize_usage_from_cell(hostcell, instancecell, sign):
-    topo = []
-    for pages in hostcell.mempages:
-        if pages.size_kb == instancecell.pagesize:
-            topo.append(objects.NUMAPagesTopology(
-                size_kb=pages.size_kb,
-                total=pages.total,
-                used=max(0, pages.used +
-                         instancecell.memory * units.Ki /
-                         pages.size_kb * sign)))
-        else:
-            topo.append(pages)
-    return topo
+    usage = NUMAPagesUsage.from_cell(hostcell)
+    usage.add(instancecell, sign)
+    return usage.to_mempages()
 
 
 def numa_usage_from_instances(host, instances, free=False):
@@ -1206,37 +1506,54 @@ def numa_usage_from_instances(host, instances, free=False):
         return
 
     instances = instances or []
-    cells = []
     sign = -1 if free else 1
+
+    # Index the instance cells by the host cell they were fitted onto, so
+    # that each host cell only goes through its own instance cells.
+    instance_cells = collections.defaultdict(list)
+    for instance in instances:
+        for instancecell in instance.cells:
+            instance_cells[instancecell.id].append((instance, instancecell))
+
+    cells = []
     for hostcell in host.cells:
         memory_usage = hostcell.memory_usage
         cpu_usage = hostcell.cpu_usage
-
-        newcell = objects.NUMACell(
+        pages_usage = NUMAPagesUsage.from_cell(hostcell)
+        # Pinned CPUs are accounted for as a bitmask, only converted back
+        # to a set once all the instances are summed.
+        pinned_mask = cpuset_to_mask(hostcell.pinned_cpus)
+
+        for instance, instancecell in instance_cells[hostcell.id]:
+            memory_usage = memory_usage + sign * instancecell.memory
+            cpu_usage = cpu_usage + sign * len(instancecell.cpuset)
+            pages_usage.add(instancecell, sign)
+            if instance.cpu_pinning_requested:
+                cpus_mask = cpuset_to_mask(instancecell.cpu_pinning.values())
+                if free:
+                    if pinned_mask & cpus_mask != cpus_mask:
+                        raise exception.CPUPinningInvalid(
+                            requested=list(mask_to_cpuset(cpus_mask)),
+                            pinned=list(mask_to_cpuset(pinned_mask)))
+                    pinned_mask &= ~cpus_mask
+                else:
+                    if pinned_mask & cpus_mask:
+                        raise exception.CPUPinningInvalid(
+                            requested=list(mask_to_cpuset(cpus_mask)),
+                            pinned=list(mask_to_cpuset(pinned_mask)))
+                    pinned_mask |= cpus_mask
+
+        # The usage is summed from the instances given, and reset when
+        # there are none.
+        if not instances:
+            memory_usage = cpu_usage = 0
+
+        cells.append(objects.NUMACell(
             id=hostcell.id, cpuset=hostcell.cpuset, memory=hostcell.memory,
-            cpu_usage=0, memory_usage=0, mempages=hostcell.mempages,
-            pinned_cpus=hostcell.pinned_cpus, siblings=hostcell.siblings)
-
-        for instance in instances:
-            for instancecell in instance.cells:
-                if instancecell.id == hostcell.id:
-                    memory_usage = (
-                            memory_usage + sign * instancecell.memory)
-                    cpu_usage = cpu_usage + sign * len(instancecell.cpuset)
-                    if instancecell.pagesize and instancecell.pagesize > 0:
-                        newcell.mempages = _numa_pagesize_usage_from_cell(
-                            hostcell, instancecell, sign)
-                    if instance.cpu_pinning_requested:
-                        pinned_cpus = set(instancecell.cpu_pinning.values())
-                        if free:
-                            newcell.unpin_cpus(pinned_cpus)
-                        else:
-                            newcell.pin_cpus(pinned_cpus)
-
-            newcell.cpu_usage = max(0, cpu_usage)
-            newcell.memory_usage = max(0, memory_usage)
-
-        cells.append(newcell)
+            cpu_usage=max(0, cpu_usage), memory_usage=max(0, memory_usage),
+            mempages=pages_usage.to_mempages(),
+            pinned_cpus=mask_to_cpuset(pinned_mask),
+            siblings=hostcell.siblings))
 
     return objects.NUMATopology(cells=cells)
 
@@ -18,9 +18,11 @@ Pluggable Weighing support
 """
 
 import abc
+import heapq
 
 import six
 
+from nova import filters
 from nova import loadables
 
 
@@ -53,6 +55,29 @@ def normalize(weight_list, minval=None, maxval=None):
     return ((i - minval) / range_ for i in weight_list)
 
 
+def normalize_array(weights, minval=None, maxval=None):
+    """Normalize the values of a NumPy array between 0 and 1.0.
+
+    This is the array counterpart of normalize().
+    """
+    if not len(weights):
+        return weights
+
+    if maxval is None:
+        maxval = weights.max()
+
+    if minval is None:
+        minval = weights.min()
+
+    maxval = float(maxval)
+    minval = float(minval)
+
+    if minval == maxval:
+        return filters.numpy.zeros(len(weights))
+
+    return (weights - minval) / (maxval - minval)
+
+
 class WeighedObject(object):
     """Object with weight information."""
     def __init__(self, obj, weight):
@@ -76,6 +101,10 @@ class BaseWeigher(object):
     minval = None
     maxval = None
 
+    # Set to true in a subclass implementing _weigh_batch(), which is then
+    # used instead of _weigh_object() by the vectorized weighing.
+    vectorized = False
+
     def weight_multiplier(self):
         """How weighted this weigher should be.
 
@@ -117,16 +146,51 @@ class BaseWeigher(object):
 
         return weights
 
+    def _weigh_batch(self, columns, weight_properties):
+        """Weigh all the objects of an ObjectColumns at once.
+
+        Override this in a subclass setting vectorized to True, returning
+        a NumPy array of the weights.
+        """
+        raise NotImplementedError()
+
+    def weigh_batch(self, columns, weight_properties):
+        """Weigh all the objects of an ObjectColumns at once.
+
+        Return a NumPy array of the weights, recording the min and max
+        values like weigh_objects() does.
+        """
+        weights = self._weigh_batch(columns, weight_properties)
+        if len(weights):
+            minval = weights.min()
+            maxval = weights.max()
+            if self.minval is None or minval < self.minval:
+                self.minval = minval
+            if self.maxval is None or maxval > self.maxval:
+                self.maxval = maxval
+        return weights
+
 
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
-    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
-        """Return a sorted (descending), normalized list of WeighedObjects."""
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            limit=None, vectorized=False):
+        """Return a sorted (descending), normalized list of WeighedObjects.
+
+        If limit is set, only the limit best objects are returned, which
+        spares sorting all of them. If vectorized is True, the weights are
+        computed as NumPy arrays, using _weigh_batch() for the weighers
+        supporting it.
+        """
 
         if not obj_list:
             return []
 
+        if vectorized:
+            return self._get_weighed_objects_vectorized(
+                weighers, obj_list, weighing_properties, limit)
+
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
         for weigher in weighers:
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
@@ -140,4 +204,38 @@ class BaseWeightHandler(loadables.BaseLoader):
                 obj = weighed_objs[i]
                 obj.weight += weigher.weight_multiplier() * weight
 
+        if limit is not None and limit < len(weighed_objs):
+            return heapq.nlargest(limit, weighed_objs, key=lambda x: x.weight)
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
+    def _get_weighed_objects_vectorized(self, weighers, obj_list,
+                                        weighing_properties, limit):
+        numpy = filters.numpy
+        obj_list = list(obj_list)
+        columns = filters.ObjectColumns(obj_list)
+        total = numpy.zeros(len(obj_list))
+        weighed_objs = None
+        for weigher in weighers:
+            if weigher.vectorized:
+                weights = weigher.weigh_batch(columns, weighing_properties)
+            else:
+                if weighed_objs is None:
+                    weighed_objs = [self.object_class(obj, 0.0)
+                                    for obj in obj_list]
+                weights = numpy.array(
+                    weigher.weigh_objects(weighed_objs, weighing_properties),
+                    dtype=float)
+
+            weights = normalize_array(weights,
+                                      minval=weigher.minval,
+                                      maxval=weigher.maxval)
+            total += weigher.weight_multiplier() * weights
+
+        indices = numpy.arange(len(obj_list))
+        if limit is not None and limit < len(obj_list):
+            indices = numpy.argpartition(-total, limit - 1)[:limit]
+        # Sort by descending weight, keeping the original order on ties
+        # like sorted() does.
+        indices = indices[numpy.lexsort((indices, -total[indices]))]
+        return [self.object_class(obj_list[i], float(total[i]))
+                for i in indices]